@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 
+from __future__ import division
+
 import time
 
 from bravo.chunk import Chunk
 from bravo.ibravo import ITerrainGenerator
 from bravo.plugin import retrieve_plugins
+from bravo.terrain.context import GenerationContext
+from bravo.utilities.coords import XZ
 
 def timed(f):
     def wrapped(*args, **kwargs):
@@ -20,27 +24,88 @@ def empty_chunk(i):
 @timed
 def sequential_seeded(i, p):
     chunk = Chunk(i, i)
-    p.populate(chunk, i)
+    p.populate(chunk, i, GenerationContext(chunk, i))
 
 @timed
 def repeated_seeds(i, p):
     chunk = Chunk(i, i)
-    p.populate(chunk, 0)
+    p.populate(chunk, 0, GenerationContext(chunk, 0))
 
 plugins = retrieve_plugins(ITerrainGenerator)
 
 def empty_bench():
     l = [empty_chunk(i) for i in xrange(25)]
-    return "chunk_baseline", l
+    return "chunk_baseline", l, "ms"
 
 benchmarks = [empty_bench]
 for name, plugin in plugins.items():
     def seq(name=name, plugin=plugin):
         l = [sequential_seeded(i, plugin) for i in xrange(25)]
-        return ("chunk_%s_sequential" % name), l
+        return ("chunk_%s_sequential" % name), l, "ms"
 
     def rep(name=name, plugin=plugin):
         l = [repeated_seeds(i, plugin) for i in xrange(25)]
-        return ("chunk_%s_repeated" % name), l
+        return ("chunk_%s_repeated" % name), l, "ms"
     benchmarks.append(seq)
     benchmarks.append(rep)
+
+# Chunks per second for the generators which sample 3D noise, sampling every
+# block, and then on their lattices. Caves and ores are run over terrain.
+
+def lattice_rate(plugin, lattice):
+    terrain = plugins["simplex"]
+    default, plugin.lattice = plugin.lattice, lattice
+
+    rates = []
+    for i in xrange(3):
+        chunk = Chunk(i, i)
+        context = GenerationContext(chunk, 0)
+        terrain.populate(chunk, 0, context)
+        context.regenerate_heightmap()
+        before = time.time()
+        plugin.populate(chunk, 0, context)
+        rates.append(1 / (time.time() - before))
+
+    plugin.lattice = default
+    return rates
+
+for name, plugin in plugins.items():
+    if not hasattr(plugin, "lattice"):
+        continue
+
+    def exact(name=name, plugin=plugin):
+        return ("chunk_%s_exact_rate" % name), lattice_rate(plugin,
+            (1, 1, 1)), "chunks/s"
+
+    def latticed(name=name, plugin=plugin):
+        return ("chunk_%s_lattice_rate" % name), lattice_rate(plugin,
+            plugin.lattice), "chunks/s"
+    benchmarks.append(exact)
+    benchmarks.append(latticed)
+
+# Filling the bottom of a chunk with stone, block by block and then with the
+# bulk fills which generators use.
+
+@timed
+def fill_set_block(i):
+    chunk = Chunk(i, i)
+    for x, z in XZ:
+        for y in range(64):
+            chunk.set_block((x, y, z), 1)
+
+@timed
+def fill_columns(i):
+    chunk = Chunk(i, i)
+    for x, z in XZ:
+        chunk.fill_column(x, z, 0, 64, 1)
+
+@timed
+def fill_slab(i):
+    chunk = Chunk(i, i)
+    chunk.fill_slab(0, 64, 1)
+
+for name, fill in (("set_block", fill_set_block),
+    ("fill_column", fill_columns), ("fill_slab", fill_slab)):
+    def bench(name=name, fill=fill):
+        return ("chunk_fill_%s" % name), [fill(i) for i in xrange(25)], "ms"
+    benchmarks.append(bench)
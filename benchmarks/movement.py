@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+from random import Random
+
+from bravo.beta.packets import make_packet
+from bravo.location import Location
+from bravo.movement import MovementBroadcaster
+
+# Twenty players watching twenty mobs wander around for ten seconds, with
+# each mob moving a couple of times per tick.
+VIEWERS = 20
+ENTITIES = 20
+TICKS = 200
+
+class Counter(object):
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+
+class Viewer(object):
+
+    def __init__(self):
+        self.transport = Counter()
+
+class Tracker(object):
+    """
+    Every viewer can see every entity.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def viewers(self, eid):
+        return self.factory.protocols.values()
+
+class Factory(object):
+
+    def __init__(self):
+        self.protocols = dict((i, Viewer()) for i in range(VIEWERS))
+        self.tracker = Tracker(self)
+
+def wander(seed):
+    """
+    Generate the moves of every entity, tick by tick.
+    """
+
+    r = Random(seed)
+    locations = [Location() for i in range(ENTITIES)]
+
+    for tick in range(TICKS):
+        moves = []
+        for eid, location in enumerate(locations):
+            for step in range(2):
+                pos = location.pos
+                location.pos = pos._replace(x=pos.x + r.randint(-4, 4),
+                    z=pos.z + r.randint(-4, 4))
+                if r.random() < 0.2:
+                    location.ori = location.ori._replace(
+                        theta=r.uniform(0, 6.28))
+                moves.append((eid, location.pos, location.ori))
+        yield moves
+
+def bytes_per_second(f):
+    times = []
+    for i in range(5):
+        factory = Factory()
+        f(factory, wander(i))
+        total = sum(p.transport.bytes for p in factory.protocols.values())
+        times.append(total / (TICKS / 20.0))
+    return times
+
+def teleports(factory, ticks):
+    """
+    Send an absolute teleport for every move, as was done before.
+    """
+
+    for moves in ticks:
+        for eid, pos, ori in moves:
+            yaw, pitch = ori.to_fracs()
+            packet = make_packet("teleport", eid=eid, x=pos.x, y=pos.y,
+                z=pos.z, yaw=yaw, pitch=pitch)
+            for viewer in factory.protocols.values():
+                viewer.transport.write(packet)
+
+def broadcaster(factory, ticks):
+    mb = MovementBroadcaster(factory)
+    location = Location()
+    for moves in ticks:
+        for eid, pos, ori in moves:
+            location.pos = pos
+            location.ori = ori
+            mb.move(eid, location)
+        mb.flush()
+
+def bench_teleports():
+    return "movement_bytes_teleport", bytes_per_second(teleports)
+
+def bench_broadcaster():
+    return "movement_bytes_relative", bytes_per_second(broadcaster)
+
+benchmarks = [bench_teleports, bench_broadcaster]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+from StringIO import StringIO
+from time import time
+
+from construct import Container
+
+from bravo.beta.packets import (packets, packets_by_name, make_packet,
+                                parse_packets)
+
+# A second's worth of movement from twenty players: one position and look
+# packet per player per tick.
+location = make_packet("location",
+    position=Container(x=1.5, y=64, stance=65.62, z=-3.25),
+    orientation=Container(rotation=90, pitch=-10),
+    grounded=Container(grounded=1))
+stream = location * 20 * 20
+
+def construct_parse(bytestream):
+    """
+    Parse a bytestream with construct alone, for comparison.
+    """
+
+    l = []
+    s = StringIO(bytestream)
+    while s.tell() < len(bytestream):
+        header = ord(s.read(1))
+        l.append((header, packets[header].parse_stream(s)))
+    return l
+
+def bench_construct():
+    times = []
+    for i in range(25):
+        before = time()
+        construct_parse(stream)
+        after = time()
+        times.append(400 / (after - before))
+    return "packets_construct", times, "packets/s"
+
+def bench_compiled():
+    times = []
+    for i in range(25):
+        before = time()
+        parse_packets(stream)
+        after = time()
+        times.append(400 / (after - before))
+    return "packets_compiled", times, "packets/s"
+
+benchmarks = [bench_construct, bench_compiled]
+
+# The fifteen packets which the server builds most often, with typical
+# payloads.
+samples = {
+    "ping": dict(pid=12345),
+    "time": dict(timestamp=123456, time=6000),
+    "chat": dict(message=u"<player> Hello, world!"),
+    "health": dict(hp=20, fp=20, saturation=5.0),
+    "location": dict(
+        position=Container(x=1.5, y=64, stance=65.62, z=-3.25),
+        orientation=Container(rotation=90, pitch=-10),
+        grounded=Container(grounded=1)),
+    "animate": dict(eid=42, animation="arm"),
+    "create": dict(eid=42),
+    "velocity": dict(eid=42, dx=100, dy=-50, dz=0),
+    "entity-position": dict(eid=42, dx=3, dy=0, dz=-2),
+    "entity-orientation": dict(eid=42, yaw=64, pitch=0),
+    "entity-location": dict(eid=42, dx=3, dy=0, dz=-2, yaw=64, pitch=0),
+    "teleport": dict(eid=42, x=320, y=2048, z=-96, yaw=64, pitch=0),
+    "entity-head": dict(eid=42, yaw=64),
+    "block": dict(x=10, y=64, z=-10, type=1, meta=0),
+    "players": dict(name=u"player", online=True, ping=50),
+}
+
+def construct_build(name, payload):
+    """
+    Build a packet with construct alone, for comparison.
+    """
+
+    header = packets_by_name[name]
+    return chr(header) + packets[header].build(Container(**payload))
+
+def build_bench(f, name, payload):
+    times = []
+    for i in range(25):
+        before = time()
+        for j in range(1000):
+            f(name, payload)
+        after = time()
+        times.append(1000 / (after - before))
+    return times
+
+for name, payload in sorted(samples.items()):
+    def construct_bench(name=name, payload=payload):
+        times = build_bench(construct_build, name, payload)
+        return "build_%s_construct" % name, times, "packets/s"
+
+    def compiled_bench(name=name, payload=payload):
+        times = build_bench(lambda n, p: make_packet(n, **p), name, payload)
+        return "build_%s_compiled" % name, times, "packets/s"
+
+    benchmarks.append(construct_bench)
+    benchmarks.append(compiled_bench)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+from __future__ import division
+
+from multiprocessing import Pool, cpu_count
+import os
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from bravo.chunk import Chunk
+from bravo.ibravo import ITerrainGenerator
+from bravo.plugin import retrieve_sorted_plugins
+from bravo.policy.packs import packs
+from bravo.terrain.context import GenerationContext
+
+# Whole terrain pipelines, as configured by the packs, run over a square of
+# neighboring chunks: the time spent in each stage, the memory each stage
+# allocates, and how many chunks per second one process, and then several, can
+# turn out.
+
+SIDE = 4
+SEED = 0
+
+# The number of processes for the parallel rate; one per CPU, unless it's set
+# with BRAVO_BENCH_PROCESSES, or with run_benchmarks.py --processes. It is part
+# of the benchmark's name, so that only rates with the same number of
+# processes are compared.
+PROCESSES = int(os.environ.get("BRAVO_BENCH_PROCESSES") or cpu_count())
+
+def square(side, offset=0):
+    return [(offset + i, offset + j) for i in range(side) for j in range(side)]
+
+def pipeline(pack):
+    generators = packs[pack]["generators"]
+    return retrieve_sorted_plugins(ITerrainGenerator, generators)
+
+def stage_times(stages, coords):
+    """
+    Time every stage of a pipeline for each chunk, in milliseconds.
+    """
+
+    times = dict((stage.name, []) for stage in stages)
+    totals = []
+
+    for x, z in coords:
+        chunk = Chunk(x, z)
+        context = GenerationContext(chunk, SEED)
+        start = time.time()
+        for stage in stages:
+            before = time.time()
+            stage.populate(chunk, SEED, context)
+            times[stage.name].append((time.time() - before) * 1000)
+        totals.append((time.time() - start) * 1000)
+
+    return times, totals
+
+def stage_allocations(stages, coords):
+    """
+    Measure the peak memory allocated by every stage of a pipeline for each
+    chunk, in bytes.
+    """
+
+    allocations = dict((stage.name, []) for stage in stages)
+
+    for x, z in coords:
+        chunk = Chunk(x, z)
+        context = GenerationContext(chunk, SEED)
+        for stage in stages:
+            tracemalloc.start()
+            stage.populate(chunk, SEED, context)
+            allocations[stage.name].append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    return allocations
+
+_stages = None
+
+def generate(args):
+    """
+    Generate a chunk in a worker process, keeping the pipeline around for the
+    next one.
+    """
+
+    global _stages
+
+    pack, x, z = args
+    if _stages is None:
+        _stages = pipeline(pack)
+
+    chunk = Chunk(x, z)
+    context = GenerationContext(chunk, SEED)
+    for stage in _stages:
+        stage.populate(chunk, SEED, context)
+
+def rates(pack, processes, runs=3):
+    """
+    Measure chunks per second, generating chunks in a pool of processes.
+    """
+
+    pool = Pool(processes)
+    # Bring every worker up, and its pipeline with it, before timing.
+    pool.map(generate, [(pack, -1, -i) for i in range(processes)])
+
+    results = []
+    for i in range(runs):
+        coords = square(SIDE, (i + 1) * SIDE)
+        before = time.time()
+        pool.map(generate, [(pack, x, z) for x, z in coords], chunksize=1)
+        results.append(len(coords) / (time.time() - before))
+
+    pool.close()
+    pool.join()
+    return results
+
+def serial_rates(pack, runs=3):
+    stages = pipeline(pack)
+
+    results = []
+    for i in range(runs):
+        coords = square(SIDE, (i + 1) * SIDE)
+        before = time.time()
+        for x, z in coords:
+            chunk = Chunk(x, z)
+            context = GenerationContext(chunk, SEED)
+            for stage in stages:
+                stage.populate(chunk, SEED, context)
+        results.append(len(coords) / (time.time() - before))
+
+    return results
+
+benchmarks = []
+
+for pack in sorted(packs):
+    stages = pipeline(pack)
+
+    # Every stage is measured in the same runs, which are only made once.
+    profile = {}
+
+    def profiled(key, stages=stages, profile=profile):
+        if key not in profile:
+            if key == "allocated":
+                profile[key] = stage_allocations(stages, square(2))
+            else:
+                profile["times"], profile["totals"] = stage_times(stages,
+                    square(SIDE))
+        return profile[key]
+
+    for stage in stages:
+        def stage_bench(pack=pack, name=stage.name, profiled=profiled):
+            return ("pipeline_%s_%s" % (pack, name), profiled("times")[name],
+                "ms")
+        benchmarks.append(stage_bench)
+
+        if tracemalloc is not None:
+            def alloc_bench(pack=pack, name=stage.name, profiled=profiled):
+                return ("pipeline_%s_%s_allocated" % (pack, name),
+                    profiled("allocated")[name], "bytes")
+            benchmarks.append(alloc_bench)
+
+    def total_bench(pack=pack, profiled=profiled):
+        return "pipeline_%s_total" % pack, profiled("totals"), "ms"
+
+    def serial_bench(pack=pack):
+        return "pipeline_%s_rate_serial" % pack, serial_rates(pack), "chunks/s"
+
+    def parallel_bench(pack=pack):
+        return ("pipeline_%s_rate_parallel_%d" % (pack, PROCESSES),
+            rates(pack, PROCESSES), "chunks/s")
+
+    benchmarks.extend([total_bench, serial_bench, parallel_bench])
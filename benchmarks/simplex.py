@@ -1,8 +1,11 @@
 #!/usr/bin/env python
 
+from __future__ import division
+
 from time import time
 
-from bravo.simplex import set_seed, simplex2, simplex3
+from bravo.simplex import (set_seed, simplex2, simplex3, octaves2, octaves3,
+                           octaves2_grid, octaves3_grid)
 
 set_seed(time())
 
@@ -15,7 +18,7 @@ def bench2():
         after = time()
         t = (after - before) / 10000
         times.append(1/t)
-    return "simplex2", times
+    return "simplex2", times, "calls/s"
 
 def bench3():
     times = []
@@ -26,6 +29,51 @@ def bench3():
         after = time()
         t = (after - before) / 10000
         times.append(1/t)
-    return "simplex3", times
+    return "simplex3", times, "calls/s"
+
+# Chunks of noise per second, a column at a time and then a grid at a time,
+# as the generators sample it: a heightmap, and 3D noise for half a chunk.
+
+def octaves2_chunks():
+    times = []
+    for i in range(25):
+        before = time()
+        for x in range(16):
+            for z in range(16):
+                octaves2((i * 16 + x) / 256, z / 256, 6)
+        after = time()
+        times.append(1 / (after - before))
+    return "octaves2_chunk", times, "chunks/s"
+
+def octaves2_grids():
+    times = []
+    for i in range(25):
+        before = time()
+        octaves2_grid(i * 16, 0, 16, 16, 1 / 256, 6)
+        after = time()
+        times.append(1 / (after - before))
+    return "octaves2_grid_chunk", times, "chunks/s"
+
+def octaves3_chunks():
+    times = []
+    for i in range(5):
+        before = time()
+        for x in range(16):
+            for z in range(16):
+                for y in range(128):
+                    octaves3((i * 16 + x) / 16, z / 16, y / 32, 3)
+        after = time()
+        times.append(1 / (after - before))
+    return "octaves3_chunk", times, "chunks/s"
+
+def octaves3_grids():
+    times = []
+    for i in range(5):
+        before = time()
+        octaves3_grid(i * 16, 0, 0, 16, 16, 128, (1 / 16, 1 / 16, 1 / 32), 3)
+        after = time()
+        times.append(1 / (after - before))
+    return "octaves3_grid_chunk", times, "chunks/s"
 
-benchmarks = [bench2, bench3]
+benchmarks = [bench2, bench3, octaves2_chunks, octaves2_grids, octaves3_chunks,
+              octaves3_grids]
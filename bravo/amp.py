@@ -1,8 +1,9 @@
-from twisted.internet.protocol import Factory
-from twisted.protocols.amp import AMP, Command, Unicode, ListOf
+from twisted.internet.protocol import Factory, ReconnectingClientFactory
+from twisted.protocols.amp import (AMP, Command, Float, Integer, ListOf,
+                                   String, Unicode)
+from twisted.python import log
 
 from bravo import version as bravo_version
-from bravo.beta.factory import BravoFactory
 from bravo.ibravo import IChatCommand, IConsoleCommand
 from bravo.plugin import retrieve_plugins
 
@@ -38,6 +39,74 @@ class RunCommand(Command):
         ValueError: "VALUE_ERROR",
     }
 
+# The shard bus. Workers each own part of a world, and connect to the proxy
+# in front of them, which relays events between them.
+
+class JoinBus(Command):
+    arguments = (
+        ("shard", Integer()),
+    )
+    response = tuple()
+
+class BlockChanged(Command):
+    arguments = (
+        ("x", Integer()),
+        ("y", Integer()),
+        ("z", Integer()),
+        ("block", Integer()),
+        ("metadata", Integer()),
+    )
+    response = tuple()
+    requiresAnswer = False
+
+class EntityMoved(Command):
+    arguments = (
+        ("eid", Integer()),
+        ("username", Unicode()),
+        ("x", Integer()),
+        ("y", Integer()),
+        ("z", Integer()),
+        ("theta", Float()),
+        ("phi", Float()),
+    )
+    response = tuple()
+    requiresAnswer = False
+
+class EntityRemoved(Command):
+    arguments = (
+        ("eid", Integer()),
+    )
+    response = tuple()
+    requiresAnswer = False
+
+class Decorate(Command):
+    arguments = (
+        ("shard", Integer()),
+        ("decorations", String()),
+    )
+    response = tuple()
+    errors = {
+        KeyError: "KEY_ERROR",
+    }
+
+class Handoff(Command):
+    arguments = (
+        ("username", Unicode()),
+        ("eid", Integer()),
+        ("shard", Integer()),
+    )
+    response = tuple()
+    errors = {
+        KeyError: "KEY_ERROR",
+    }
+
+class Arrive(Command):
+    arguments = (
+        ("username", Unicode()),
+        ("eid", Integer()),
+    )
+    response = tuple()
+
 class ConsoleRPCProtocol(AMP):
     """
     Simple AMP server for clients implementing console services.
@@ -90,6 +159,8 @@ class ConsoleRPCFactory(Factory):
         self.services = service.namedServices
 
     def buildProtocol(self, addr):
+        from bravo.beta.factory import BravoFactory
+
         factories = {}
         for name, service in self.services.iteritems():
             factory = service.args[1]
@@ -99,3 +170,156 @@ class ConsoleRPCFactory(Factory):
         protocol = self.protocol(factories)
         protocol.factory = self
         return protocol
+
+class ShardBusProtocol(AMP):
+    """
+    The proxy's end of the shard bus, speaking to a single worker.
+    """
+
+    shard = None
+
+    def join(self, shard):
+        self.shard = shard
+        self.factory.workers[shard] = self
+        log.msg("Shard %d joined the bus" % shard)
+        return {}
+    JoinBus.responder(join)
+
+    def block_changed(self, **kwargs):
+        self.factory.relay(self, BlockChanged, **kwargs)
+        return {}
+    BlockChanged.responder(block_changed)
+
+    def entity_moved(self, **kwargs):
+        self.factory.relay(self, EntityMoved, **kwargs)
+        return {}
+    EntityMoved.responder(entity_moved)
+
+    def entity_removed(self, **kwargs):
+        self.factory.relay(self, EntityRemoved, **kwargs)
+        return {}
+    EntityRemoved.responder(entity_removed)
+
+    def decorate(self, shard, decorations):
+        return self.factory.deliver(shard, Decorate, shard=shard,
+            decorations=decorations)
+    Decorate.responder(decorate)
+
+    def handoff(self, username, eid, shard):
+        return self.factory.handoff(username, eid, shard)
+    Handoff.responder(handoff)
+
+    def connectionLost(self, reason):
+        if self.factory.workers.get(self.shard) is self:
+            del self.factory.workers[self.shard]
+        AMP.connectionLost(self, reason)
+
+class ShardBusFactory(Factory):
+    """
+    The hub of the shard bus.
+
+    Block and entity events from each worker are relayed to every other
+    worker, writes to a shard's chunks are delivered to that shard alone, and
+    handoffs are carried out by telling the receiving worker to expect the
+    player, then switching the player's proxied connection over.
+
+    :ivar dict workers: the connected workers, by shard
+    """
+
+    protocol = ShardBusProtocol
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.name = "%s bus" % proxy.name
+        self.workers = {}
+
+    def relay(self, source, command, **kwargs):
+        """
+        Send an event to every worker but the one it came from.
+        """
+
+        for worker in self.workers.values():
+            if worker is not source:
+                worker.callRemote(command, **kwargs)
+
+    def deliver(self, target, command, **kwargs):
+        """
+        Send an event to the worker for a single shard.
+
+        :raises: ``KeyError`` if the shard isn't connected
+        """
+
+        d = self.workers[target].callRemote(command, **kwargs)
+        d.addCallback(lambda none: {})
+        return d
+
+    def handoff(self, username, eid, shard):
+        """
+        Move a player to another shard.
+
+        :raises: ``KeyError`` if the player or the shard aren't connected
+        """
+
+        client = self.proxy.clients[username]
+        worker = self.workers[shard]
+
+        d = worker.callRemote(Arrive, username=username, eid=eid)
+        d.addCallback(lambda none: client.switch(shard))
+        d.addCallback(lambda none: {})
+        return d
+
+class ShardWorkerProtocol(AMP):
+    """
+    A worker's end of the shard bus.
+    """
+
+    def connectionMade(self):
+        AMP.connectionMade(self)
+        self.shard.connected(self)
+
+    def connectionLost(self, reason):
+        self.shard.disconnected(self)
+        AMP.connectionLost(self, reason)
+
+    def block_changed(self, x, y, z, block, metadata):
+        self.shard.block_changed(x, y, z, block, metadata)
+        return {}
+    BlockChanged.responder(block_changed)
+
+    def entity_moved(self, eid, username, x, y, z, theta, phi):
+        self.shard.entity_moved(eid, username, x, y, z, theta, phi)
+        return {}
+    EntityMoved.responder(entity_moved)
+
+    def entity_removed(self, eid):
+        self.shard.entity_removed(eid)
+        return {}
+    EntityRemoved.responder(entity_removed)
+
+    def decorate(self, shard, decorations):
+        self.shard.decorate(decorations)
+        return {}
+    Decorate.responder(decorate)
+
+    def arrive(self, username, eid):
+        self.shard.arrivals[username] = eid
+        return {}
+    Arrive.responder(arrive)
+
+class ShardWorkerFactory(ReconnectingClientFactory):
+    """
+    Keeps a worker connected to the shard bus, even if the proxy is started
+    after it or restarted.
+    """
+
+    maxDelay = 10
+
+    def __init__(self, shard):
+        self.shard = shard
+
+    def buildProtocol(self, addr):
+        self.resetDelay()
+        protocol = ShardWorkerProtocol()
+        protocol.factory = self
+        protocol.shard = self.shard
+        return protocol
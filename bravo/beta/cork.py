@@ -0,0 +1,219 @@
+from collections import deque
+
+from twisted.internet import reactor
+from twisted.internet.interfaces import IConsumer, IPushProducer
+from twisted.python import log
+from zope.interface import implements
+
+class CorkedTransport(object):
+    """
+    A transport wrapper which coalesces writes and applies backpressure.
+
+    Handlers tend to write many small packets in response to a single event;
+    sending a chunk, for example, writes the chunk and then each of its
+    entities and signs. Rather than handing each of those to the underlying
+    transport, they are collected and flushed with a single
+    ``writeSequence()`` at the end of the current reactor turn, or as soon as
+    enough data is waiting.
+
+    A tick is run within a single reactor turn, so everything written during
+    a tick is flushed together once the tick is over.
+
+    The corked transport registers itself as a streaming producer with the
+    transport it wraps. When that transport's own buffer fills up, it pauses
+    the corked transport, and data is held here instead, where it can be
+    measured. Once more than ``high_water`` bytes are held, the producer
+    registered with the corked transport, usually the protocol, is paused;
+    it is resumed once the backlog drains to ``low_water`` bytes. If the
+    backlog ever passes ``limit`` bytes, the client isn't keeping up at all,
+    and the connection is aborted.
+
+    Anything which isn't about writing is passed through to the wrapped
+    transport.
+
+    :ivar int packets: the number of writes which have been made
+    :ivar int bytes: the number of bytes which have been written
+    :ivar int flushes: the number of writes passed to the wrapped transport
+    :ivar int pauses: the number of times the producer has been paused
+    :ivar int peak: the largest backlog seen, in bytes
+    """
+
+    implements(IConsumer, IPushProducer)
+
+    clock = reactor
+    """
+    The clock used to schedule flushes. Replaceable for testing.
+    """
+
+    packets = 0
+    bytes = 0
+    flushes = 0
+    pauses = 0
+    peak = 0
+
+    producer = None
+    producer_paused = False
+
+    blocked = False
+    closing = False
+    aborted = False
+
+    def __init__(self, transport, threshold=16 * 1024, high_water=256 * 1024,
+                 low_water=64 * 1024, limit=4 * 1024 * 1024):
+        """
+        :param transport: the transport to wrap
+        :param int threshold: how many bytes may wait before being flushed
+            immediately
+        :param int high_water: the backlog, in bytes, at which to pause the
+            producer
+        :param int low_water: the backlog, in bytes, at which to resume the
+            producer
+        :param int limit: the backlog, in bytes, at which to give up on the
+            connection
+        """
+
+        self.transport = transport
+        self.threshold = threshold
+        self.high_water = high_water
+        self.low_water = low_water
+        self.limit = limit
+
+        self.pending = deque()
+        self.pending_bytes = 0
+        self._call = None
+
+        transport.registerProducer(self, True)
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+    def write(self, data):
+        if not data or self.aborted:
+            return
+
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+        self.packets += 1
+        self.bytes += len(data)
+        self.peak = max(self.peak, self.pending_bytes)
+
+        if self.pending_bytes > self.limit:
+            self.abort()
+            return
+
+        if (self.producer is not None and not self.producer_paused
+            and self.pending_bytes > self.high_water):
+            self.producer_paused = True
+            self.pauses += 1
+            self.producer.pauseProducing()
+
+        if self.blocked:
+            return
+
+        if self.pending_bytes >= self.threshold:
+            self.flush()
+        elif self._call is None:
+            self._call = self.clock.callLater(0, self.flush)
+
+    def writeSequence(self, data):
+        for chunk in data:
+            self.write(chunk)
+
+    def flush(self):
+        """
+        Hand pending data to the wrapped transport, for as long as it will
+        accept it.
+        """
+
+        if self._call is not None:
+            if self._call.active():
+                self._call.cancel()
+            self._call = None
+
+        # The wrapped transport may pause us in the middle of a write, so
+        # data is handed over a threshold's worth at a time.
+        while self.pending and not self.blocked:
+            batch = []
+            size = 0
+            while self.pending and size < self.threshold:
+                data = self.pending.popleft()
+                batch.append(data)
+                size += len(data)
+            self.pending_bytes -= size
+            self.flushes += 1
+            self.transport.writeSequence(batch)
+
+        if self.producer_paused and self.pending_bytes <= self.low_water:
+            self.producer_paused = False
+            self.producer.resumeProducing()
+
+        if self.closing and not self.pending:
+            self.closing = False
+            self.transport.loseConnection()
+
+    def abort(self):
+        """
+        Give up on a client which isn't reading what it's sent.
+        """
+
+        log.msg("Dropping connection with %d bytes backlogged"
+            % self.pending_bytes)
+
+        self.aborted = True
+        self.pending.clear()
+        self.pending_bytes = 0
+
+        if hasattr(self.transport, "abortConnection"):
+            self.transport.abortConnection()
+        else:
+            self.transport.loseConnection()
+
+    def loseConnection(self):
+        """
+        Drop the connection once everything pending has been written.
+        """
+
+        self.closing = True
+        self.flush()
+
+    # IConsumer, for the protocol.
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+        self.producer_paused = False
+
+    def unregisterProducer(self):
+        self.producer = None
+        self.producer_paused = False
+
+    # IPushProducer, for the wrapped transport.
+
+    def pauseProducing(self):
+        self.blocked = True
+
+    def resumeProducing(self):
+        self.blocked = False
+        self.flush()
+
+    def stopProducing(self):
+        self.blocked = True
+        self.pending.clear()
+        self.pending_bytes = 0
+
+        if self.producer is not None:
+            self.producer.stopProducing()
+
+    def stats(self):
+        """
+        Get a dictionary of statistics describing this transport's writes.
+        """
+
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "flushes": self.flushes,
+            "pending": self.pending_bytes,
+            "peak": self.peak,
+            "pauses": self.pauses,
+            "paused": self.producer_paused,
+        }
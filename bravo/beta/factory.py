@@ -2,23 +2,25 @@ from collections import defaultdict
 from itertools import chain, product
 
 from twisted.internet import reactor
-from twisted.internet.interfaces import IPushProducer
 from twisted.internet.protocol import Factory
-from twisted.internet.task import LoopingCall
 from twisted.python import log
-from zope.interface import implements
 
 from bravo.beta.packets import make_packet
 from bravo.beta.protocol import BravoProtocol, KickedProtocol
-from bravo.entity import entities
+from bravo.entity import Mob, entities
 from bravo.ibravo import (ISortedPlugin, IAutomaton, ITerrainGenerator,
                           IUseHook, ISignHook, IPreDigHook, IDigHook,
                           IPreBuildHook, IPostBuildHook, IWindowOpenHook,
                           IWindowClickHook, IWindowCloseHook)
 from bravo.location import Location
+from bravo.movement import MovementBroadcaster
 from bravo.plugin import retrieve_named_plugins, retrieve_sorted_plugins
 from bravo.policy.packs import packs as available_packs
 from bravo.policy.seasons import Spring, Winter
+from bravo.profiler import Profiler
+from bravo.shard import Shard
+from bravo.tracker import EntityTracker
+from bravo.ticker import Ticker, PHASE_WORLD, PHASE_ENTITIES, PHASE_NETWORK
 from bravo.utilities.chat import chat_name, sanitize_chat
 from bravo.weather import WeatherVane
 from bravo.world import World
@@ -36,14 +38,18 @@ class BravoFactory(Factory):
     A ``Factory`` that creates ``BravoProtocol`` objects when connected to.
     """
 
-    implements(IPushProducer)
-
     protocol = BravoProtocol
 
     timestamp = None
     time = 0
     day = 0
     eid = 1
+    eid_step = 1
+
+    shard = None
+    """
+    This world's ``Shard``, if the world is split between several workers.
+    """
 
     interfaces = []
 
@@ -67,6 +73,11 @@ class BravoFactory(Factory):
         self.protocols = dict()
         self.connectedIPs = defaultdict(int)
 
+        # Index of chunk coordinates to the protocols which currently have
+        # that chunk loaded. Maintained by subscribe_chunk() and
+        # unsubscribe_chunk().
+        self.chunk_subscribers = defaultdict(set)
+
         self.mode = self.config.get(self.config_name, "mode")
         if self.mode not in ("creative", "survival"):
             raise Exception("Unsupported mode %s" % self.mode)
@@ -78,6 +89,26 @@ class BravoFactory(Factory):
                                                       "limitPerIP", 0)
 
         self.vane = WeatherVane(self)
+        self.movement = MovementBroadcaster(self)
+        self.tracker = EntityTracker(self)
+
+        if self.config.has_option(self.config_name, "shard"):
+            self.shard = Shard(self)
+            # Deal out entity IDs so that no two shards ever hand out the
+            # same one, since players keep theirs when they are handed off.
+            self.eid = 1 + self.shard.index
+            self.eid_step = self.shard.map.count
+
+        profiling = self.config.getbooleandefault(self.config_name,
+            "profiling", True)
+        self.profiler = Profiler(profiling)
+
+        self.ticker = Ticker()
+        self.ticker.profiler = self.profiler
+        self.tick_systems = []
+
+        # The world's chunk management runs on the factory's ticker.
+        self.world.ticker = self.ticker
 
     def startFactory(self):
         log.msg("Initializing factory for world '%s'..." % self.name)
@@ -99,15 +130,37 @@ class BravoFactory(Factory):
         self.timestamp = reactor.seconds()
         self.time = self.world.level.time
         self.update_season()
-        self.time_loop = LoopingCall(self.update_time)
-        self.time_loop.start(2)
+        self.tick_systems.append(self.ticker.add_seconds(self.update_time, 2,
+            name="time", order=PHASE_WORLD))
+        self.tick_systems.append(self.ticker.add_seconds(self.broadcast_time,
+            10, name="time-broadcast", order=PHASE_NETWORK))
+        self.tick_systems.append(self.ticker.add_seconds(self.keepalive, 30,
+            name="keepalive", order=PHASE_NETWORK))
+        self.tick_systems.append(self.ticker.add(self.movement.flush,
+            name="movement", order=PHASE_NETWORK))
+        self.tick_systems.append(self.ticker.add(self.send_chunks,
+            name="chunks", order=PHASE_NETWORK))
 
         log.msg("Starting entity updates...")
+        self.tick_systems.append(self.ticker.add_seconds(
+            self.world.mob_manager.update, 0.2, name="mobs",
+            order=PHASE_ENTITIES))
+        self.tick_systems.append(self.ticker.add_seconds(self.tracker.update,
+            0.5, name="tracking", order=PHASE_ENTITIES))
+
+        if self.shard:
+            log.msg("Joining the shard bus as shard %d..." % self.shard.index)
+            self.shard.start()
+            self.tick_systems.append(self.ticker.add(self.shard.update,
+                name="shard", order=PHASE_NETWORK))
 
         # Start automatons.
         for automaton in self.automatons:
             automaton.start()
 
+        log.msg("Starting ticker...")
+        self.ticker.start()
+
         self.chat_consumers = set()
 
         log.msg("Factory successfully initialized for world '%s'!" % self.name)
@@ -131,7 +184,13 @@ class BravoFactory(Factory):
         # automatons.
         self.unregister_plugins()
 
-        self.time_loop.stop()
+        for system in self.tick_systems:
+            system.stop()
+        self.tick_systems = []
+        self.ticker.stop()
+
+        if self.shard:
+            self.shard.stop()
 
         # Write back current world time. This must be done before stopping the
         # world.
@@ -209,6 +268,16 @@ class BravoFactory(Factory):
         if username in self.protocols:
             del self.protocols[username]
 
+        # Drop this protocol from every chunk it was watching.
+        for x, z in protocol.chunks.keys():
+            self.unsubscribe_chunk(protocol, x, z)
+
+        self.movement.forget(protocol)
+        self.tracker.forget_viewer(protocol)
+
+        if self.shard:
+            self.shard.forget(protocol)
+
         self.connectedIPs[host] -= 1
 
     def set_username(self, protocol, username):
@@ -290,6 +359,25 @@ class BravoFactory(Factory):
         if "winter" in seasons:
             self.seasons.append(Winter())
 
+        # Generators which sample noise on a lattice may have it tuned.
+        for generator in self.generators:
+            if hasattr(generator, "lattice"):
+                option = "lattice_%s" % generator.name
+                lattice = self.config.getlistdefault(self.config_name, option,
+                    None)
+                if lattice:
+                    try:
+                        lattice = tuple(int(i) for i in lattice)
+                    except ValueError:
+                        lattice = ()
+
+                    # Anything else would fail on every chunk.
+                    if len(lattice) == 3 and min(lattice) > 0:
+                        generator.lattice = lattice
+                    else:
+                        log.msg("Ignoring %s; it should be three positive "
+                            "integers" % option)
+
         # Assign generators to the world pipeline.
         self.world.pipeline = self.generators
 
@@ -341,7 +429,7 @@ class BravoFactory(Factory):
             log.msg("Created entity %s" % entity)
             # XXX Maybe just send the entity object to the manager instead of
             # the following?
-            if hasattr(entity,'loop'):
+            if isinstance(entity, Mob):
                 self.world.mob_manager.start_mob(entity)
 
         return entity
@@ -357,7 +445,7 @@ class BravoFactory(Factory):
         """
 
         if not entity.eid:
-            self.eid += 1
+            self.eid += self.eid_step
             entity.eid = self.eid
 
         log.msg("Registered entity %s" % entity)
@@ -373,6 +461,12 @@ class BravoFactory(Factory):
         bigx = entity.location.pos.x // 16
         bigz = entity.location.pos.z // 16
 
+        if isinstance(entity, Mob):
+            self.world.mob_manager.stop_mob(entity)
+
+        self.tracker.despawn(entity)
+        self.movement.forget_entity(entity.eid)
+
         d = self.world.request_chunk(bigx, bigz)
 
         @d.addCallback
@@ -405,9 +499,26 @@ class BravoFactory(Factory):
             self.update_season()
 
     def broadcast_time(self):
-        packet = make_packet("time", timestamp=int(self.time))
+        time = int(self.time)
+        packet = make_packet("time", timestamp=time, time=time % 24000)
         self.broadcast(packet)
 
+    def keepalive(self):
+        """
+        Send a keepalive to every connected player.
+        """
+
+        for player in self.protocols.itervalues():
+            player.update_ping()
+
+    def send_chunks(self):
+        """
+        Let every player send the next few chunks from its queue.
+        """
+
+        for player in self.protocols.values():
+            player.send_queued_chunks()
+
     def update_season(self):
         """
         Update the world's season.
@@ -422,14 +533,18 @@ class BravoFactory(Factory):
         past_seasons = [s for s in all_seasons if s.day <= self.day]
         if past_seasons:
             # The most recent one is the one we are in
-            self.world.season = past_seasons[-1]
+            season = past_seasons[-1]
         elif all_seasons:
             # We haven't past any seasons yet this year, so grab the last one
             # from 'last year'
-            self.world.season = all_seasons[-1]
+            season = all_seasons[-1]
         else:
             # No seasons enabled.
-            self.world.season = None
+            season = None
+
+        # Chunks which are already loaded are brought into the new season
+        # gradually by the world.
+        self.world.change_season(season)
 
     def chat(self, message):
         """
@@ -479,9 +594,44 @@ class BravoFactory(Factory):
         `x` and `z` are chunk coordinates, not block coordinates.
         """
 
-        for player in self.protocols.itervalues():
-            if (x, z) in player.chunks:
-                player.transport.write(packet)
+        if (x, z) not in self.chunk_subscribers:
+            return
+
+        for player in self.chunk_subscribers[x, z]:
+            player.transport.write(packet)
+
+    def subscribe_chunk(self, protocol, x, z):
+        """
+        Record that a protocol has a certain chunk loaded.
+
+        `x` and `z` are chunk coordinates, not block coordinates.
+        """
+
+        self.chunk_subscribers[x, z].add(protocol)
+
+    def unsubscribe_chunk(self, protocol, x, z):
+        """
+        Record that a protocol no longer has a certain chunk loaded.
+
+        This is safe to call for chunks which were never subscribed.
+        """
+
+        if (x, z) not in self.chunk_subscribers:
+            return
+
+        subscribers = self.chunk_subscribers[x, z]
+        subscribers.discard(protocol)
+        if not subscribers:
+            del self.chunk_subscribers[x, z]
+
+    def subscribers_for_chunk(self, x, z):
+        """
+        Get the protocols which have a certain chunk loaded.
+
+        :returns: a frozenset of protocols
+        """
+
+        return frozenset(self.chunk_subscribers.get((x, z), ()))
 
     def scan_chunk(self, chunk):
         """
@@ -493,7 +643,8 @@ class BravoFactory(Factory):
         # this case correctly.
         if hasattr(self, "automatons"):
             for automaton in self.automatons:
-                automaton.scan(chunk)
+                self.profiler.call("scan", automaton.name, automaton.scan,
+                    chunk)
 
     def flush_chunk(self, chunk):
         """
@@ -501,12 +652,34 @@ class BravoFactory(Factory):
         """
 
         if chunk.is_damaged():
+            if self.shard:
+                self.shard.publish_damage(chunk)
+
             packet = chunk.get_damage_packet()
-            for player in self.protocols.itervalues():
-                if (chunk.x, chunk.z) in player.chunks:
-                    player.transport.write(packet)
+            self.broadcast_for_chunk(packet, chunk.x, chunk.z)
             chunk.clear_damage()
 
+    def automaton_pins(self):
+        """
+        Find the chunks in which automatons have pending work.
+
+        Automatons which keep the coordinates of blocks that they are waiting
+        to process in a ``tracked`` collection pin the chunks holding those
+        blocks.
+
+        :returns: set of chunk coordinates
+        """
+
+        pins = set()
+
+        if hasattr(self, "automatons"):
+            for automaton in self.automatons:
+                for coords in getattr(automaton, "tracked", ()):
+                    if isinstance(coords, tuple) and len(coords) == 3:
+                        pins.add((coords[0] // 16, coords[2] // 16))
+
+        return pins
+
     def flush_all_chunks(self):
         """
         Flush any damage anywhere in this world to all players.
@@ -540,10 +713,7 @@ class BravoFactory(Factory):
         while quantity > 0:
             entity = self.create_entity(x // 32, y // 32, z // 32, "Item",
                 item=block, quantity=min(quantity, 64))
-
-            packet = entity.save_to_packet()
-            packet += make_packet("create", eid=entity.eid)
-            self.broadcast(packet)
+            self.tracker.spawn(entity)
 
             quantity -= 64
 
@@ -563,12 +733,3 @@ class BravoFactory(Factory):
             distance = player.location.distance(p.location)
             if distance <= radius:
                 yield p.player
-
-    def pauseProducing(self):
-        pass
-
-    def resumeProducing(self):
-        pass
-
-    def stopProducing(self):
-        pass
@@ -1,14 +1,21 @@
 from collections import namedtuple
+from cStringIO import StringIO
+from struct import Struct as Packer, error as PackerError
 
 from construct import Struct, Container, Embed, Enum, MetaField
 from construct import MetaArray, If, Switch, Const, Peek, Magic
-from construct import OptionalGreedyRange, RepeatUntil
+from construct import RepeatUntil
 from construct import Flag, PascalString, Adapter
 from construct import UBInt8, UBInt16, UBInt32, UBInt64
 from construct import SBInt8, SBInt16, SBInt32
 from construct import BFloat32, BFloat64
 from construct import BitStruct, BitField
 from construct import StringAdapter, LengthValueAdapter, Sequence
+from construct import ConstructError, FieldError, MappingError, SwitchError
+from construct import FormatField, StaticField, MappingAdapter, Reconfig
+from construct import Pass
+
+from bravo.errors import BufferOverflow
 
 def IPacket(object):
     """
@@ -605,9 +612,19 @@ packets = {
     ),
     56: Struct("bulk-chunk",
         UBInt16("count"),
-        # Length
-        # Data
-        # metadata
+        UBInt32("length"),
+        Bool("sky"),
+        # The data for every chunk is compressed together as a single zlib
+        # stream, so it is left compressed here.
+        MetaField("data", lambda context: context["length"]),
+        MetaArray(lambda context: context["count"],
+            Struct("metadata",
+                SBInt32("x"),
+                SBInt32("z"),
+                UBInt16("primary"),
+                UBInt16("add"),
+            ),
+        ),
     ),
     # TODO: Needs work?
     60: Struct("explosion",
@@ -798,17 +815,209 @@ packets = {
     255: Struct("error", AlphaString("message")),
 }
 
-packet_stream = Struct("packet_stream",
-    OptionalGreedyRange(
-        Struct("full_packet",
-            UBInt8("header"),
-            Switch("payload", lambda context: context["header"], packets),
-        ),
-    ),
-    OptionalGreedyRange(
-        UBInt8("leftovers"),
-    ),
-)
+# Compiled parsers.
+# Parsing with construct is flexible, but slow; every field is its own
+# object, with its own stream read and its own context bookkeeping. Most
+# packets, and in particular all of the ones which clients send many times a
+# second, are just runs of fixed-size fields, so they are compiled down to a
+# handful of struct unpacks instead. The compiled parsers are built from the
+# construct definitions above, so the two can't drift apart, and they give
+# back exactly the same containers.
+
+_length = Packer(">H")
+
+def _flatten(con, path, leaves):
+    """
+    Walk a construct, appending its leaf fields to a list.
+
+    Each leaf is a tuple of (kind, path, format, mapping), where kind is
+    "fixed" for a fixed-size field or "string" for an ``AlphaString``.
+
+    :returns: whether the construct could be compiled
+    """
+
+    if isinstance(con, Reconfig) and con.conflags & con.FLAG_EMBED:
+        # Embedded structs put their fields into our container.
+        return _flatten(con.subcon, path[:-1], leaves)
+    elif isinstance(con, Struct):
+        for sc in con.subcons:
+            if sc.name is None:
+                return False
+            if not _flatten(sc, path + (sc.name,), leaves):
+                return False
+        return True
+    elif isinstance(con, FormatField):
+        leaves.append(("fixed", path, con.packer.format[-1], None))
+        return True
+    elif isinstance(con, MappingAdapter):
+        sc = con.subcon
+        if isinstance(sc, FormatField):
+            fmt = sc.packer.format[-1]
+        elif type(sc) is StaticField and sc.length == 1:
+            # Flags are single raw bytes.
+            fmt = "c"
+        else:
+            return False
+        leaves.append(("fixed", path, fmt, con))
+        return True
+    elif (isinstance(con, StringAdapter) and con.encoding == "ucs2" and
+          isinstance(con.subcon, DoubleAdapter)):
+        leaves.append(("string", path, None, None))
+        return True
+
+    return False
+
+def _shape(leaves):
+    """
+    Work out the nesting of containers for a list of leaves.
+
+    :returns: a list of (name, index) and (name, shape) pairs
+    """
+
+    shape = []
+    nested = {}
+
+    for i, (kind, path, fmt, mapping) in enumerate(leaves):
+        level = shape
+        for name in path[:-1]:
+            key = id(level), name
+            if key not in nested:
+                nested[key] = []
+                level.append((name, nested[key]))
+            level = nested[key]
+        level.append((path[-1], i))
+
+    return shape
+
+def _build_container(shape, values):
+    d = {}
+    for name, item in shape:
+        if type(item) is int:
+            d[name] = values[item]
+        else:
+            d[name] = _build_container(item, values)
+    return Container(**d)
+
+def compile_packet(con):
+    """
+    Compile a packet's construct into a faster parser.
+
+    The parser takes a buffer and an offset, and returns a tuple of the
+    parsed container and the offset of the next packet. Like construct, it
+    raises ``FieldError`` if the buffer is too short, and ``MappingError`` if
+    an enumerated field has an unknown value.
+
+    :returns: the parser, or None if the packet has fields, like arrays or
+        conditionals, which can't be compiled
+    """
+
+    leaves = []
+    if not _flatten(con, (), leaves):
+        return None
+
+    # Merge runs of fixed-size fields into single unpacks.
+    steps = []
+    fmt = ""
+    for kind, path, f, mapping in leaves:
+        if kind == "fixed":
+            fmt += f
+        else:
+            if fmt:
+                steps.append(Packer(">" + fmt))
+                fmt = ""
+            steps.append(None)
+    if fmt:
+        steps.append(Packer(">" + fmt))
+
+    mappings = [(i, leaf[3]) for i, leaf in enumerate(leaves) if leaf[3]]
+    shape = _shape(leaves)
+
+    # Packets which are a single run of fixed-size fields are by far the
+    # most common, so they get a shortcut.
+    if len(steps) == 1 and steps[0] is not None:
+        fixed = steps[0]
+    else:
+        fixed = None
+
+    def parse(buf, offset):
+        values = []
+
+        try:
+            if fixed:
+                values.extend(fixed.unpack_from(buf, offset))
+                offset += fixed.size
+            else:
+                for step in steps:
+                    if step is None:
+                        length = _length.unpack_from(buf, offset)[0] * 2
+                        offset += 2
+                        if len(buf) < offset + length:
+                            raise FieldError("expected %d bytes" % length)
+                        values.append(
+                            buf[offset:offset + length].decode("ucs2"))
+                        offset += length
+                    else:
+                        values.extend(step.unpack_from(buf, offset))
+                        offset += step.size
+        except PackerError, e:
+            raise FieldError(e)
+
+        for i, mapping in mappings:
+            value = values[i]
+            if value in mapping.decoding:
+                values[i] = mapping.decoding[value]
+            elif mapping.decdefault is NotImplemented:
+                raise MappingError("no decoding mapping for %r" % (value,))
+            elif mapping.decdefault is not Pass:
+                values[i] = mapping.decdefault
+
+        return _build_container(shape, values), offset
+
+    return parse
+
+_header = Packer(">B")
+
+compiled_packets = {}
+for header, con in packets.iteritems():
+    parser = compile_packet(con)
+    if parser is not None:
+        compiled_packets[header] = parser
+del header, con, parser
+
+def parse_packet(bytestream, offset=0):
+    """
+    Parse a single packet out of a raw bytestream.
+
+    The bytestream may be either a ``str`` or a ``bytearray``. Packets with
+    compiled parsers are parsed in place, without copying; the rest are
+    parsed by construct, from a copy of the remaining bytes.
+
+    :returns: a tuple of the packet header, the packet payload, and the offset
+        of the next packet
+    :raises: ``ConstructError`` if there isn't a complete, valid packet at
+        the offset
+    """
+
+    if offset >= len(bytestream):
+        raise FieldError("expected a packet header")
+
+    header = _header.unpack_from(bytestream, offset)[0]
+
+    if header in compiled_packets:
+        payload, offset = compiled_packets[header](bytestream, offset + 1)
+    elif header in packets:
+        # A stream over a bytearray keeps its buffer exported for as long as
+        # the stream lives, which includes any traceback of a failed parse,
+        # and an exported bytearray can't be resized. So construct is given
+        # a copy.
+        start = offset + 1
+        stream = StringIO(str(bytestream[start:]))
+        payload = packets[header].parse_stream(stream)
+        offset = start + stream.tell()
+    else:
+        raise SwitchError("unknown packet %d" % header)
+
+    return header, payload, offset
 
 def parse_packets(bytestream):
     """
@@ -819,10 +1028,17 @@ def parse_packets(bytestream):
     leftover unparseable bytes.
     """
 
-    container = packet_stream.parse(bytestream)
+    l = []
+    offset = 0
 
-    l = [(i.header, i.payload) for i in container.full_packet]
-    leftovers = "".join(chr(i) for i in container.leftovers)
+    while offset < len(bytestream):
+        try:
+            header, payload, offset = parse_packet(bytestream, offset)
+        except ConstructError:
+            break
+        l.append((header, payload))
+
+    leftovers = bytestream[offset:]
 
     if DUMP_ALL_PACKETS:
         for packet in l:
@@ -831,15 +1047,78 @@ def parse_packets(bytestream):
 
     return l, leftovers
 
-incremental_packet_stream = Struct("incremental_packet_stream",
-    Struct("full_packet",
-        UBInt8("header"),
-        Switch("payload", lambda context: context["header"], packets),
-    ),
-    OptionalGreedyRange(
-        UBInt8("leftovers"),
-    ),
-)
+class PacketBuffer(object):
+    """
+    An incremental receive buffer, which frames packets as data arrives.
+
+    Data is appended to a ``bytearray`` and packets are parsed in place from a
+    read offset, so neither receiving nor parsing copies the unread bytes.
+    Consumed bytes are only discarded once they make up at least half of the
+    buffer, which keeps the cost of compaction proportional to the data
+    received.
+
+    :ivar int limit: the most unparsed bytes which may be held at once
+    :ivar int offset: the position of the first unparsed byte
+    """
+
+    def __init__(self, limit=128 * 1024):
+        self.limit = limit
+
+        self.buf = bytearray()
+        self.offset = 0
+
+    def __len__(self):
+        return len(self.buf) - self.offset
+
+    def feed(self, data):
+        """
+        Receive some data.
+
+        :raises: ``BufferOverflow`` if the buffer would grow past its limit
+        """
+
+        if len(self) + len(data) > self.limit:
+            raise BufferOverflow("%d bytes buffered, limit is %d"
+                % (len(self) + len(data), self.limit))
+
+        self.buf.extend(data)
+
+    def packets(self):
+        """
+        Parse all of the complete packets which have been received.
+
+        Parsing stops at the first incomplete or invalid packet, which is
+        left in the buffer until more data arrives.
+
+        :returns: a list of tuples of packet header and payload
+        """
+
+        l = []
+        buf = self.buf
+        offset = self.offset
+
+        while offset < len(buf):
+            try:
+                header, payload, offset = parse_packet(buf, offset)
+            except ConstructError:
+                break
+            l.append((header, payload))
+
+        if offset == len(buf):
+            del buf[:]
+            offset = 0
+        elif offset * 2 >= len(buf):
+            del buf[:offset]
+            offset = 0
+
+        self.offset = offset
+
+        if DUMP_ALL_PACKETS:
+            for packet in l:
+                print "Parsed packet %d" % packet[0]
+                print packet[1]
+
+        return l
 
 def parse_packets_incrementally(bytestream):
     """
@@ -854,16 +1133,106 @@ def parse_packets_incrementally(bytestream):
     :returns: a generator yielding tuples of headers and payloads
     """
 
-    while bytestream:
-        parsed = incremental_packet_stream.parse(bytestream)
-        header = parsed.full_packet.header
-        payload = parsed.full_packet.payload
-        bytestream = "".join(chr(i) for i in parsed.leftovers)
+    offset = 0
+
+    while offset < len(bytestream):
+        header, payload, offset = parse_packet(bytestream, offset)
 
         yield header, payload
 
 packets_by_name = dict((v.name, k) for (k, v) in packets.iteritems())
 
+def compile_builder(header, con):
+    """
+    Compile a packet's construct into a faster builder.
+
+    The builder takes the packet's fields, positionally in the order in which
+    they are defined or by name, and returns the whole packet, header and
+    all. Packets which are a single run of fixed-size fields are packed with
+    a single ``struct.Struct``.
+
+    :returns: the builder, or None if the packet can't be compiled
+    """
+
+    leaves = []
+    if not _flatten(con, (), leaves):
+        return None
+
+    names = []
+    paths = []
+    for kind, path, fmt, mapping in leaves:
+        if path[0] not in names:
+            names.append(path[0])
+        paths.append((path[0], path[1:]))
+
+    mappings = [(i, leaf[3]) for i, leaf in enumerate(leaves) if leaf[3]]
+
+    # Split the fields into runs of fixed-size fields and strings. The
+    # header is folded into the first run.
+    steps = []
+    fmt = ">B"
+    count = 1
+    for kind, path, f, mapping in leaves:
+        if kind == "fixed":
+            fmt += f
+            count += 1
+        else:
+            steps.append((Packer(fmt), count))
+            fmt = ">"
+            count = 0
+            steps.append((None, 1))
+    steps.append((Packer(fmt), count))
+
+    if len(steps) == 1:
+        fixed = steps[0][0]
+    else:
+        fixed = None
+
+    def build(*args, **kwargs):
+        if args:
+            kwargs.update(zip(names, args))
+
+        values = []
+        for top, rest in paths:
+            value = kwargs[top]
+            for name in rest:
+                value = getattr(value, name)
+            values.append(value)
+
+        for i, mapping in mappings:
+            value = values[i]
+            if value in mapping.encoding:
+                values[i] = mapping.encoding[value]
+            elif mapping.encdefault is NotImplemented:
+                raise MappingError("no encoding mapping for %r" % (value,))
+            elif mapping.encdefault is not Pass:
+                values[i] = mapping.encdefault
+
+        if fixed:
+            return fixed.pack(header, *values)
+
+        values.insert(0, header)
+        pieces = []
+        i = 0
+        for packer, count in steps:
+            if packer is None:
+                data = values[i].encode("ucs2")
+                pieces.append(_length.pack(len(data) // 2))
+                pieces.append(data)
+            else:
+                pieces.append(packer.pack(*values[i:i + count]))
+            i += count
+        return "".join(pieces)
+
+    return build
+
+builders = {}
+for header, con in packets.iteritems():
+    builder = compile_builder(header, con)
+    if builder is not None:
+        builders[con.name] = builder
+del header, con, builder
+
 def make_packet(packet, *args, **kwargs):
     """
     Constructs a packet bytestream from a packet header and payload.
@@ -871,6 +1240,9 @@ def make_packet(packet, *args, **kwargs):
     The payload should be passed as keyword arguments. Additional containers
     or dictionaries to be added to the payload may be passed positionally, as
     well.
+
+    Packets with compiled builders are built with them; call the builders in
+    ``builders`` directly to skip the name lookup.
     """
 
     if packet not in packets_by_name:
@@ -881,14 +1253,40 @@ def make_packet(packet, *args, **kwargs):
 
     for arg in args:
         kwargs.update(dict(arg))
-    container = Container(**kwargs)
 
     if DUMP_ALL_PACKETS:
         print "Making packet %s (%d)" % (packet, header)
-        print container
+        print Container(**kwargs)
+
+    if packet in builders:
+        try:
+            return builders[packet](**kwargs)
+        except (KeyError, MappingError, PackerError):
+            # The payload is missing fields, or has values which don't fit.
+            # Let construct have a go, so that bad payloads fail in exactly
+            # the same way that they always have.
+            pass
+
+    container = Container(**kwargs)
     payload = packets[header].build(container)
     return chr(header) + payload
 
+_static_packets = {}
+
+def make_static_packet(packet, **kwargs):
+    """
+    Constructs a packet which never changes, like ``make_packet()``, but
+    only builds it once.
+
+    Only use this for packets with a small, fixed set of payloads; every
+    distinct packet is kept forever.
+    """
+
+    key = packet, tuple(sorted(kwargs.iteritems()))
+    if key not in _static_packets:
+        _static_packets[key] = make_packet(packet, **kwargs)
+    return _static_packets[key]
+
 def make_error_packet(message):
     """
     Convenience method to generate an error packet bytestream.
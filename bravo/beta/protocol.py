@@ -1,25 +1,29 @@
 # vim: set fileencoding=utf8 :
 
+from collections import deque
 from itertools import product, chain
 from time import time
 from urlparse import urlunparse
 
+from construct import ConstructError
 from twisted.internet import reactor
 from twisted.internet.defer import (DeferredList, inlineCallbacks,
                                     maybeDeferred, succeed)
-from twisted.internet.protocol import Protocol
-from twisted.internet.task import cooperate, deferLater, LoopingCall
-from twisted.internet.task import TaskDone, TaskFailed
+from twisted.internet.interfaces import IPushProducer
+from twisted.internet.protocol import ClientCreator, Protocol
+from twisted.internet.task import deferLater, LoopingCall
 from twisted.protocols.policies import TimeoutMixin
 from twisted.python import log
 from twisted.web.client import getPage
+from zope.interface import implements
 
 from bravo import version
+from bravo.beta.cork import CorkedTransport
 from bravo.beta.structures import BuildData, Settings
 from bravo.blocks import blocks, items
-from bravo.chunk import CHUNK_HEIGHT
+from bravo.chunk import CHUNK_HEIGHT, save_chunks_to_packet
 from bravo.entity import Sign
-from bravo.errors import BetaClientError, BuildError
+from bravo.errors import BetaClientError, BufferOverflow, BuildError
 from bravo.ibravo import (IChatCommand, IPreBuildHook, IPostBuildHook,
     IWindowOpenHook, IWindowClickHook, IWindowCloseHook,
     IPreDigHook, IDigHook, ISignHook, IUseHook)
@@ -27,13 +31,15 @@ from bravo.infini.factory import InfiniClientFactory
 from bravo.inventory.windows import InventoryWindow
 from bravo.location import Location, Orientation, Position
 from bravo.motd import get_motd
-from bravo.beta.packets import parse_packets, make_packet, make_error_packet
+from bravo.beta.packets import (PacketBuffer, make_packet, make_error_packet,
+                                parse_packet)
 from bravo.plugin import retrieve_plugins
 from bravo.policy.dig import dig_policies
 from bravo.utilities.coords import adjust_coords_for_face, split_coords
 from bravo.utilities.chat import complete, username_alternatives
-from bravo.utilities.maths import circling, clamp, sorted_by_distance
+from bravo.utilities.maths import clamp, sorted_by_distance
 from bravo.utilities.temporal import timestamp_from_clock
+from bravo.view import View
 
 # States of the protocol.
 (STATE_UNAUTHENTICATED, STATE_AUTHENTICATED, STATE_LOCATED) = range(3)
@@ -46,14 +52,19 @@ class BetaServerProtocol(object, Protocol, TimeoutMixin):
 
     This class is mostly designed to be a skeleton for featureful clients. It
     tries hard to not step on the toes of potential subclasses.
+
+    Protocols are push producers for their transports; when a client falls
+    behind on reading, the protocol is paused, and subclasses should hold
+    off on sending bulky data, like chunks, until it is resumed.
     """
 
+    implements(IPushProducer)
+
     excess = ""
     packet = None
 
     state = STATE_UNAUTHENTICATED
 
-    buf = ""
     parser = None
     handler = None
 
@@ -65,7 +76,48 @@ class BetaServerProtocol(object, Protocol, TimeoutMixin):
     _health = 20
     _latency = 0
 
+    ping_interval = 30
+    """
+    How often, in seconds, to send keepalives. If this is None, the protocol
+    won't send keepalives on its own.
+    """
+
+    max_buffered = 128 * 1024
+    """
+    The most received data, in bytes, which may be waiting to be parsed.
+    Clients which send more than this without completing a packet are
+    disconnected.
+    """
+
+    cork_threshold = 16 * 1024
+    """
+    How many bytes of outgoing packets may be held back to be written
+    together. If this is zero, writes are not coalesced at all, and there is
+    no flow control.
+    """
+
+    high_water = 256 * 1024
+    """
+    How many bytes may be waiting to be sent to the client before the
+    protocol is paused.
+    """
+
+    low_water = 64 * 1024
+    """
+    How few bytes must be waiting to be sent to the client before a paused
+    protocol is resumed.
+    """
+
+    max_backlog = 4 * 1024 * 1024
+    """
+    How many bytes may be waiting to be sent to the client before it is
+    disconnected for not keeping up.
+    """
+
+    paused = False
+
     def __init__(self):
+        self.buf = PacketBuffer(self.max_buffered)
         self.chunks = dict()
         self.windows = {}
         self.wid = 1
@@ -365,10 +417,21 @@ class BetaServerProtocol(object, Protocol, TimeoutMixin):
     # Please don't override these needlessly, as they are pretty solid and
     # shouldn't need to be touched.
 
+    def makeConnection(self, transport):
+        if self.cork_threshold:
+            transport = CorkedTransport(transport, self.cork_threshold,
+                self.high_water, self.low_water, self.max_backlog)
+            transport.registerProducer(self, True)
+        Protocol.makeConnection(self, transport)
+
     def dataReceived(self, data):
-        self.buf += data
+        try:
+            self.buf.feed(data)
+        except BufferOverflow, e:
+            self.error("Too much data: %s" % e)
+            return
 
-        packets, self.buf = parse_packets(self.buf)
+        packets = self.buf.packets()
 
         if packets:
             self.resetTimeout()
@@ -393,6 +456,31 @@ class BetaServerProtocol(object, Protocol, TimeoutMixin):
     def timeoutConnection(self):
         self.error("Connection timed out")
 
+    # IPushProducer methods, called by the transport to control the flow of
+    # data to the client.
+
+    def pauseProducing(self):
+        """
+        The client has fallen behind; stop sending it bulky data.
+        """
+
+        self.paused = True
+
+    def resumeProducing(self):
+        """
+        The client has caught up; bulky data may be sent again.
+        """
+
+        self.paused = False
+
+    def stopProducing(self):
+        """
+        The connection is going away; there is no point in sending anything
+        else.
+        """
+
+        self.paused = True
+
     # State-change callbacks
     # Feel free to override these, but call them at some point.
 
@@ -403,7 +491,8 @@ class BetaServerProtocol(object, Protocol, TimeoutMixin):
 
         self.state = STATE_AUTHENTICATED
 
-        self._ping_loop.start(30)
+        if self.ping_interval:
+            self._ping_loop.start(self.ping_interval)
 
     # Event callbacks
     # These are meant to be overriden.
@@ -458,13 +547,8 @@ class BetaServerProtocol(object, Protocol, TimeoutMixin):
         if self.state != STATE_LOCATED:
             return
 
-        x, y, z = self.location.pos
-        yaw, pitch = self.location.ori.to_fracs()
-
         # Inform everybody of our new location.
-        packet = make_packet("teleport", eid=self.player.eid, x=x, y=y, z=z,
-                yaw=yaw, pitch=pitch)
-        self.factory.broadcast_for_others(packet, self)
+        self.factory.movement.move(self.player.eid, self.location, self)
 
         # Inform ourselves of our new location.
         packet = self.location.save_to_packet()
@@ -669,6 +753,199 @@ class BetaProxyProtocol(BetaServerProtocol):
         log.err("Couldn't connect node!")
         log.err(reason)
 
+class ShardUpstream(Protocol):
+    """
+    A proxied client's connection to one of the workers of a sharded world.
+
+    Everything is relayed untouched, except that, when the client is being
+    handed off from another worker, the new worker's login packet is dropped;
+    the client has already logged in once, and can't do it again.
+    """
+
+    ready = False
+    """
+    Whether the worker's data is ready to be relayed to the client.
+    """
+
+    def __init__(self, proxy, handoff):
+        self.proxy = proxy
+        self.login = "" if handoff else None
+
+    def connectionMade(self):
+        self.transport.write(self.proxy.greeting)
+        if self.login is None:
+            self.ready = True
+        self.proxy.upstream_ready(self)
+
+    def dataReceived(self, data):
+        if self.login is not None:
+            self.login += data
+            try:
+                header, payload, offset = parse_packet(self.login)
+            except ConstructError:
+                return
+
+            if header == 1:
+                data = self.login[offset:]
+            else:
+                data = self.login
+            self.login = None
+            self.ready = True
+            self.proxy.upstream_ready(self)
+
+        if data:
+            self.proxy.relay(self, data)
+
+    def connectionLost(self, reason):
+        self.proxy.upstream_lost(self)
+
+class ShardProxyProtocol(BetaProxyProtocol):
+    """
+    A ``BetaProxyProtocol`` which proxies for a world that has been split
+    between several Bravo workers.
+
+    Only the handshake is parsed; afterwards, data is relayed untouched
+    between the client and the worker which owns the part of the world that
+    the player is standing in. When the player walks into another worker's
+    part of the world, the old worker hands it off over the shard bus, and
+    the client is switched over to the new worker. Data from the new worker
+    is held back until the old worker has finished, so that the client sees
+    the two streams in order.
+    """
+
+    # Workers coalesce their own writes, and do their own flow control.
+    cork_threshold = 0
+
+    greeting = None
+    upstream = None
+    incoming = None
+
+    def __init__(self):
+        BetaProxyProtocol.__init__(self)
+
+        self.held = []
+        self.pending = []
+
+    def dataReceived(self, data):
+        if self.greeting is None:
+            BetaProxyProtocol.dataReceived(self, data)
+            if self.greeting is not None and len(self.buf):
+                self.forward(str(self.buf.buf[self.buf.offset:]))
+        else:
+            self.forward(data)
+
+    def handshake(self, container):
+        self.username = container.username
+        self.greeting = make_packet("handshake", protocol=container.protocol,
+            username=container.username, host=container.host,
+            port=container.port)
+
+        # From here on, keeping the client alive is the workers' problem.
+        self.setTimeout(None)
+
+        self.factory.clients[self.username] = self
+        self.connect_shard(self.factory.entry, False)
+
+    def connect_shard(self, shard, handoff):
+        """
+        Open a connection to a worker.
+        """
+
+        host, port = self.factory.shards[shard]
+        creator = ClientCreator(reactor, self.make_upstream, handoff)
+        d = creator.connectTCP(host, port)
+
+        @d.addErrback
+        def eb(failure):
+            log.msg("Couldn't reach shard %d: %s" %
+                (shard, failure.getErrorMessage()))
+            self.error("That part of the world is unavailable.")
+
+        return d
+
+    def make_upstream(self, handoff):
+        upstream = ShardUpstream(self, handoff)
+        if handoff:
+            self.incoming = upstream
+        else:
+            self.upstream = upstream
+        return upstream
+
+    def switch(self, shard):
+        """
+        Switch this client over to another worker.
+        """
+
+        log.msg("Switching %s to shard %d" % (self.username, shard))
+        return self.connect_shard(shard, True)
+
+    def forward(self, data):
+        """
+        Send data from the client to its worker.
+        """
+
+        if self.upstream and self.upstream.ready and not self.incoming:
+            self.upstream.transport.write(data)
+        else:
+            self.pending.append(data)
+
+    def relay(self, upstream, data):
+        """
+        Send data from a worker to the client.
+        """
+
+        if upstream is self.upstream:
+            self.transport.write(data)
+        else:
+            self.held.append(data)
+
+    def upstream_ready(self, upstream):
+        if upstream is self.upstream:
+            self.flush_pending()
+        else:
+            self.promote()
+
+    def upstream_lost(self, upstream):
+        if upstream is self.upstream:
+            self.upstream = None
+            if self.incoming:
+                self.promote()
+            else:
+                self.transport.loseConnection()
+        elif upstream is self.incoming:
+            self.incoming = None
+            self.transport.loseConnection()
+
+    def promote(self):
+        """
+        Finish switching to a new worker, once the old worker has gone and the
+        new one has finished logging in.
+        """
+
+        if self.upstream or not self.incoming or not self.incoming.ready:
+            return
+
+        self.upstream, self.incoming = self.incoming, None
+
+        held, self.held = self.held, []
+        self.transport.write("".join(held))
+        self.flush_pending()
+
+    def flush_pending(self):
+        if self.pending:
+            pending, self.pending = self.pending, []
+            self.upstream.transport.write("".join(pending))
+
+    def connectionLost(self, reason):
+        BetaProxyProtocol.connectionLost(self, reason)
+
+        if self.factory.clients.get(self.username) is self:
+            del self.factory.clients[self.username]
+
+        for upstream in self.upstream, self.incoming:
+            if upstream:
+                upstream.transport.loseConnection()
+
 
 class BravoProtocol(BetaServerProtocol):
     """
@@ -678,17 +955,41 @@ class BravoProtocol(BetaServerProtocol):
     something very much like it.
     """
 
-    chunk_tasks = None
+    chunk_request = None
 
-    time_loop = None
+    chunks_per_packet = 10
+    """
+    The most chunks to send at once in a single bulk chunk packet.
+    """
+
+    chunks_per_tick = 10
+    """
+    The most chunks to send to the client in each tick.
+    """
+
+    # Keepalives and time updates are sent by the factory's ticker.
+    ping_interval = None
 
     eid = 0
 
     last_dig = None
 
+    arrived = False
+    """
+    Whether this player was handed off to this shard by another.
+    """
+
+    handed_off = False
+    """
+    Whether this player is being handed off to another shard.
+    """
+
     def __init__(self, config, name):
         BetaServerProtocol.__init__(self)
 
+        self.view = View()
+        self.chunk_queue = deque()
+
         self.config = config
         self.config_name = "world %s" % name
 
@@ -736,6 +1037,9 @@ class BravoProtocol(BetaServerProtocol):
                 self.error("Your username is already taken.")
                 return False
 
+        if self.factory.shard:
+            self.arrived = self.factory.shard.admit(self)
+
         return True
 
     @inlineCallbacks
@@ -752,29 +1056,17 @@ class BravoProtocol(BetaServerProtocol):
         # *Now* we are in our factory's list of protocols. Be aware.
         self.factory.protocols[self.username] = self
 
-        # Announce our presence.
-        self.factory.chat("%s is joining the game..." % self.username)
+        # Announce our presence, unless we've only walked over from another
+        # shard.
+        if not self.arrived:
+            self.factory.chat("%s is joining the game..." % self.username)
         packet = make_packet("players", name=self.username, online=True,
                              ping=0)
         self.factory.broadcast(packet)
 
-        # Craft our avatar and send it to already-connected other players.
-        packet = make_packet("create", eid=self.player.eid)
-        packet += self.player.save_to_packet()
-        self.factory.broadcast_for_others(packet, self)
-
-        # And of course spawn all of those players' avatars in our client as
-        # well.
-        for protocol in self.factory.protocols.itervalues():
-            # Skip over ourselves; otherwise, the client tweaks out and
-            # usually either dies or locks up.
-            if protocol is self:
-                continue
-
-            self.write_packet("create", eid=protocol.player.eid)
-            packet = protocol.player.save_to_packet()
-            packet += protocol.player.save_equipment_to_packet()
-            self.transport.write(packet)
+        # Show our avatar to the other players nearby. Their avatars will be
+        # shown to us by the tracker once we have some chunks loaded.
+        self.factory.tracker.spawn(self.player)
 
         # Send spawn and inventory.
         spawn = self.factory.world.level.spawn
@@ -787,17 +1079,16 @@ class BravoProtocol(BetaServerProtocol):
 
         self.send_initial_chunk_and_location()
 
-        self.time_loop = LoopingCall(self.update_time)
-        self.time_loop.start(10)
+        # Send the time now; the factory will keep us up-to-date afterwards.
+        self.update_time()
 
     def orientation_changed(self):
         # Bang your head!
-        yaw, pitch = self.location.ori.to_fracs()
-        packet = make_packet("entity-orientation", eid=self.player.eid,
-                yaw=yaw, pitch=pitch)
-        self.factory.broadcast_for_others(packet, self)
+        self.factory.movement.move(self.player.eid, self.location, self)
 
     def position_changed(self):
+        self.factory.movement.move(self.player.eid, self.location, self)
+
         # Send chunks.
         self.update_chunks()
 
@@ -813,8 +1104,7 @@ class BravoProtocol(BetaServerProtocol):
                 else:
                     packet = make_packet("collect", eid=entity.eid,
                         destination=self.player.eid)
-                    packet += make_packet("destroy", count=1, eid=[entity.eid])
-                    self.factory.broadcast(packet)
+                    self.factory.tracker.broadcast(entity.eid, packet)
                     self.factory.destroy_entity(entity)
 
                 packet = self.inventory.save_to_packet()
@@ -867,8 +1157,13 @@ class BravoProtocol(BetaServerProtocol):
                 def eb(error):
                     self.write_packet("chat", message="Error: %s" %
                         error.getErrorMessage())
-                d = maybeDeferred(commands[command].chat_command,
-                                  self.username, params)
+
+                # Commands are usually generators, which do all of their work
+                # while they are being iterated, so they are iterated inside
+                # the timed call.
+                plugin = commands[command]
+                d = self.factory.profiler.call_deferred("command", plugin.name,
+                    lambda: list(plugin.chat_command(self.username, params)))
                 d.addCallback(cb)
                 d.addErrback(eb)
             else:
@@ -889,7 +1184,8 @@ class BravoProtocol(BetaServerProtocol):
         for entity in chain(self.entities_near(4), nearby_players):
             if entity.eid == container.target:
                 for hook in self.use_hooks[entity.name]:
-                    hook.use_hook(self.factory, self.player, entity,
+                    self.factory.profiler.call("use_hook", hook.name,
+                        hook.use_hook, self.factory, self.player, entity,
                         container.button == 0)
                 break
 
@@ -925,7 +1221,7 @@ class BravoProtocol(BetaServerProtocol):
                             count=1,
                             secondary=0
                         )
-                        self.factory.broadcast_for_others(packet, self)
+                        self.factory.tracker.broadcast(self.player.eid, packet)
             return
 
         if container.state == "shooting":
@@ -946,8 +1242,9 @@ class BravoProtocol(BetaServerProtocol):
         if container.state == "started":
             # Run pre dig hooks
             for hook in self.pre_dig_hooks:
-                cancel = yield maybeDeferred(hook.pre_dig_hook, self.player,
-                            (container.x, container.y, container.z), block)
+                cancel = yield self.factory.profiler.call_deferred(
+                    "pre_dig_hook", hook.name, hook.pre_dig_hook, self.player,
+                    (container.x, container.y, container.z), block)
                 if cancel:
                     return
 
@@ -989,7 +1286,8 @@ class BravoProtocol(BetaServerProtocol):
 
         l = []
         for hook in self.dig_hooks:
-            l.append(maybeDeferred(hook.dig_hook, chunk, x, y, z, block))
+            l.append(self.factory.profiler.call_deferred("dig_hook",
+                hook.name, hook.dig_hook, chunk, x, y, z, block))
 
         dl = DeferredList(l)
         dl.addCallback(lambda none: self.factory.flush_chunk(chunk))
@@ -1042,8 +1340,9 @@ class BravoProtocol(BetaServerProtocol):
 
         # Try to open it first
         for hook in self.open_hooks:
-            window = yield maybeDeferred(hook.open_hook, self, container,
-                           chunk.get_block((smallx, container.y, smallz)))
+            window = yield self.factory.profiler.call_deferred(
+                "open_hook", hook.name, hook.open_hook, self, container,
+                chunk.get_block((smallx, container.y, smallz)))
             if window:
                 self.write_packet("window-open", wid=window.wid,
                     type=window.identifier, title=window.title,
@@ -1082,8 +1381,10 @@ class BravoProtocol(BetaServerProtocol):
             container.z, container.face)
 
         for hook in self.pre_build_hooks:
-            cont, builddata, cancel = yield maybeDeferred(hook.pre_build_hook,
-                self.player, builddata)
+            profiler = self.factory.profiler
+            cont, builddata, cancel = yield profiler.call_deferred(
+                "pre_build_hook", hook.name, hook.pre_build_hook, self.player,
+                builddata)
             if cancel:
                 # Flush damaged chunks.
                 for chunk in self.chunks.itervalues():
@@ -1106,13 +1407,15 @@ class BravoProtocol(BetaServerProtocol):
         # interfere with the build process, largely because the build process
         # already happened.
         for hook in self.post_build_hooks:
-            yield maybeDeferred(hook.post_build_hook, self.player, coords,
+            yield self.factory.profiler.call_deferred("post_build_hook",
+                hook.name, hook.post_build_hook, self.player, coords,
                 builddata.block)
 
         # Feed automatons.
         for automaton in self.factory.automatons:
             if newblock in automaton.blocks:
-                automaton.feed(coords)
+                self.factory.profiler.call("feed", automaton.name,
+                    automaton.feed, coords)
 
         # Re-send inventory.
         # XXX this could be optimized if/when inventories track damage.
@@ -1175,7 +1478,7 @@ class BravoProtocol(BetaServerProtocol):
             count=1,
             secondary=secondary
         )
-        self.factory.broadcast_for_others(packet, self)
+        self.factory.tracker.broadcast(self.player.eid, packet)
 
     def pickup(self, container):
         self.factory.give((container.x, container.y, container.z),
@@ -1188,7 +1491,7 @@ class BravoProtocol(BetaServerProtocol):
             eid=self.player.eid,
             animation=container.animation
         )
-        self.factory.broadcast_for_others(packet, self)
+        self.factory.tracker.broadcast(self.player.eid, packet)
 
     def wclose(self, container):
         wid = container.wid
@@ -1234,7 +1537,7 @@ class BravoProtocol(BetaServerProtocol):
                     count=1,
                     secondary=container.secondary,
                 )
-                self.factory.broadcast_for_others(packet, self)
+                self.factory.tracker.broadcast(self.player.eid, packet)
 
     def shoot_arrow(self):
         # TODO 1. Create arrow entity:          arrow = Arrow(self.factory, self.player)
@@ -1273,8 +1576,9 @@ class BravoProtocol(BetaServerProtocol):
 
         # Run sign hooks.
         for hook in self.sign_hooks:
-            hook.sign_hook(self.factory, chunk, container.x, container.y,
-                container.z, [s.text1, s.text2, s.text3, s.text4], new)
+            self.factory.profiler.call("sign_hook", hook.name, hook.sign_hook,
+                self.factory, chunk, container.x, container.y, container.z,
+                [s.text1, s.text2, s.text3, s.text4], new)
 
     def complete(self, container):
         """
@@ -1307,10 +1611,11 @@ class BravoProtocol(BetaServerProtocol):
 
         # Remove the chunk from cache.
         chunk = self.chunks.pop(key)
+        self.factory.unsubscribe_chunk(self, x, z)
 
+        # The client won't keep the chunk's entities around without it.
         eids = [e.eid for e in chunk.entities]
-
-        self.write_packet("destroy", count=len(eids), eid=eids)
+        self.factory.tracker.hide(self, eids)
 
         # Clear chunk data on the client.
         self.write_packet("chunk", x=x, z=z, continuous=False, primary=0x0,
@@ -1338,20 +1643,75 @@ class BravoProtocol(BetaServerProtocol):
         @d.addCallback
         def cb(chunk):
             self.chunks[x, z] = chunk
+            # The connection might have been lost while the chunk was being
+            # generated; don't resurrect our subscription in that case.
+            if hasattr(self, "factory"):
+                self.factory.subscribe_chunk(self, x, z)
             return chunk
         d.addCallback(self.send_chunk)
 
         return d
 
+    def enable_chunks(self, coords):
+        """
+        Request several chunks at once.
+
+        The chunks are obtained in a single batch and sent together on the
+        wire, in the order in which they were requested.
+
+        :returns: `Deferred` that will be fired when the chunks are obtained,
+                  with no arguments
+        """
+
+        coords = [key for key in coords if key not in self.chunks]
+
+        if not coords:
+            return succeed(None)
+
+        log.msg("Enabling %d chunks" % len(coords))
+
+        d = self.factory.world.request_chunks(coords)
+
+        @d.addCallback
+        def cb(chunks):
+            # Chunks that showed up some other way in the meantime have
+            # already been sent, and chunks which have gone out of view in the
+            # meantime aren't needed any longer.
+            chunks = [chunks[key] for key in coords
+                if key not in self.chunks and key in self.view]
+            for chunk in chunks:
+                self.chunks[chunk.x, chunk.z] = chunk
+                if hasattr(self, "factory"):
+                    self.factory.subscribe_chunk(self, chunk.x, chunk.z)
+            if chunks:
+                self.send_chunks(chunks)
+
+        return d
+
     def send_chunk(self, chunk):
         log.msg("Sending chunk %d, %d" % (chunk.x, chunk.z))
 
         packet = chunk.save_to_packet()
         self.transport.write(packet)
 
-        for entity in chunk.entities:
-            packet = entity.save_to_packet()
-            self.transport.write(packet)
+        self.send_chunk_contents(chunk)
+
+    def send_chunks(self, chunks):
+        log.msg("Sending %d chunks" % len(chunks))
+
+        packet = save_chunks_to_packet(chunks)
+        self.transport.write(packet)
+
+        for chunk in chunks:
+            self.send_chunk_contents(chunk)
+
+    def send_chunk_contents(self, chunk):
+        """
+        Send the signs in a chunk.
+
+        The chunk's entities are spawned by the factory's entity tracker,
+        once they are in range.
+        """
 
         for entity in chunk.tiles.itervalues():
             if entity.name == "Sign":
@@ -1422,31 +1782,59 @@ class BravoProtocol(BetaServerProtocol):
 
         radius = distances.get(self.settings.distance, 8)
 
-        new = set(circling(x, z, radius))
-        old = set(self.chunks.iterkeys())
-        added = new - old
-        discarded = old - new
-
-        # Perhaps some explanation is in order.
-        # The cooperate() function iterates over the iterable it is fed,
-        # without tying up the reactor, by yielding after each iteration. The
-        # inner part of the generator expression generates all of the chunks
-        # around the currently needed chunk, and it sorts them by distance to
-        # the current chunk. The end result is that we load chunks one-by-one,
-        # nearest to furthest, without stalling other clients.
-        if self.chunk_tasks:
-            for task in self.chunk_tasks:
-                try:
-                    task.stop()
-                except (TaskDone, TaskFailed):
-                    pass
-
-        to_enable = sorted_by_distance(added, x, z)
-
-        self.chunk_tasks = [
-            cooperate(self.enable_chunk(i, j) for i, j in to_enable),
-            cooperate(self.disable_chunk(i, j) for i, j in discarded),
-        ]
+        # Nothing changes until we cross into another chunk or change our
+        # view distance, which keeps this cheap enough to run on every
+        # position packet.
+        delta = self.view.move(x, z, radius)
+        if delta is None:
+            return
+
+        added, removed = delta
+
+        # Chunks are queued nearest first and sent a few at a time by
+        # send_queued_chunks(). Anything already queued which is still in
+        # view stays queued.
+        queued = [key for key in self.chunk_queue if key in self.view]
+        queued.extend(key for key in added if key not in self.chunks)
+        self.chunk_queue = deque(sorted_by_distance(queued, x, z))
+
+        for i, j in removed:
+            if (i, j) in self.chunks:
+                self.disable_chunk(i, j)
+
+    def send_queued_chunks(self):
+        """
+        Send the next few queued chunks.
+
+        This is called once per tick by the factory. Nothing is sent while a
+        previous request is still loading, or while the client is behind on
+        reading.
+        """
+
+        if self.paused or self.chunk_request or not self.chunk_queue:
+            return
+
+        coords = []
+        while self.chunk_queue and len(coords) < self.chunks_per_tick:
+            coords.append(self.chunk_queue.popleft())
+
+        step = self.chunks_per_packet
+        batches = [coords[i:i + step] for i in xrange(0, len(coords), step)]
+        self.chunk_request = DeferredList(
+            [self.enable_chunks(batch) for batch in batches],
+            consumeErrors=True)
+
+        @self.chunk_request.addCallback
+        def cb(results):
+            for success, result in results:
+                if not success:
+                    log.err(result, "Couldn't send chunks")
+            self.chunk_request = None
+
+    def stopProducing(self):
+        BetaServerProtocol.stopProducing(self)
+
+        self.chunk_queue.clear()
 
     def update_time(self):
         time = int(self.factory.time)
@@ -1469,14 +1857,13 @@ class BravoProtocol(BetaServerProtocol):
 
         if self.player:
             self.factory.destroy_entity(self.player)
-            packet = make_packet("destroy", count=1, eid=[self.player.eid])
-            self.factory.broadcast(packet)
 
         if self.username:
             packet = make_packet("players", name=self.username, online=False,
                 ping=0)
             self.factory.broadcast(packet)
-            self.factory.chat("%s has left the game." % self.username)
+            if not self.handed_off:
+                self.factory.chat("%s has left the game." % self.username)
 
         self.factory.teardown_protocol(self)
 
@@ -1484,12 +1871,4 @@ class BravoProtocol(BetaServerProtocol):
         # factory stuff, just our own personal stuff.
         del self.factory
 
-        if self.time_loop:
-            self.time_loop.stop()
-
-        if self.chunk_tasks:
-            for task in self.chunk_tasks:
-                try:
-                    task.stop()
-                except (TaskDone, TaskFailed):
-                    pass
+        self.chunk_queue.clear()
@@ -4,13 +4,20 @@ from itertools import product
 from struct import pack
 from warnings import warn
 
+from construct import Container
+
 from bravo.blocks import blocks, glowing_blocks
 from bravo.beta.packets import make_packet
-from bravo.geometry.section import Section
+from bravo.geometry.section import Section, identity
 from bravo.utilities.bits import pack_nibbles
 from bravo.utilities.coords import CHUNK_HEIGHT, XZ, iterchunk
 from bravo.utilities.maths import clamp
 
+# A translation table which keeps blocks which let no light through, and turns
+# every other block into air, for finding the tallest opaque blocks.
+opaque = "".join(chr(i) if i not in blocks or blocks[i].dim >= 16 else "\0"
+    for i in range(256))
+
 class ChunkWarning(Warning):
     """
     Somebody did something inappropriate to this chunk, but it probably isn't
@@ -181,6 +188,30 @@ def neighboring_light(glow, block):
 
     return clamp(glow - blocks[block].dim, 0, 15)
 
+def save_chunks_to_packet(chunks):
+    """
+    Generate a single bulk chunk packet for several chunks.
+
+    All of the chunks' data is compressed together, which is both smaller and
+    cheaper than compressing each chunk separately.
+
+    :param list chunks: the chunks to send
+    """
+
+    packed = []
+    metadata = []
+
+    for chunk in chunks:
+        mask, data = chunk.pack_sections()
+        packed.append(data)
+        metadata.append(Container(x=chunk.x, z=chunk.z, primary=mask,
+            add=0x0))
+
+    data = "".join(packed).encode("zlib")
+
+    return make_packet("bulk-chunk", count=len(metadata), length=len(data),
+        sky=True, data=data, metadata=metadata)
+
 class Chunk(object):
     """
     A chunk of blocks.
@@ -193,11 +224,14 @@ class Chunk(object):
     :cvar bool dirty: Whether this chunk needs to be flushed to disk.
     :cvar bool populated: Whether this chunk has had its initial block data
         filled out.
+    :cvar str season: The name of the season which was last applied to this
+        chunk, if any.
     """
 
     all_damaged = False
     dirty = True
     populated = False
+    season = None
 
     def __init__(self, x, z):
         """
@@ -230,22 +264,98 @@ class Chunk(object):
 
     __str__ = __repr__
 
-    def regenerate_heightmap(self):
+    def regenerate_heightmap(self, columns=None):
         """
         Regenerate the height map array.
 
         The height map is merely the position of the tallest block in any
+        xz-column. Empty columns have a height of zero.
+
+        :param columns: indices into the heightmap of the columns to
+            regenerate, or None for all of them
+        """
+
+        if columns is None:
+            columns = range(16 * 16)
+
+        tops = self._column_tops(columns)
+        for column in columns:
+            self.heightmap[column] = tops.get(column, (0, 0))[0]
+
+    def opaque_heightmap(self):
+        """
+        Find the tallest block which lets no light through in every
         xz-column.
+
+        Unlike the heightmap, this map isn't kept up to date; it is built
+        anew on every call.
+
+        :returns: array.array of heights, indexed like the heightmap; columns
+            without any opaque blocks have a height of zero
         """
 
-        for x in range(16):
-            for z in range(16):
-                column = x * 16 + z
-                for y in range(255, -1, -1):
-                    if self.get_block((x, y, z)):
-                        break
+        heightmap = array("B", [0] * (16 * 16))
+        for column, (height, block) in self._column_tops(range(16 * 16),
+                                                         opaque).iteritems():
+            heightmap[column] = height
+        return heightmap
 
-                self.heightmap[column] = y
+    def top_blocks(self):
+        """
+        Find the tallest block in every xz-column.
+
+        :returns: list of (height, block) tuples, indexed like the heightmap;
+            empty columns are (0, 0)
+        """
+
+        tops = [(0, 0)] * (16 * 16)
+        for column, top in self._column_tops(range(16 * 16)).iteritems():
+            tops[column] = top
+        return tops
+
+    def _column_tops(self, columns, table=identity):
+        """
+        Find the tallest block in some xz-columns.
+
+        Sections are searched from the top down, skipping empty sections, and
+        each column is found by stripping the air off of the top of its
+        slice of the section.
+
+        :param columns: indices into the heightmap of the columns to search
+        :param str table: translation table applied to the blocks before
+            searching; blocks which it turns into air are passed over
+        :returns: dict of (height, block) tuples, by column, for the columns
+            which aren't empty
+        """
+
+        tops = {}
+        remaining = set(columns)
+
+        # Checking and copying whole sections only pays off when there are
+        # enough columns to search; a few columns are cheaper to slice out.
+        whole = len(remaining) > 16
+
+        for index in range(len(self.sections) - 1, -1, -1):
+            if not remaining:
+                break
+
+            data = self.sections[index].blocks
+            if whole:
+                if data.count(0) == len(data):
+                    continue
+                data = data.tostring().translate(table)
+
+            for column in list(remaining):
+                x, z = divmod(column, 16)
+                top = data[z * 16 + x::256]
+                if not whole:
+                    top = top.tostring().translate(table)
+                top = top.rstrip("\0")
+                if top:
+                    tops[column] = index * 16 + len(top) - 1, ord(top[-1])
+                    remaining.discard(column)
+
+        return tops
 
     def regenerate_blocklight(self):
         lightmap = array("L", [0] * (16 * 16 * CHUNK_HEIGHT))
@@ -423,6 +533,20 @@ class Chunk(object):
         Generate a chunk packet.
         """
 
+        mask, data = self.pack_sections()
+
+        packet = make_packet("chunk", x=self.x, z=self.z, continuous=True,
+                primary=mask, add=0x0, data=data)
+        return packet
+
+    def pack_sections(self):
+        """
+        Pack this chunk's sections into their wire format, uncompressed.
+
+        :returns: tuple of the bitmask of non-empty sections, and the packed
+            data
+        """
+
         mask = 0
         packed = []
 
@@ -448,9 +572,7 @@ class Chunk(object):
         # Fake the biome data.
         packed.append("\x00" * 256)
 
-        packet = make_packet("chunk", x=self.x, z=self.z, continuous=True,
-                primary=mask, add=0x0, data="".join(packed))
-        return packet
+        return mask, "".join(packed)
 
     @check_bounds
     def get_block(self, coords):
@@ -491,14 +613,10 @@ class Chunk(object):
             if block:
                 self.heightmap[column] = max(self.heightmap[column], y)
             else:
-                # If we replace the highest block with air, we need to go
-                # through all blocks below it to find the new top block.
-                height = self.heightmap[column]
-                if y == height:
-                    for y in range(height, -1, -1):
-                        if self.get_block((x, y, z)):
-                            break
-                    self.heightmap[column] = y
+                # If we replace the highest block with air, the new top
+                # block is somewhere below it.
+                if y == self.heightmap[column]:
+                    self.regenerate_heightmap([column])
 
             # Do the blocklight at this coordinate, if appropriate.
             if block in glowing_blocks:
@@ -595,6 +713,74 @@ class Chunk(object):
         self.set_block(coords, block.replace)
         self.set_metadata(coords, 0)
 
+    def _spans(self, bottom, top):
+        """
+        Split a range of heights between the sections it covers.
+
+        :returns: iterable of sections, and the range of heights within each
+        """
+
+        bottom = max(bottom, 0)
+        top = min(top, CHUNK_HEIGHT)
+
+        for index in range(bottom // 16, (top + 15) // 16):
+            base = index * 16
+            yield (self.sections[index], max(bottom - base, 0),
+                min(top - base, 16))
+
+    def fill_column(self, x, z, bottom, top, block):
+        """
+        Fill part of an xz-column with a block.
+
+        The column is filled from ``bottom`` up to, but not including,
+        ``top``, straight into the chunk's sections. This is much faster than
+        setting the blocks one by one, but skips all of the bookkeeping done
+        by ``set_block()``; the heightmap, lighting, and damage are not
+        updated. It is meant for terrain generators, which work on chunks
+        before they are populated.
+
+        :param int x: X coordinate
+        :param int z: Z coordinate
+        :param int bottom: lowest height to fill
+        :param int top: height to fill up to
+        :param int block: block type
+        """
+
+        for section, low, high in self._spans(bottom, top):
+            section.fill_column(x, z, low, high, block)
+
+    def fill_slab(self, bottom, top, block, replace=None):
+        """
+        Fill whole layers of the chunk with a block.
+
+        Like ``fill_column()``, this is meant for terrain generators.
+
+        :param int bottom: lowest height to fill
+        :param int top: height to fill up to
+        :param int block: block type
+        :param int replace: if given, only blocks of this type are filled
+        """
+
+        for section, low, high in self._spans(bottom, top):
+            section.fill_layers(low, high, block, replace)
+
+    def set_layer(self, heights, block):
+        """
+        Set a block in every xz-column, at heights taken from a heightmap.
+
+        Like ``fill_column()``, this is meant for terrain generators.
+
+        :param heights: heights, in the same order as the chunk's
+            heightmap; columns with a height of None are skipped
+        :param int block: block type
+        """
+
+        sections = self.sections
+
+        for (x, z), y in zip(XZ, heights):
+            if y is not None and 0 <= y < CHUNK_HEIGHT:
+                sections[y // 16].set_block((x, y % 16, z), block)
+
     def height_at(self, x, z):
         """
         Get the height of an xz-column of blocks.
@@ -619,8 +805,7 @@ class Chunk(object):
         """
 
         for section in self.sections:
-            for i, block in enumerate(section.blocks):
-                if block == search:
-                    section.blocks[i] = replace
-                    self.all_damaged = True
-                    self.dirty = True
+            if search in section.blocks:
+                section.fill_layers(0, 16, replace, search)
+                self.all_damaged = True
+                self.dirty = True
@@ -1,6 +1,5 @@
 from random import uniform
 
-from twisted.internet.task import LoopingCall
 from twisted.python import log
 
 from bravo.inventory import Inventory
@@ -12,6 +11,7 @@ from bravo.utilities.maths import clamp
 from bravo.utilities.furnace import (furnace_recipes, furnace_on_off,
     update_all_windows_slot, update_all_windows_progress)
 from bravo.blocks import furnace_fuel, unstackable
+from bravo.ticker import PHASE_TILES
 
 class Entity(object):
     """
@@ -199,7 +199,6 @@ class Mob(Entity):
         This method calls super().
         """
 
-        self.loop = None
         super(Mob, self).__init__(**kwargs)
         self.manager = None
 
@@ -217,16 +216,15 @@ class Mob(Entity):
 
     def run(self):
         """
-        Start this mob's update loop.
+        Prepare this mob for updates.
+
+        The updates themselves are driven by the mob's manager.
         """
 
         # Save the current chunk coordinates of this mob. They will be used to
         # track which chunk this mob belongs to.
         self.chunk_coords = self.location.pos
 
-        self.loop = LoopingCall(self.update)
-        self.loop.start(.2)
-
     def save_to_packet(self):
         """
         Create a "mob" packet representing this entity.
@@ -290,10 +288,10 @@ class Mob(Entity):
             self.location.pos = new_position
 
             self.manager.correct_origin_chunk(self)
-            self.manager.broadcast(self.save_location_to_packet())
+            self.manager.broadcast_location(self)
         else:
             self.slide = self.manager.slide_vector(vector)
-            self.manager.broadcast(self.save_location_to_packet())
+            self.manager.broadcast_location(self)
 
 
 class Chuck(Mob):
@@ -568,11 +566,16 @@ class Furnace(Tile):
     cooktime = 0
     running = False
 
+    burning = None
+    """
+    The handle for this furnace's burning loop on the factory's ticker, if
+    the furnace has been started.
+    """
+
     def __init__(self, *args, **kwargs):
         super(Furnace, self).__init__(*args, **kwargs)
 
         self.inventory = FurnaceStorage()
-        self.burning = LoopingCall.withCount(self.burn)
 
     def changed(self, factory, coords):
         '''
@@ -600,12 +603,31 @@ class Furnace(Tile):
                 # usually means that the furnace was serialized while burning.
                 self.running = True
                 self.burn_max = self.burntime
-                self.burning.start(0.5)
+                self.start_burning()
             elif self.has_fuel() and self.can_craft():
                 # This furnace could be burning, but isn't. Let's start it!
                 self.burntime = 0
                 self.cooktime = 0
-                self.burning.start(0.5)
+                self.start_burning()
+
+    def start_burning(self):
+        """
+        Register this furnace's ``burn`` loop with the factory's ticker.
+        """
+
+        self.burning = self.factory.ticker.add_seconds(self.burn, 0.5,
+            name="furnace", order=PHASE_TILES, with_count=True, now=True)
+
+    def stop_burning(self):
+        """
+        Take this furnace off of the factory's ticker without touching its
+        fuel or progress, so that it can be started again later.
+        """
+
+        if self.burning is not None and self.burning.running:
+            self.burning.stop()
+        self.burning = None
+        self.running = False
 
     def burn(self, ticks):
         '''
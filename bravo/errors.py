@@ -51,6 +51,12 @@ class BuildError(BetaClientError):
     Something went wrong with a client's build step.
     """
 
+class BufferOverflow(BetaClientError):
+    """
+    A client sent more data than can be buffered while waiting for a
+    complete packet.
+    """
+
 # Errors from the world.
 
 class ChunkNotLoaded(Exception):
@@ -10,6 +10,10 @@ def si(x, y, z):
 
     return (y * 16 + z) * 16 + x
 
+# A translation table which changes nothing, for building tables which replace
+# one block with another.
+identity = "".join(chr(i) for i in range(256))
+
 
 class Section(object):
     """
@@ -27,6 +31,33 @@ class Section(object):
     def set_block(self, coords, block):
         self.blocks[si(*coords)] = block
 
+    def fill_column(self, x, z, bottom, top, block):
+        """
+        Fill part of a column with a block, from ``bottom`` up to, but not
+        including, ``top``.
+        """
+
+        if top > bottom:
+            self.blocks[si(x, bottom, z):si(x, top - 1, z) + 1:256] = (
+                array("B", [block]) * (top - bottom))
+
+    def fill_layers(self, bottom, top, block, replace=None):
+        """
+        Fill whole layers with a block, from ``bottom`` up to, but not
+        including, ``top``.
+
+        If ``replace`` is given, only blocks of that type are filled.
+        """
+
+        start, stop = bottom * 256, top * 256
+
+        if replace is None:
+            self.blocks[start:stop] = array("B", [block]) * (stop - start)
+        else:
+            table = identity[:replace] + chr(block) + identity[replace + 1:]
+            self.blocks[start:stop] = array("B",
+                self.blocks[start:stop].tostring().translate(table))
+
     def get_metadata(self, coords):
         return self.metadata[si(*coords)]
 
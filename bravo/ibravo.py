@@ -51,12 +51,20 @@ class ITerrainGenerator(ISortedPlugin):
     Interface for terrain generators.
     """
 
-    def populate(chunk, seed):
+    def populate(chunk, seed, context):
         """
         Given a chunk and a seed value, populate the chunk with terrain.
 
         This function should assume that it runs as part of a pipeline, and
         that the chunk may already be partially or totally populated.
+
+        The pipeline also passes in a
+        ``bravo.terrain.context.GenerationContext``, which is shared by every
+        stage working on the chunk. Noise should be sampled through it, or
+        through its ``noise``, instead of the global noise functions, so that
+        chunks can be generated side by side and fields can be shared between
+        stages. Its heightmap should be used instead of regenerating the
+        chunk's heightmap from scratch.
         """
 
 def command_invariant(c):
@@ -235,6 +243,19 @@ class ISerializer(IBravoPlugin):
         :raises: SerializerReadException if the chunk doesn't exist
         """
 
+    def load_chunks(coords):
+        """
+        Load several chunks at once.
+
+        Chunks which don't exist are left out of the results, rather than
+        raising an exception.
+
+        May return a ``Deferred`` that will fire on completion.
+
+        :param list coords: the (x, z) coordinates of the chunks to load
+        :returns: dict of coordinates to chunks
+        """
+
     def save_level(level):
         """
         Save a level.
@@ -11,6 +11,9 @@ class MobManager(object):
     contact outside sources
     """
 
+    def __init__(self):
+        self.mobs = set()
+
     def start_mob(self, mob):
         """
         Add a mob to this manager, and start it.
@@ -19,8 +22,34 @@ class MobManager(object):
         start mobs.
         """
 
+        if mob in self.mobs:
+            return
+
         mob.manager = self
         mob.run()
+        self.mobs.add(mob)
+
+    def stop_mob(self, mob):
+        """
+        Stop updating a mob.
+        """
+
+        self.mobs.discard(mob)
+
+    def update(self):
+        """
+        Update all of the mobs managed by this manager.
+
+        This is meant to be run by the world's ticker.
+        """
+
+        for mob in list(self.mobs):
+            try:
+                mob.update()
+            except ChunkNotLoaded:
+                # The mob's wandered off the edge of the loaded world. It'll
+                # get another chance next time around.
+                pass
 
     def closest_player(self, position, threshold=maxint):
         """
@@ -84,3 +113,9 @@ class MobManager(object):
         Broadcasts a packet to factories
         """
         self.world.factory.broadcast(packet)
+
+    def broadcast_location(self, mob):
+        """
+        Let clients know where a mob has moved to.
+        """
+        self.world.factory.movement.move(mob.eid, mob.location)
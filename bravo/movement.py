@@ -0,0 +1,149 @@
+from collections import defaultdict
+
+from bravo.beta.packets import make_packet
+
+class MovementBroadcaster(object):
+    """
+    Tells clients about entities moving, as compactly as possible.
+
+    Moves are queued with ``move()`` and sent with ``flush()``, which the
+    factory calls once per tick; an entity which moves several times in a
+    tick is only sent once, with its latest location.
+
+    For each viewer, the broadcaster remembers where it last told that viewer
+    each entity was. Small moves are sent as relative moves, look changes on
+    their own are sent as orientation updates, and an absolute teleport is
+    only sent for the first update, for moves which are too large to be
+    relative, and every ``teleport_interval`` flushes, to correct any drift.
+
+    :ivar dict counts: the number of each kind of packet which has been sent
+    :ivar int bytes: the number of bytes which have been sent
+    """
+
+    teleport_interval = 400
+    """
+    How many flushes may pass before an entity is teleported, regardless of
+    how little it has moved. At one flush per tick, this is twenty seconds.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+
+        self.pending = {}
+        self.sent = defaultdict(dict)
+
+        self.flushes = 0
+        self.counts = defaultdict(int)
+        self.bytes = 0
+
+    def move(self, eid, location, source=None):
+        """
+        Queue an entity's location to be sent.
+
+        :param int eid: the entity's ID
+        :param location: the entity's ``Location``
+        :param source: a protocol which should not be told, usually because
+            the entity is its own player
+        """
+
+        x, y, z = location.pos
+        yaw, pitch = location.ori.to_fracs()
+
+        self.pending[eid] = x, y, z, yaw, pitch, source
+
+    def forget(self, viewer, eids=None):
+        """
+        Forget what a viewer has been told.
+
+        This should be done whenever a viewer stops seeing an entity, so that
+        it is teleported into place when it is seen again.
+
+        :param viewer: the protocol
+        :param eids: the entities to forget, or None to forget everything
+        """
+
+        if eids is None:
+            self.sent.pop(viewer, None)
+        elif viewer in self.sent:
+            seen = self.sent[viewer]
+            for eid in eids:
+                seen.pop(eid, None)
+
+    def forget_entity(self, eid):
+        """
+        Forget an entity entirely, because it has been destroyed.
+        """
+
+        self.pending.pop(eid, None)
+        for seen in self.sent.itervalues():
+            seen.pop(eid, None)
+
+    def packet_for(self, viewer, eid, x, y, z, yaw, pitch):
+        """
+        Make the smallest packet which will bring a viewer up to date on an
+        entity's location, and remember that it was sent.
+
+        :returns: a packet, or None if the viewer is already up to date
+        """
+
+        seen = self.sent[viewer]
+        last = seen.get(eid)
+
+        if last is None:
+            teleported = None
+        else:
+            lx, ly, lz, lyaw, lpitch, teleported = last
+            dx, dy, dz = x - lx, y - ly, z - lz
+
+        if (teleported is None
+            or self.flushes - teleported >= self.teleport_interval
+            or not all(-128 <= d <= 127 for d in (dx, dy, dz))):
+            seen[eid] = x, y, z, yaw, pitch, self.flushes
+            return self._packet("teleport", eid=eid, x=x, y=y, z=z, yaw=yaw,
+                pitch=pitch)
+
+        moved = dx or dy or dz
+        turned = yaw != lyaw or pitch != lpitch
+
+        if not moved and not turned:
+            return None
+
+        seen[eid] = x, y, z, yaw, pitch, teleported
+
+        if moved and turned:
+            return self._packet("entity-location", eid=eid, dx=dx, dy=dy,
+                dz=dz, yaw=yaw, pitch=pitch)
+        elif moved:
+            return self._packet("entity-position", eid=eid, dx=dx, dy=dy,
+                dz=dz)
+        else:
+            return self._packet("entity-orientation", eid=eid, yaw=yaw,
+                pitch=pitch)
+
+    def _packet(self, name, **kwargs):
+        packet = make_packet(name, **kwargs)
+        self.counts[name] += 1
+        self.bytes += len(packet)
+        return packet
+
+    def flush(self):
+        """
+        Send all queued moves to everybody who can see the entities which
+        moved.
+        """
+
+        self.flushes += 1
+
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, {}
+
+        for eid, (x, y, z, yaw, pitch, source) in pending.iteritems():
+            for viewer in self.factory.tracker.viewers(eid):
+                if viewer is source:
+                    continue
+
+                packet = self.packet_for(viewer, eid, x, y, z, yaw, pitch)
+                if packet is not None:
+                    viewer.transport.write(packet)
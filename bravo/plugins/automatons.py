@@ -10,6 +10,7 @@ from zope.interface import implements
 
 from bravo.blocks import blocks
 from bravo.ibravo import IAutomaton, IDigHook
+from bravo.ticker import PHASE_AUTOMATONS
 from bravo.terrain.trees import ConeTree, NormalTree, RoundTree, RainforestTree
 from bravo.utilities.automatic import column_scan
 from bravo.world import ChunkNotLoaded
@@ -54,12 +55,8 @@ class Trees(object):
             if metadata >= 12:
                 # Tree time!
                 tree = self.trees[metadata % 4](pos=coords)
-                tree.prepare(self.factory.world)
-                tree.make_trunk(self.factory.world)
-                tree.make_foliage(self.factory.world)
-                # We can't easily tell how many chunks were modified, so we have
-                # to flush all of them.
-                self.factory.flush_all_chunks()
+                # Only the chunks which the tree lands in are flushed.
+                tree.grow(self.factory.world)
             else:
                 # Increment metadata.
                 metadata += 4
@@ -91,18 +88,20 @@ class Grass(object):
     blocks = (blocks["dirt"].slot,)
     step = 1
 
+    loop = None
+
     def __init__(self, factory):
         self.factory = factory
 
         self.tracked = deque()
-        self.loop = LoopingCall(self.process)
 
     def start(self):
-        if not self.loop.running:
-            self.loop.start(self.step, now=False)
+        if not (self.loop and self.loop.running):
+            self.loop = self.factory.ticker.add_seconds(self.process,
+                self.step, name=self.name, order=PHASE_AUTOMATONS)
 
     def stop(self):
-        if self.loop.running:
+        if self.loop and self.loop.running:
             self.loop.stop()
 
     def process(self):
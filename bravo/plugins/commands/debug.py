@@ -1,5 +1,6 @@
 from __future__ import division
 from zope.interface import implements
+from bravo.beta.cork import CorkedTransport
 from bravo.utilities.coords import polar_round_vector
 from bravo.ibravo import IConsoleCommand, IChatCommand
 
@@ -64,14 +65,42 @@ class Status(object):
             dirty = len([i for i in protocol.chunks.values() if i.dirty])
             yield "%s: %d chunks (%d dirty)" % (name, count, dirty)
 
+            if isinstance(protocol.transport, CorkedTransport):
+                stats = protocol.transport.stats()
+                yield "%s: %d bytes, %d packets in %d writes" % (name,
+                    stats["bytes"], stats["packets"], stats["flushes"])
+                yield "%s: %d bytes queued (peak %d), paused %d times%s" % (
+                    name, stats["pending"], stats["peak"], stats["pauses"],
+                    " (paused now)" if stats["paused"] else "")
+
         chunk_count = len(self.factory.world.chunk_cache)
         dirty = len(self.factory.world.dirty_chunk_cache)
         chunk_count += dirty
         yield "World cache: %d chunks (%d dirty)" % (chunk_count, dirty)
 
+        resident = self.factory.world.resident
+        if resident:
+            yield "Chunks kept: %s" % ", ".join("%d %s" % (count, reason)
+                for reason, count in sorted(resident.iteritems()))
+        yield "Chunks unloaded: %d" % self.factory.world.unloaded
+
+        stats = self.factory.ticker.stats()
+        yield ("Tick %(tick)d: last %(last_duration).4fs, "
+            "average %(average_duration).4fs, max %(max_duration).4fs, "
+            "%(missed)d missed, %(overruns)d over budget" % stats)
+
+        # By default, only show the worst offenders; "status plugins" shows
+        # everything that has been recorded.
+        limit = None if "plugins" in parameters else 5
+        if self.factory.profiler.enabled:
+            for line in self.factory.profiler.report(limit):
+                yield line
+        else:
+            yield "Plugin profiling is disabled"
+
     name = "status"
     aliases = tuple()
-    usage = ""
+    usage = "[plugins]"
 
 class Colors(object):
     """
@@ -148,7 +177,7 @@ class CreateMob(object):
                 print mob, number
                 entity = self.factory.create_entity(position.x, position.y,
                         position.z, mob)
-                self.factory.broadcast(entity.save_to_packet())
+                self.factory.tracker.spawn(entity)
                 self.factory.world.mob_manager.start_mob(entity)
             return ("Made mob!",)
 #            except:
@@ -41,12 +41,7 @@ class Fertilizer(object):
 
                 # Select correct treee and coordinates, then build tree.
                 tree = self.trees[metadata % 4](pos=(x, y, z))
-                tree.prepare(self.factory.world)
-                tree.make_trunk(self.factory.world)
-                tree.make_foliage(self.factory.world)
-                # We can't easily tell how many chunks were modified, so we
-                # have to flush all of them.
-                self.factory.flush_all_chunks()
+                tree.grow(self.factory.world)
 
         # Interrupt the processing here.
         returnValue((False, builddata, False))
@@ -1,7 +1,6 @@
 from __future__ import division
 
-from array import array
-from itertools import combinations, product
+from itertools import combinations, izip
 from random import Random
 
 from zope.interface import implements
@@ -9,7 +8,7 @@ from zope.interface import implements
 from bravo.blocks import blocks
 from bravo.chunk import CHUNK_HEIGHT, XZ, iterchunk
 from bravo.ibravo import ITerrainGenerator
-from bravo.simplex import octaves2, octaves3, set_seed
+from bravo.simplex import get_noise
 from bravo.utilities.maths import morton2
 
 R = Random()
@@ -23,15 +22,12 @@ class BoringGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Fill the bottom half of the chunk with stone.
         """
 
-        # Optimized fill. Fill the bottom eight sections with stone.
-        stone = array("B", [blocks["stone"].slot] * 16 * 16 * 16)
-        for section in chunk.sections[:8]:
-            section.blocks[:] = stone[:]
+        chunk.fill_slab(0, CHUNK_HEIGHT // 2, blocks["stone"].slot)
 
     name = "boring"
 
@@ -48,13 +44,11 @@ class SimplexGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Make smooth waves of stone.
         """
 
-        set_seed(seed)
-
         # And into one end he plugged the whole of reality as extrapolated
         # from a piece of fairy cake, and into the other end he plugged his
         # wife: so that when he turned it on she saw in one instant the whole
@@ -62,11 +56,10 @@ class SimplexGenerator(object):
 
         factor = 1 / 256
 
-        for x, z in XZ:
-            magx = (chunk.x * 16 + x) * factor
-            magz = (chunk.z * 16 + z) * factor
+        heights = context.octaves2_grid(chunk.x * 16, chunk.z * 16, 16, 16,
+            factor, 6)
 
-            height = octaves2(magx, magz, 6)
+        for (x, z), height in izip(XZ, heights):
             # Normalize around 70. Normalization is scaled according to a
             # rotated cosine.
             #scale = rotated_cosine(magx, magz, seed, 16 * 10)
@@ -74,8 +67,7 @@ class SimplexGenerator(object):
             height = int(height + 70)
 
             # Make our chunk offset, and render into the chunk.
-            for y in range(height):
-                chunk.set_block((x, y, z), blocks["stone"].slot)
+            chunk.fill_column(x, z, 0, height, blocks["stone"].slot)
 
     name = "simplex"
 
@@ -92,21 +84,22 @@ class ComplexGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    lattice = 4, 8, 4
+    """
+    The spacing, in blocks along X, Y, and Z, of the lattice on which noise
+    is sampled.
+    """
+
+    def populate(self, chunk, seed, context):
         """
         Make smooth islands of stone.
         """
 
-        set_seed(seed)
-
         factor = 1 / 256
 
-        for x, z, y in iterchunk():
-            magx = (chunk.x * 16 + x) * factor
-            magz = (chunk.z * 16 + z) * factor
-
-            sample = octaves3(magx, magz, y * factor, 6)
+        samples = context.density(CHUNK_HEIGHT, factor, 6, self.lattice)
 
+        for (x, z, y), sample in izip(iterchunk(), samples):
             if sample > 0.5:
                 chunk.set_block((x, y, z), blocks["stone"].slot)
 
@@ -123,14 +116,13 @@ class WaterTableGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Generate a flat water table halfway up the map.
         """
 
-        for x, z, y in product(xrange(16), xrange(16), xrange(62)):
-            if chunk.get_block((x, y, z)) == blocks["air"].slot:
-                chunk.set_block((x, y, z), blocks["spring"].slot)
+        chunk.fill_slab(0, 62, blocks["spring"].slot,
+            replace=blocks["air"].slot)
 
     name = "watertable"
 
@@ -144,20 +136,18 @@ class ErosionGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Turn the top few layers of stone into dirt.
         """
 
-        chunk.regenerate_heightmap()
+        context.regenerate_heightmap()
 
         for x, z in XZ:
             y = chunk.height_at(x, z)
 
             if chunk.get_block((x, y, z)) == blocks["stone"].slot:
-                bottom = max(y - 3, 0)
-                for i in range(bottom, y + 1):
-                    chunk.set_block((x, i, z), blocks["dirt"].slot)
+                chunk.fill_column(x, z, y - 3, y + 1, blocks["dirt"].slot)
 
     name = "erosion"
 
@@ -171,12 +161,14 @@ class GrassGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Find the top dirt block in each y-level and turn it into grass.
         """
 
-        chunk.regenerate_heightmap()
+        context.regenerate_heightmap()
+
+        heights = []
 
         for x, z in XZ:
             y = chunk.height_at(x, z)
@@ -184,7 +176,11 @@ class GrassGenerator(object):
             if (chunk.get_block((x, y, z)) == blocks["dirt"].slot and
                 (y == 127 or
                     chunk.get_block((x, y + 1, z)) == blocks["air"].slot)):
-                chunk.set_block((x, y, z), blocks["grass"].slot)
+                heights.append(y)
+            else:
+                heights.append(None)
+
+        chunk.set_layer(heights, blocks["grass"].slot)
 
     name = "grass"
 
@@ -207,14 +203,16 @@ class BeachGenerator(object):
         blocks["spring"].slot, blocks["ice"].slot])
     replace = set([blocks["dirt"].slot, blocks["grass"].slot])
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Find blocks within a height range and turn them into sand if they are
         dirt and underwater or exposed to air. If the height range is near the
         water table level, this creates fairly good beaches.
         """
 
-        chunk.regenerate_heightmap()
+        context.regenerate_heightmap()
+
+        heights = []
 
         for x, z in XZ:
             y = chunk.height_at(x, z)
@@ -222,11 +220,12 @@ class BeachGenerator(object):
             while y > 60 and chunk.get_block((x, y, z)) in self.above:
                 y -= 1
 
-            if not 60 < y < 66:
-                continue
+            if 60 < y < 66 and chunk.get_block((x, y, z)) in self.replace:
+                heights.append(y)
+            else:
+                heights.append(None)
 
-            if chunk.get_block((x, y, z)) in self.replace:
-                chunk.set_block((x, y, z), blocks["sand"].slot)
+        chunk.set_layer(heights, blocks["sand"].slot)
 
     name = "beaches"
 
@@ -240,19 +239,27 @@ class OreGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
-        set_seed(seed)
+    lattice = 1, 1, 1
+    """
+    The spacing, in blocks along X, Y, and Z, of the lattice on which noise
+    is sampled. Ores are placed at rare, sharp peaks of noise, which
+    interpolation between lattice points flattens, so that a coarse lattice
+    places far fewer ores.
+    """
 
+    def populate(self, chunk, seed, context):
         xzfactor = 1 / 16
         yfactor = 1 / 32
 
+        # Only sample as high as the tallest column.
+        top = max(chunk.height_at(x, z) for x, z in XZ) + 1
+        samples = context.density(top, (xzfactor, yfactor, xzfactor), 3,
+            self.lattice)
+
         for x, z in XZ:
+            column = (x * 16 + z) * top
             for y in range(chunk.height_at(x, z) + 1):
-                magx = (chunk.x * 16 + x) * xzfactor
-                magz = (chunk.z * 16 + z) * xzfactor
-                magy = y * yfactor
-
-                sample = octaves3(magx, magz, magy, 3)
+                sample = samples[column + y]
 
                 if sample > 0.9999:
                     # Figure out what to place here.
@@ -292,16 +299,14 @@ class SafetyGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Spread a layer of bedrock along the bottom of the chunk, and clear the
         top two layers to avoid players getting stuck at the top.
         """
 
-        for x, z in XZ:
-            chunk.set_block((x, 0, z), blocks["bedrock"].slot)
-            chunk.set_block((x, 126, z), blocks["air"].slot)
-            chunk.set_block((x, 127, z), blocks["air"].slot)
+        chunk.fill_slab(0, 1, blocks["bedrock"].slot)
+        chunk.fill_slab(126, 128, blocks["air"].slot)
 
     name = "safety"
 
@@ -319,27 +324,23 @@ class CliffGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Make smooth waves of stone, then compare to current landscape.
         """
 
-        set_seed(seed)
-
         factor = 1 / 256
-        for x, z in XZ:
-            magx = ((chunk.x + 32) * 16 + x) * factor
-            magz = ((chunk.z + 32) * 16 + z) * factor
-            height = octaves2(magx, magz, 6)
+        heights = context.octaves2_grid((chunk.x + 32) * 16,
+            (chunk.z + 32) * 16, 16, 16, factor, 6)
+        for (x, z), height in izip(XZ, heights):
             height *= 15
             height = int(height + 70)
             current_height = chunk.heightmap[x * 16 + z]
             if (-6 < current_height - height < 3 and
                 current_height > 63 and height > 63):
-                for y in range(height - 3):
-                    chunk.set_block((x, y, z), blocks["stone"].slot)
-                for y in range(y, CHUNK_HEIGHT // 2):
-                    chunk.set_block((x, y, z), blocks["air"].slot)
+                chunk.fill_column(x, z, 0, height - 4, blocks["stone"].slot)
+                chunk.fill_column(x, z, height - 4, CHUNK_HEIGHT // 2,
+                    blocks["air"].slot)
 
     name = "cliffs"
 
@@ -355,7 +356,7 @@ class FloatGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Create floating islands.
         """
@@ -365,11 +366,9 @@ class FloatGenerator(object):
         R.seed(seed)
 
         factor = 1 / 256
-        for x, z in XZ:
-            magx = ((chunk.x+16) * 16 + x) * factor
-            magz = ((chunk.z+16) * 16 + z) * factor
-
-            height = octaves2(magx, magz, 6)
+        heights = context.octaves2_grid((chunk.x + 16) * 16,
+            (chunk.z + 16) * 16, 16, 16, factor, 6)
+        for (x, z), height in izip(XZ, heights):
             height *= 15
             height = int(height + 70)
 
@@ -378,8 +377,7 @@ class FloatGenerator(object):
             else:
                 height = height - 30 + R.randint(-15, 10)
 
-            for y in range(height):
-                chunk.set_block((x, y, z), blocks["air"].slot)
+            chunk.fill_column(x, z, 0, height, blocks["air"].slot)
 
     name = "float"
 
@@ -393,29 +391,44 @@ class CaveGenerator(object):
 
     implements(ITerrainGenerator)
 
-    def populate(self, chunk, seed):
+    lattice = 2, 4, 2
+    """
+    The spacing, in blocks along X, Y, and Z, of the lattice on which noise
+    is sampled.
+    """
+
+    def populate(self, chunk, seed, context):
         """
         Make smooth waves of stone.
         """
 
-        sede = seed ^ 0xcafebabe
         xzfactor = 1 / 128
         yfactor = 1 / 64
 
+        # Only sample as high as the highest section with anything in it.
+        top = 0
+        for i, section in enumerate(chunk.sections):
+            if any(section.blocks):
+                top = (i + 1) * 16
+
+        if not top:
+            return
+
+        # Caves are where two fields of noise are both close to zero.
+        scale = xzfactor, yfactor, xzfactor
+        first = context.density(top, scale, 3, self.lattice)
+        second = context.density(top, scale, 3, self.lattice,
+            noise=get_noise(seed ^ 0xcafebabe))
+
         for x, z in XZ:
-            magx = (chunk.x * 16 + x) * xzfactor
-            magz = (chunk.z * 16 + z) * xzfactor
+            column = (x * 16 + z) * top
 
-            for y in range(CHUNK_HEIGHT):
+            for y in range(top):
                 if not chunk.get_block((x, y, z)):
                     continue
 
-                magy = y * yfactor
-
-                set_seed(seed)
-                should_cave = abs(octaves3(magx, magz, magy, 3))
-                set_seed(sede)
-                should_cave *= abs(octaves3(magx, magz, magy, 3))
+                should_cave = abs(first[column + y])
+                should_cave *= abs(second[column + y])
 
                 if should_cave < 0.002:
                     chunk.set_block((x, y, z), blocks["air"].slot)
@@ -442,7 +455,7 @@ class SaplingGenerator(object):
 
     ground = (blocks["grass"].slot, blocks["dirt"].slot)
 
-    def populate(self, chunk, seed):
+    def populate(self, chunk, seed, context):
         """
         Place saplings.
 
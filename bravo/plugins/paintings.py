@@ -5,7 +5,6 @@ from zope.interface import implements
 
 from bravo.blocks import items
 from bravo.ibravo import IPreBuildHook, IUseHook
-from bravo.beta.packets import make_packet
 from bravo.utilities.coords import adjust_coords_for_face
 
 available_paintings = {
@@ -63,7 +62,7 @@ class Paintings(object):
         entity = self.factory.create_entity(x, y, z, "Painting",
             direction=face_to_direction[face],
             motive=random.choice(painting_names))
-        self.factory.broadcast(entity.save_to_packet())
+        self.factory.tracker.spawn(entity)
 
         # Force the chunk (with its entities) to be saved to disk.
         self.factory.world.mark_dirty((x, y, z))
@@ -86,9 +85,6 @@ class Paintings(object):
         self.factory.destroy_entity(target)
         self.factory.give(coords, (items["paintings"].slot, 0), 1)
 
-        packet = make_packet("destroy", count=1, eid=[target.eid])
-        self.factory.broadcast(packet)
-
         # Force the chunk (with its entities) to be saved to disk.
         self.factory.world.mark_dirty((x, y, z))
 
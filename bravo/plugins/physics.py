@@ -1,11 +1,11 @@
 from itertools import chain
 
 from twisted.internet.defer import inlineCallbacks
-from twisted.internet.task import LoopingCall
 from zope.interface import implements
 
 from bravo.blocks import blocks
 from bravo.ibravo import IAutomaton, IDigHook
+from bravo.ticker import PHASE_AUTOMATONS
 from bravo.utilities.automatic import naive_scan
 from bravo.utilities.coords import itercube, iterneighbors
 from bravo.utilities.spatial import Block2DSpatialDict, Block3DSpatialDict
@@ -30,6 +30,8 @@ class Fluid(object):
     Defaults to None, which effectively disables this feature.
     """
 
+    loop = None
+
     def __init__(self, factory):
         self.factory = factory
 
@@ -39,14 +41,13 @@ class Fluid(object):
         self.tracked = set()
         self.new = set()
 
-        self.loop = LoopingCall(self.process)
-
     def start(self):
-        if not self.loop.running:
-            self.loop.start(self.step)
+        if not (self.loop and self.loop.running):
+            self.loop = self.factory.ticker.add_seconds(self.process,
+                self.step, name=self.name, order=PHASE_AUTOMATONS, now=True)
 
     def stop(self):
-        if self.loop.running:
+        if self.loop and self.loop.running:
             self.loop.stop()
 
     def schedule(self):
@@ -1,9 +1,9 @@
-from twisted.internet.task import LoopingCall
 from zope.interface import implements
 
 from bravo.blocks import blocks
 from bravo.errors import ChunkNotLoaded
 from bravo.ibravo import IAutomaton, IDigHook
+from bravo.ticker import PHASE_AUTOMATONS
 from bravo.utilities.automatic import naive_scan
 from bravo.utilities.redstone import (RedstoneError, Asic, Circuit)
 
@@ -32,6 +32,8 @@ class Redstone(object):
 
     step = 0.2
 
+    loop = None
+
     blocks = (
         blocks["lever"].slot,
         blocks["redstone-torch"].slot,
@@ -45,14 +47,13 @@ class Redstone(object):
         self.asic = Asic()
         self.active_circuits = set()
 
-        self.loop = LoopingCall(self.process)
-
     def start(self):
-        if not self.loop.running:
-            self.loop.start(self.step)
+        if not (self.loop and self.loop.running):
+            self.loop = self.factory.ticker.add_seconds(self.process,
+                self.step, name=self.name, order=PHASE_AUTOMATONS, now=True)
 
     def stop(self):
-        if self.loop.running:
+        if self.loop and self.loop.running:
             self.loop.stop()
 
     def schedule(self):
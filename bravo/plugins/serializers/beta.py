@@ -302,6 +302,9 @@ class Anvil(object):
 
         chunk.populated = bool(level["TerrainPopulated"])
 
+        if "BravoSeason" in level:
+            chunk.season = level["BravoSeason"].value
+
         if "Entities" in level:
             for tag in level["Entities"].tags:
                 try:
@@ -357,6 +360,9 @@ class Anvil(object):
 
         level["TerrainPopulated"] = TAG_Byte(chunk.populated)
 
+        if chunk.season is not None:
+            level["BravoSeason"] = TAG_String(chunk.season)
+
         level["Entities"] = TAG_List(type=TAG_Compound)
         for entity in chunk.entities:
             try:
@@ -447,6 +453,31 @@ class Anvil(object):
         name = name_for_anvil(x, z)
         fp = self.folder.child("region").child(name)
         region = Region(fp)
+
+        return self._load_chunk_from_region(region, x, z)
+
+    def load_chunks(self, coords):
+        # Chunks are grouped by region, so that each region's header is only
+        # read once for the whole batch.
+        regions = {}
+        chunks = {}
+
+        for x, z in coords:
+            name = name_for_anvil(x, z)
+            if name not in regions:
+                fp = self.folder.child("region").child(name)
+                regions[name] = Region(fp)
+
+            try:
+                chunk = self._load_chunk_from_region(regions[name], x, z)
+            except SerializerReadException:
+                continue
+
+            chunks[x, z] = chunk
+
+        return chunks
+
+    def _load_chunk_from_region(self, region, x, z):
         chunk = Chunk(x, z)
 
         try:
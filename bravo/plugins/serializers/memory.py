@@ -42,6 +42,10 @@ class Memory(object):
             return deepcopy(self.chunks[key])
         raise SerializerReadException("%d, %d couldn't be loaded" % key)
 
+    def load_chunks(self, coords):
+        return dict((key, deepcopy(self.chunks[key])) for key in coords
+            if key in self.chunks)
+
     def save_chunk(self, chunk):
         self.chunks[chunk.x, chunk.z] = deepcopy(chunk)
 
@@ -82,7 +82,7 @@ def processClickMessage(factory, player, window, container):
                 primary=primary,
                 secondary=secondary
             )
-            factory.broadcast_for_others(packet, player)
+            factory.tracker.broadcast(player.player.eid, packet)
 
         # If the window is SharedWindow for tile...
         if window.coords is not None:
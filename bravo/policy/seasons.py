@@ -2,7 +2,7 @@ from zope.interface import implements
 
 from bravo.blocks import blocks
 from bravo.ibravo import ISeason
-from bravo.utilities.coords import CHUNK_HEIGHT, XZ
+from bravo.utilities.coords import CHUNK_HEIGHT
 
 snow_resistant = set([
     blocks["air"].slot,
@@ -56,20 +56,21 @@ class Winter(object):
     def transform(self, chunk):
         chunk.sed(blocks["spring"].slot, blocks["ice"].slot)
 
-        # Make sure that the heightmap is valid so that we don't spawn
+        # Lay snow over anything not already snowed and not snow-resistant.
+        # The tops of the columns are found from the blocks themselves, and
+        # the heightmap is rewritten from them, so that we don't spawn
         # floating snow.
-        chunk.regenerate_heightmap()
+        heightmap = chunk.heightmap
+        for column, (height, top_block) in enumerate(chunk.top_blocks()):
+            heightmap[column] = height
 
-        # Lay snow over anything not already snowed and not snow-resistant.
-        for x, z in XZ:
-            height = chunk.height_at(x, z)
             if height == CHUNK_HEIGHT - 1:
                 continue
 
-            top_block = chunk.get_block((x, height, z))
-
             if top_block not in snow_resistant:
+                x, z = divmod(column, 16)
                 chunk.set_block((x, height + 1, z), blocks["snow"].slot)
+                heightmap[column] = height + 1
 
     name = "winter"
 
@@ -0,0 +1,185 @@
+from bisect import bisect_left
+from time import time
+
+from twisted.internet.defer import maybeDeferred
+
+BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005,
+    0.001, 0.005, 0.01, 0.05,
+    0.1, 0.5, 1.0,
+)
+"""
+Upper bounds, in seconds, of the latency histogram buckets.
+
+There is one extra, unbounded, bucket for anything slower than the last
+bound.
+"""
+
+def format_duration(seconds):
+    """
+    Format a duration in seconds for human consumption.
+    """
+
+    if seconds is None:
+        return "inf"
+    elif seconds < 0.001:
+        return "%dus" % round(seconds * 1000000)
+    elif seconds < 1:
+        return "%.1fms" % (seconds * 1000)
+    else:
+        return "%.2fs" % seconds
+
+class Histogram(object):
+    """
+    A fixed-bucket latency histogram.
+
+    Recording a sample is a bisection and a few additions, so histograms are
+    cheap enough to keep around all the time.
+    """
+
+    count = 0
+    total = 0.0
+    max = 0.0
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(self, duration):
+        self.buckets[bisect_left(BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, p):
+        """
+        Estimate a percentile.
+
+        The estimate is the upper bound of the bucket containing the
+        requested percentile, or None if that bucket is unbounded.
+
+        :param float p: percentile, from 0 to 100
+        """
+
+        if not self.count:
+            return 0.0
+
+        threshold = self.count * p / 100.0
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= threshold and count:
+                return BUCKETS[i] if i < len(BUCKETS) else None
+
+        return None
+
+class Profiler(object):
+    """
+    Per-plugin instrumentation.
+
+    Samples are filed under a category, like "dig_hook" or "automaton", and a
+    name, which is usually the plugin's name. ``call()`` measures the time
+    spent synchronously inside a call, which is the time during which the
+    reactor is blocked. Hooks which return Deferreds, including those written
+    with ``inlineCallbacks``, do most of their work after they return, so
+    ``call_deferred()`` measures them until their Deferred fires instead.
+    """
+
+    timer = staticmethod(time)
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+
+    def record(self, category, name, duration):
+        """
+        Record a single sample.
+        """
+
+        key = category, name
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].record(duration)
+
+    def call(self, category, name, f, *args, **kwargs):
+        """
+        Call a function, recording how long it took.
+
+        Exceptions are recorded and then propagated as usual.
+
+        :returns: the return value of the function
+        """
+
+        if not self.enabled:
+            return f(*args, **kwargs)
+
+        started = self.timer()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            self.record(category, name, self.timer() - started)
+
+    def call_deferred(self, category, name, f, *args, **kwargs):
+        """
+        Call a function which might return a Deferred, recording how long it
+        took for the Deferred to fire.
+
+        Failures are recorded and then passed along as usual.
+
+        :returns: a Deferred which fires with the result of the function
+        """
+
+        if not self.enabled:
+            return maybeDeferred(f, *args, **kwargs)
+
+        started = self.timer()
+
+        def finished(result):
+            self.record(category, name, self.timer() - started)
+            return result
+
+        d = maybeDeferred(f, *args, **kwargs)
+        d.addBoth(finished)
+        return d
+
+    def reset(self):
+        """
+        Throw away all recorded samples.
+        """
+
+        self.histograms.clear()
+
+    def stats(self):
+        """
+        Get all of the recorded histograms, busiest first.
+
+        :returns: a list of ((category, name), ``Histogram``) tuples, sorted
+            by total time spent
+        """
+
+        return sorted(self.histograms.iteritems(),
+            key=lambda (key, histogram): histogram.total, reverse=True)
+
+    def report(self, limit=None):
+        """
+        Summarize the recorded samples.
+
+        :param int limit: how many of the busiest entries to include
+        :returns: a list of lines of text
+        """
+
+        lines = []
+        for (category, name), h in self.stats()[:limit]:
+            lines.append("%s %s: %d calls, %s total, %s mean, "
+                "p50 %s, p99 %s, max %s" % (category, name, h.count,
+                format_duration(h.total), format_duration(h.mean),
+                format_duration(h.percentile(50)),
+                format_duration(h.percentile(99)),
+                format_duration(h.max)))
+        return lines
@@ -1,11 +1,12 @@
 from ampoule import AMPChild
 import ampoule.pool
 
-from twisted.protocols.amp import ListOf, Command, Integer, String
+from twisted.protocols.amp import AmpList, ListOf, Command, Integer, String
 
 from bravo.chunk import Chunk
 from bravo.ibravo import ITerrainGenerator
 from bravo.plugin import retrieve_sorted_plugins
+from bravo.terrain.context import GenerationContext
 
 class MakeChunk(Command):
     arguments = [
@@ -13,6 +14,10 @@ class MakeChunk(Command):
         ("z", Integer()),
         ("seed", Integer()),
         ("generators", ListOf(String())),
+        ("lattices", AmpList([
+            ("name", String()),
+            ("lattice", ListOf(Integer())),
+        ])),
     ]
     response = [
         ("blocks", String()),
@@ -20,6 +25,7 @@ class MakeChunk(Command):
         ("skylight", String()),
         ("blocklight", String()),
         ("heightmap", String()),
+        ("decorations", String()),
     ]
     errors = {
         Exception: "Exception",
@@ -30,17 +36,23 @@ class Slave(AMPChild):
     Process-based peon for processing and populating.
     """
 
-    def make_chunk(self, x, z, seed, generators):
+    def make_chunk(self, x, z, seed, generators, lattices):
         """
         Create a chunk using the given parameters.
         """
 
         generators = retrieve_sorted_plugins(ITerrainGenerator, generators)
 
+        lattices = dict((d["name"], tuple(d["lattice"])) for d in lattices)
+        for stage in generators:
+            if stage.name in lattices:
+                stage.lattice = lattices[stage.name]
+
         chunk = Chunk(x, z)
+        context = GenerationContext(chunk, seed)
 
         for stage in generators:
-            stage.populate(chunk, seed)
+            stage.populate(chunk, seed, context)
 
         chunk.regenerate()
 
@@ -50,6 +62,7 @@ class Slave(AMPChild):
             "skylight": chunk.skylight.tostring(),
             "blocklight": chunk.blocklight.tostring(),
             "heightmap": chunk.heightmap.tostring(),
+            "decorations": context.decorations.save(),
         }
 
     MakeChunk.responder(make_chunk)
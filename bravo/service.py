@@ -4,11 +4,11 @@ from twisted.application.strports import service as serviceForEndpoint
 from twisted.internet.protocol import Factory
 from twisted.python import log
 
-from bravo.amp import ConsoleRPCFactory
+from bravo.amp import ConsoleRPCFactory, ShardBusFactory
 from bravo.config import read_configuration
 from bravo.beta.factory import BravoFactory
 from bravo.infini.factory import InfiniNodeFactory
-from bravo.beta.protocol import BetaProxyProtocol
+from bravo.beta.protocol import BetaProxyProtocol, ShardProxyProtocol
 
 class BetaProxyFactory(Factory):
     protocol = BetaProxyProtocol
@@ -17,6 +17,32 @@ class BetaProxyFactory(Factory):
         self.name = name
         self.port = config.getint("infiniproxy %s" % name, "port")
 
+class ShardProxyFactory(Factory):
+    """
+    The front of a world which has been split between several workers.
+
+    :ivar list shards: the address and port of each shard's worker
+    :ivar dict clients: the connected clients, by username
+    """
+
+    protocol = ShardProxyProtocol
+
+    def __init__(self, config, name):
+        self.name = name
+        section = "shardproxy %s" % name
+
+        self.shards = []
+        for address in config.getlist(section, "shards"):
+            host, port = address.split(":")
+            self.shards.append((host, int(port)))
+
+        # New players start out at the shard which owns the spawn point; if
+        # they logged out somewhere else, they are handed off straight away.
+        self.entry = config.getintdefault(section, "entry", 0)
+
+        self.clients = {}
+        self.bus = ShardBusFactory(self)
+
 def services_for_endpoints(endpoints, factory):
     l = []
     for endpoint in endpoints:
@@ -93,6 +119,16 @@ class BravoService(MultiService):
 
                 for service in services_for_endpoints(interfaces, factory):
                     self.addService(service)
+            elif section.startswith("shardproxy "):
+                factory = ShardProxyFactory(self.config, section[11:])
+                interfaces = self.config.getlist(section, "interfaces")
+                bus = self.config.getlistdefault(section, "bus",
+                    ["tcp:25610:interface=localhost"])
+
+                for service in services_for_endpoints(interfaces, factory):
+                    self.addService(service)
+                for service in services_for_endpoints(bus, factory.bus):
+                    self.addService(service)
             elif section.startswith("infininode "):
                 factory = InfiniNodeFactory(self.config, section[11:])
                 interfaces = self.config.getlist(section, "interfaces")
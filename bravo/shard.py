@@ -0,0 +1,405 @@
+from twisted.internet import reactor
+from twisted.python import log
+
+from bravo.amp import (BlockChanged, Decorate, EntityMoved, EntityRemoved,
+                       Handoff, JoinBus, ShardWorkerFactory)
+from bravo.beta.packets import make_packet
+from bravo.entity import Player
+from bravo.location import Location, Orientation, Position
+from bravo.terrain.decoration import DecorationQueue
+from bravo.utilities.coords import split_coords
+
+class ShardMap(object):
+    """
+    A partition of chunk space between several shards.
+
+    Chunks are dealt out in square blocks of ``size`` chunks on a side. The
+    default size is that of a region, so that every region file is written
+    by exactly one shard. Blocks are assigned in diagonal stripes, which
+    gives every shard the same share of the world, and keeps any one shard
+    from owning a long straight border.
+    """
+
+    def __init__(self, count, size=32):
+        self.count = count
+        self.size = size
+
+    def shard_for(self, x, z):
+        """
+        Get the shard owning a chunk.
+
+        `x` and `z` are chunk coordinates, not block coordinates.
+        """
+
+        return (x // self.size + z // self.size) % self.count
+
+    def shard_at(self, x, z):
+        """
+        Get the shard owning a block column.
+        """
+
+        return self.shard_for(x // 16, z // 16)
+
+    def shards_near(self, x, z, distance):
+        """
+        Get every shard which owns a chunk within a distance of a chunk.
+
+        The distance is in chunks, and is measured along the axes; this is the
+        square of chunks which a client might have loaded.
+
+        :returns: set of shards
+        """
+
+        size = self.size
+        return set(self.shard_for(i * size, j * size)
+            for i in xrange((x - distance) // size, (x + distance) // size + 1)
+            for j in xrange((z - distance) // size, (z + distance) // size + 1))
+
+class Shard(object):
+    """
+    A worker's share of a sharded world.
+
+    Each worker serves the players standing in its part of the world, and is
+    the only one which saves the chunks in that part. Chunks belonging to
+    other shards may still be loaded, so that players near a border can see
+    past it, but they are never written out; changes to them are sent to
+    their owner instead.
+
+    Workers are connected by the shard bus, which is hosted by the proxy in
+    front of them. Block changes near a border, and the movement of players
+    near a border, are published on the bus so that the shards on the other
+    side can show them. Players who walk far enough into another shard are
+    handed off to it.
+
+    :ivar dict remote: players belonging to other shards which are close
+        enough to be shown here, by entity ID
+    :ivar dict arrivals: the entity IDs of players who are being handed off
+        to this shard, by username
+    """
+
+    bus = None
+
+    handoff_margin = 8
+    """
+    How far, in blocks, a player must be from this shard's part of the world
+    before being handed off. This keeps players who walk along a border from
+    being handed back and forth.
+    """
+
+    border = 16
+    """
+    How far, in chunks, from a border events are published. This should be
+    at least the farthest view distance of any client.
+    """
+
+    decoration_batch = 1024
+    """
+    The most queued writes which are sent to another shard at once, to keep
+    each message well within AMP's limits.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+
+        config = factory.config
+        name = factory.config_name
+
+        self.index = config.getint(name, "shard")
+        self.map = ShardMap(config.getint(name, "shards"),
+            config.getintdefault(name, "shard_size", 32))
+        self.handoff_margin = config.getintdefault(name, "handoff_margin",
+            self.handoff_margin)
+        self.border = config.getintdefault(name, "shard_border", self.border)
+        self.address = config.getdefault(name, "shard_bus", "localhost:25610")
+
+        self.remote = {}
+        self.arrivals = {}
+        self.published = {}
+
+    def start(self):
+        """
+        Connect to the shard bus.
+        """
+
+        host, port = self.address.split(":")
+        self.bus_factory = ShardWorkerFactory(self)
+        self.connector = reactor.connectTCP(host, int(port), self.bus_factory)
+
+    def stop(self):
+        self.bus_factory.stopTrying()
+        self.connector.disconnect()
+
+    def connected(self, bus):
+        self.bus = bus
+        d = bus.callRemote(JoinBus, shard=self.index)
+        d.addErrback(log.err)
+
+    def disconnected(self, bus):
+        if self.bus is bus:
+            self.bus = None
+
+        # Without the bus, nothing more will be heard about other shards'
+        # players.
+        for eid in self.remote.keys():
+            self.entity_removed(eid)
+
+    def owns(self, x, z):
+        """
+        Whether a chunk belongs to this shard.
+        """
+
+        return self.map.shard_for(x, z) == self.index
+
+    def publish(self, command, **kwargs):
+        """
+        Send an event to the other shards, if the bus is up.
+        """
+
+        if self.bus is not None:
+            self.bus.callRemote(command, **kwargs)
+
+    def near_border(self, x, z):
+        """
+        Whether events in a chunk might be seen by another shard's players.
+        """
+
+        return self.map.shards_near(x, z, self.border) != set([self.index])
+
+    def publish_damage(self, chunk):
+        """
+        Publish the damaged blocks of a chunk, if they are close enough to a
+        border to matter.
+
+        Chunks which have been damaged so heavily that they are resent whole
+        no longer know which blocks changed, and aren't published.
+        """
+
+        if not chunk.damaged or not self.near_border(chunk.x, chunk.z):
+            return
+
+        for coords in chunk.damaged:
+            x, y, z = coords
+            self.publish(BlockChanged, x=chunk.x * 16 + x, y=y,
+                z=chunk.z * 16 + z, block=chunk.get_block(coords),
+                metadata=chunk.get_metadata(coords))
+
+    def block_changed(self, x, y, z, block, metadata):
+        """
+        Apply a block change published by another shard.
+
+        The change is applied to the chunk if it is loaded, or if this shard
+        owns it, and sent to the players who have the chunk loaded. It is
+        not damage, and is not published again.
+        """
+
+        world = self.factory.world
+        bigx, smallx, bigz, smallz = split_coords(x, z)
+        coords = smallx, y, smallz
+
+        def apply(chunk):
+            chunk.set_block(coords, block)
+            chunk.set_metadata(coords, metadata)
+            chunk.damaged.discard(coords)
+            packet = make_packet("block", x=x, y=y, z=z, type=block,
+                meta=metadata)
+            self.factory.broadcast_for_chunk(packet, bigx, bigz)
+
+        chunk = world.chunk_cache.get((bigx, bigz))
+        if chunk is None:
+            chunk = world.dirty_chunk_cache.get((bigx, bigz))
+
+        if chunk is not None:
+            apply(chunk)
+        elif self.owns(bigx, bigz):
+            world.request_chunk(bigx, bigz).addCallback(apply)
+
+    def send_decorations(self, queue):
+        """
+        Send the writes in a decoration queue which belong to other shards'
+        chunks to their owners.
+
+        Writes are taken out of the queue as they are sent, and put back if
+        their owner isn't on the bus, so that they're tried again later.
+        """
+
+        if self.bus is None:
+            return
+
+        foreign = [key for key in queue.pending if not self.owns(*key)]
+        for key in foreign:
+            writes = queue.pending.pop(key)
+            queue.dirty = True
+
+            for i in range(0, len(writes), self.decoration_batch):
+                outgoing = DecorationQueue()
+                outgoing.pending[key] = writes[i:i + self.decoration_batch]
+
+                d = self.bus.callRemote(Decorate,
+                    shard=self.map.shard_for(*key),
+                    decorations=outgoing.save())
+                d.addErrback(self.unsent_decorations, queue, outgoing)
+
+    def unsent_decorations(self, failure, queue, outgoing):
+        """
+        Put back writes which couldn't be delivered, ahead of any which have
+        been queued since.
+        """
+
+        for key, writes in outgoing.pending.iteritems():
+            queue.pending[key] = writes + queue.pending.get(key, [])
+        queue.dirty = True
+        failure.trap(KeyError)
+
+    def decorate(self, decorations):
+        """
+        Take on writes which another shard made to this shard's chunks.
+        """
+
+        queue = DecorationQueue()
+        queue.load(decorations)
+        self.factory.world.queue_decorations(queue)
+
+    def entity_moved(self, eid, username, x, y, z, theta, phi):
+        """
+        Show another shard's player moving near the border.
+        """
+
+        for protocol in self.factory.protocols.itervalues():
+            if protocol.player is not None and protocol.player.eid == eid:
+                # This player has already been handed to us.
+                return
+
+        player = self.remote.get(eid)
+        if player is None:
+            location = Location()
+            location.pos = Position(x, y, z)
+            location.ori = Orientation(theta, phi)
+            player = Player(eid=eid, username=username, location=location)
+            self.remote[eid] = player
+            self.factory.tracker.spawn(player)
+        else:
+            player.location.pos = Position(x, y, z)
+            player.location.ori = Orientation(theta, phi)
+            self.factory.movement.move(eid, player.location)
+
+    def entity_removed(self, eid):
+        """
+        Stop showing another shard's player.
+        """
+
+        player = self.remote.pop(eid, None)
+        if player is not None:
+            self.factory.tracker.despawn(player)
+            self.factory.movement.forget_entity(eid)
+
+    def admit(self, protocol):
+        """
+        Take over a player who is being handed off to this shard.
+
+        The player keeps the entity ID it was given by its old shard, since
+        its client has no way of learning a new one.
+
+        :returns: whether the player was handed off to this shard
+        """
+
+        eid = self.arrivals.pop(protocol.username, None)
+        if eid is None:
+            return False
+
+        self.entity_removed(eid)
+        protocol.eid = eid
+        return True
+
+    def handoff_target(self, x, z):
+        """
+        Find the shard which a player standing on a block column should be
+        handed off to.
+
+        :returns: a shard, or None if the player should stay put
+        """
+
+        owner = self.map.shard_at(x, z)
+        if owner == self.index:
+            return None
+
+        margin = self.handoff_margin
+        for i, j in ((x - margin, z), (x + margin, z), (x, z - margin),
+            (x, z + margin)):
+            if self.map.shard_at(i, j) == self.index:
+                return None
+
+        return owner
+
+    def handoff(self, protocol, shard):
+        """
+        Hand a player off to another shard.
+
+        The player is saved, so that the other shard can load it, and every
+        entity is destroyed on its client, since the other shard will spawn
+        them afresh. Once the proxy has agreed to the handoff, the player's
+        connection to this shard is closed.
+        """
+
+        if self.bus is None:
+            return
+
+        protocol.handed_off = True
+
+        self.factory.world.save_player(protocol.username, protocol.player)
+        tracker = self.factory.tracker
+        tracker.hide(protocol, list(tracker.visible.get(protocol, ())))
+
+        log.msg("Handing %s off to shard %d" % (protocol.username, shard))
+
+        d = self.bus.callRemote(Handoff, username=protocol.username,
+            eid=protocol.player.eid, shard=shard)
+
+        @d.addCallback
+        def cb(response):
+            protocol.transport.loseConnection()
+
+        @d.addErrback
+        def eb(failure):
+            log.msg("Couldn't hand %s off to shard %d: %s" %
+                (protocol.username, shard, failure.getErrorMessage()))
+            protocol.handed_off = False
+
+    def update(self):
+        """
+        Hand off players who have left this shard, and publish the locations
+        of players near a border.
+        """
+
+        for protocol in self.factory.protocols.values():
+            player = protocol.player
+            if player is None or protocol.handed_off:
+                continue
+
+            x, y, z = player.location.pos
+            shard = self.handoff_target(x // 32, z // 32)
+            if shard is not None:
+                self.handoff(protocol, shard)
+                continue
+
+            eid = player.eid
+            if self.near_border(x // 512, z // 512):
+                state = player.location.pos, player.location.ori
+                if self.published.get(eid) != state:
+                    self.published[eid] = state
+                    theta, phi = player.location.ori
+                    self.publish(EntityMoved, eid=eid,
+                        username=player.username, x=int(x), y=int(y),
+                        z=int(z), theta=theta, phi=phi)
+            elif eid in self.published:
+                del self.published[eid]
+                self.publish(EntityRemoved, eid=eid)
+
+    def forget(self, protocol):
+        """
+        Forget about a player which has disconnected.
+        """
+
+        if protocol.player is not None:
+            eid = protocol.player.eid
+            if self.published.pop(eid, None) is not None:
+                self.publish(EntityRemoved, eid=eid)
@@ -1,8 +1,15 @@
 from __future__ import division
 
 import math
+from collections import OrderedDict
 from itertools import chain, izip, permutations
 from random import Random
+from threading import Lock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 SIZE = 2**10
 
@@ -29,6 +36,12 @@ edges3 = list(
 )
 edges3.sort()
 
+# The components of the gradient picked by each permutation value, for the
+# grid functions.
+gradients_x = [edges2[i % 12][0] for i in range(SIZE)]
+gradients_y = [edges2[i % 12][1] for i in range(SIZE)]
+gradients_z = [edges2[i % 12][2] for i in range(SIZE)]
+
 def dot2(u, v):
     """
     Dot product of two 2-dimensional vectors.
@@ -41,260 +54,755 @@ def dot3(u, v):
     """
     return u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
 
-def reseed(seed):
+f2 = 0.5 * (math.sqrt(3) - 1)
+g2 = (3 - math.sqrt(3)) / 6
+
+def _simplex2_list(p, xs, ys):
     """
-    Reseed the simplex gradient field.
+    Pure-Python ``simplex2()`` over every pair of coordinates from two lists.
+
+    This is ``simplex2()`` with everything inlined and hoisted; the
+    arithmetic is kept in the same order, so that the results are identical.
     """
 
-    if seed in fields:
-        return
+    floor = math.floor
+    gx = gradients_x
+    gy = gradients_y
+
+    results = []
+    append = results.append
+
+    for x in xs:
+        for y in ys:
+            s = (x + y) * f2
+            i = floor(x + s)
+            j = floor(y + s)
+            t = (i + j) * g2
+            x0 = x - (i - t)
+            y0 = y - (j - t)
+            i = int(i) % SIZE
+            j = int(j) % SIZE
+
+            n = 0
+            t = 0.5 - x0 * x0 - y0 * y0
+            if t > 0:
+                g = p[i + p[j]]
+                n += t**4 * (gx[g] * x0 + gy[g] * y0)
+
+            if x0 > y0:
+                x1 = x0 - 1 + g2
+                y1 = y0 + g2
+                g = p[i + 1 + p[j]]
+            else:
+                x1 = x0 + g2
+                y1 = y0 - 1 + g2
+                g = p[i + p[j + 1]]
+            t = 0.5 - x1 * x1 - y1 * y1
+            if t > 0:
+                n += t**4 * (gx[g] * x1 + gy[g] * y1)
+
+            x2 = x0 - 1 + 2 * g2
+            y2 = y0 - 1 + 2 * g2
+            t = 0.5 - x2 * x2 - y2 * y2
+            if t > 0:
+                g = p[i + 1 + p[j + 1]]
+                n += t**4 * (gx[g] * x2 + gy[g] * y2)
+
+            append(n * 70)
+
+    return results
+
+def _simplex3_list(p, xs, ys, zs):
+    """
+    Pure-Python ``simplex3()`` over every triple of coordinates from three
+    lists.
+    """
 
-    p = range(SIZE)
-    r = Random()
-    r.seed(seed)
-    r.shuffle(p)
-    p *= 2
-    fields[seed] = p
+    floor = math.floor
+    gx = gradients_x
+    gy = gradients_y
+    gz = gradients_z
+    f = 1 / 3
+    g = 1 / 6
 
-def set_seed(seed):
+    results = []
+    append = results.append
+
+    for x in xs:
+        for y in ys:
+            for z in zs:
+                s = (x + y + z) * f
+                i = floor(x + s)
+                j = floor(y + s)
+                k = floor(z + s)
+                t = (i + j + k) * g
+                x0 = x - (i - t)
+                y0 = y - (j - t)
+                z0 = z - (k - t)
+                i = int(i) % SIZE
+                j = int(j) % SIZE
+                k = int(k) % SIZE
+
+                if x0 >= y0 >= z0:
+                    i1, j1, k1, i2, j2, k2 = 1, 0, 0, 1, 1, 0
+                elif x0 >= z0 >= y0:
+                    i1, j1, k1, i2, j2, k2 = 1, 0, 0, 1, 0, 1
+                elif z0 >= x0 >= y0:
+                    i1, j1, k1, i2, j2, k2 = 0, 0, 1, 1, 0, 1
+                elif z0 >= y0 >= x0:
+                    i1, j1, k1, i2, j2, k2 = 0, 0, 1, 0, 1, 1
+                elif y0 >= z0 >= x0:
+                    i1, j1, k1, i2, j2, k2 = 0, 1, 0, 0, 1, 1
+                elif y0 >= x0 >= z0:
+                    i1, j1, k1, i2, j2, k2 = 0, 1, 0, 1, 1, 0
+                else:
+                    raise Exception("You broke maths. Good work.")
+
+                n = 0
+                t = 0.6 - x0 * x0 - y0 * y0 - z0 * z0
+                if t > 0:
+                    q = p[i + p[j + p[k]]]
+                    n += t**4 * (gx[q] * x0 + gy[q] * y0 + gz[q] * z0)
+
+                x1 = x0 - i1 + g
+                y1 = y0 - j1 + g
+                z1 = z0 - k1 + g
+                t = 0.6 - x1 * x1 - y1 * y1 - z1 * z1
+                if t > 0:
+                    q = p[i + i1 + p[j + j1 + p[k + k1]]]
+                    n += t**4 * (gx[q] * x1 + gy[q] * y1 + gz[q] * z1)
+
+                x2 = x0 - i2 + f
+                y2 = y0 - j2 + f
+                z2 = z0 - k2 + f
+                t = 0.6 - x2 * x2 - y2 * y2 - z2 * z2
+                if t > 0:
+                    q = p[i + i2 + p[j + j2 + p[k + k2]]]
+                    n += t**4 * (gx[q] * x2 + gy[q] * y2 + gz[q] * z2)
+
+                x3 = x0 - 1 + 0.5
+                y3 = y0 - 1 + 0.5
+                z3 = z0 - 1 + 0.5
+                t = 0.6 - x3 * x3 - y3 * y3 - z3 * z3
+                if t > 0:
+                    q = p[i + 1 + p[j + 1 + p[k + 1]]]
+                    n += t**4 * (gx[q] * x3 + gy[q] * y3 + gz[q] * z3)
+
+                append(n * 32)
+
+    return results
+
+def _power4(t):
     """
-    Set the current seed.
+    Raise an array of floats to the fourth power, with Python's ``pow()``.
+
+    NumPy may vectorize ``power()`` with a ``pow()`` of its own, which can
+    differ from the C library's in the last bit. Noise is compared against
+    thresholds, so that bit is enough to change a block.
     """
 
-    global current_seed
+    return numpy.array([v ** 4 for v in t.tolist()], dtype=float)
 
-    reseed(seed)
+def _simplex2_array(p, x, y):
+    """
+    ``simplex2()`` over NumPy arrays of coordinates.
 
-    current_seed = seed
+    Like ``_simplex2_list()``, the arithmetic is kept in the same order as
+    ``simplex2()``, and only corners which contribute are summed, so that
+    the results are identical.
+    """
 
-fields = dict()
+    gx, gy = numpy_gradients[:2]
 
-current_seed = None
+    s = (x + y) * f2
+    i = numpy.floor(x + s)
+    j = numpy.floor(y + s)
+    t = (i + j) * g2
+    x = x - (i - t)
+    y = y - (j - t)
+    i = i.astype(numpy.intp) % SIZE
+    j = j.astype(numpy.intp) % SIZE
+
+    upper = x > y
+    i1 = upper.astype(numpy.intp)
+    j1 = 1 - i1
+
+    corners = (
+        (x, y, p[i + p[j]]),
+        (numpy.where(upper, x - 1 + g2, x + g2),
+         numpy.where(upper, y + g2, y - 1 + g2),
+         p[i + i1 + p[j + j1]]),
+        (x - 1 + 2 * g2, y - 1 + 2 * g2, p[i + 1 + p[j + 1]]),
+    )
 
-f2 = 0.5 * (math.sqrt(3) - 1)
-g2 = (3 - math.sqrt(3)) / 6
+    n = numpy.zeros(x.shape)
+    for cx, cy, gradient in corners:
+        t = 0.5 - cx * cx - cy * cy
+        inside = t > 0
+        q = gradient[inside]
+        n[inside] += _power4(t[inside]) * (gx[q] * cx[inside] +
+            gy[q] * cy[inside])
 
-def simplex2(x, y):
+    return n * 70
+
+def _simplex3_array(p, x, y, z):
+    """
+    ``simplex3()`` over NumPy arrays of coordinates.
+    """
+
+    gx, gy, gz = numpy_gradients
+    f = 1 / 3
+    g = 1 / 6
+
+    s = (x + y + z) * f
+    i = numpy.floor(x + s)
+    j = numpy.floor(y + s)
+    k = numpy.floor(z + s)
+    t = (i + j + k) * g
+    x = x - (i - t)
+    y = y - (j - t)
+    z = z - (k - t)
+    i = i.astype(numpy.intp) % SIZE
+    j = j.astype(numpy.intp) % SIZE
+    k = k.astype(numpy.intp) % SIZE
+
+    # The same tests, in the same order, as simplex3(); select() takes the
+    # first which passes.
+    conditions = [
+        (x >= y) & (y >= z),
+        (x >= z) & (z >= y),
+        (z >= x) & (x >= y),
+        (z >= y) & (y >= x),
+        (y >= z) & (z >= x),
+        (y >= x) & (x >= z),
+    ]
+    offsets = [
+        (1, 0, 0, 1, 1, 0),
+        (1, 0, 0, 1, 0, 1),
+        (0, 0, 1, 1, 0, 1),
+        (0, 0, 1, 0, 1, 1),
+        (0, 1, 0, 0, 1, 1),
+        (0, 1, 0, 1, 1, 0),
+    ]
+    i1, j1, k1, i2, j2, k2 = [numpy.select(conditions, column)
+        for column in zip(*offsets)]
+
+    corners = (
+        (x, y, z, p[i + p[j + p[k]]]),
+        (x - i1 + g, y - j1 + g, z - k1 + g,
+         p[i + i1 + p[j + j1 + p[k + k1]]]),
+        (x - i2 + f, y - j2 + f, z - k2 + f,
+         p[i + i2 + p[j + j2 + p[k + k2]]]),
+        (x - 1 + 0.5, y - 1 + 0.5, z - 1 + 0.5,
+         p[i + 1 + p[j + 1 + p[k + 1]]]),
+    )
+
+    n = numpy.zeros(x.shape)
+    for cx, cy, cz, gradient in corners:
+        t = 0.6 - cx * cx - cy * cy - cz * cz
+        inside = t > 0
+        q = gradient[inside]
+        n[inside] += _power4(t[inside]) * (gx[q] * cx[inside] +
+            gy[q] * cy[inside] + gz[q] * cz[inside])
+
+    return n * 32
+
+if numpy is not None:
+    numpy_gradients = numpy.array([gradients_x, gradients_y, gradients_z],
+        dtype=float)
+
+def _axis(start, size, scale):
+    """
+    Scale the coordinates along one axis of a grid.
     """
-    Generate simplex noise at the given coordinates.
+
+    return [(start + i) * scale for i in range(size)]
+
+class SimplexNoise(object):
+    """
+    A field of simplex noise, generated from a seed.
+
+    Each instance has its own gradient field, so that any number of them may
+    be used at once, from any number of threads.
 
     This particular implementation has very high chaotic features at normal
     resolution; zooming in by a factor of 16x to 256x is going to yield more
     pleasing results for most applications.
 
-    The gradient field must be seeded prior to calling this function; call
-    ``reseed()`` first.
+    :ivar seed: the seed of the gradient field
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+
+        p = range(SIZE)
+        r = Random()
+        r.seed(seed)
+        r.shuffle(p)
+        p *= 2
+        self.p = p
+
+        self._array = None
+
+    def __repr__(self):
+        return "SimplexNoise(%r)" % (self.seed,)
+
+    def array(self):
+        """
+        Get the gradient field as a NumPy array.
+        """
+
+        if self._array is None:
+            self._array = numpy.array(self.p, dtype=numpy.intp)
+        return self._array
+
+    def simplex2(self, x, y):
+        """
+        Generate simplex noise at the given coordinates.
+
+        :param int x: X coordinate
+        :param int y: Y coordinate
+
+        :returns: simplex noise
+        """
+
+        p = self.p
+
+        # Set up our scalers and arrays.
+        coords = [None] * 3
+        gradients = [None] * 3
+
+        s = (x + y) * f2
+        i = math.floor(x + s)
+        j = math.floor(y + s)
+        t = (i + j) * g2
+        x -= i - t
+        y -= j - t
+
+        # Clamp to the size of the simplex array.
+        i = int(i) % SIZE
+        j = int(j) % SIZE
+
+        # Look up coordinates and gradients for each contributing point in
+        # the simplex space.
+        coords[0] = x, y
+        gradients[0] = p[i + p[j]]
+        if x > y:
+            coords[1] = x - 1 + g2, y     + g2
+            gradients[1] = p[i + 1 + p[j    ]]
+        else:
+            coords[1] = x     + g2, y - 1 + g2
+            gradients[1] = p[i     + p[j + 1]]
+        coords[2] = x - 1 + 2 * g2, y - 1 + 2 * g2
+        gradients[2] = p[i + 1 + p[j + 1]]
+
+        # Do our summation.
+        n = 0
+        for coord, gradient in izip(coords, gradients):
+            t = 0.5 - coord[0] * coord[0] - coord[1] * coord[1]
+            if t > 0:
+                n += t**4 * dot2(edges2[gradient % 12], coord)
+
+        # Where's this scaling factor come from?
+        return n * 70
+
+    def simplex3(self, x, y, z):
+        """
+        Generate simplex noise at the given coordinates.
+
+        This is a 3-dimensional flavor of ``simplex2()``; all of the same
+        caveats apply.
+
+        :param int x: X coordinate
+        :param int y: Y coordinate
+        :param int z: Z coordinate
+
+        :returns: simplex noise
+        :raises Exception: you broke the function somehow
+        """
+
+        p = self.p
+
+        f = 1 / 3
+        g = 1 / 6
+        coords = [None] * 4
+        gradients = [None] * 4
+
+        s = (x + y + z) * f
+        i = math.floor(x + s)
+        j = math.floor(y + s)
+        k = math.floor(z + s)
+        t = (i + j + k) * g
+        x -= i - t
+        y -= j - t
+        z -= k - t
+
+        i = int(i) % SIZE
+        j = int(j) % SIZE
+        k = int(k) % SIZE
+
+        # Do the coord and gradient lookups. Unrolled for speed and clarity.
+        # These should be + 2 * g, but instead we do + f because we already
+        # have it calculated. (2g == 2/6 == 1/3 == f)
+        coords[0] = x, y, z
+        gradients[0] = p[i + p[j + p[k]]]
+        if x >= y >= z:
+            coords[1] = x - 1 + g, y     + g, z     + g
+            coords[2] = x - 1 + f, y - 1 + f, z     + f
+
+            gradients[1] = p[i + 1 + p[j     + p[k    ]]]
+            gradients[2] = p[i + 1 + p[j + 1 + p[k    ]]]
+        elif x >= z >= y:
+            coords[1] = x - 1 + g, y     + g, z     + g
+            coords[2] = x - 1 + f, y     + f, z - 1 + f
+
+            gradients[1] = p[i + 1 + p[j     + p[k    ]]]
+            gradients[2] = p[i + 1 + p[j     + p[k + 1]]]
+        elif z >= x >= y:
+            coords[1] = x     + g, y     + g, z - 1 + g
+            coords[2] = x - 1 + f, y     + f, z - 1 + f
+
+            gradients[1] = p[i     + p[j     + p[k + 1]]]
+            gradients[2] = p[i + 1 + p[j     + p[k + 1]]]
+        elif z >= y >= x:
+            coords[1] = x     + g, y     + g, z - 1 + g
+            coords[2] = x     + f, y - 1 + f, z - 1 + f
+
+            gradients[1] = p[i     + p[j     + p[k + 1]]]
+            gradients[2] = p[i     + p[j + 1 + p[k + 1]]]
+        elif y >= z >= x:
+            coords[1] = x     + g, y - 1 + g, z     + g
+            coords[2] = x     + f, y - 1 + f, z - 1 + f
+
+            gradients[1] = p[i     + p[j + 1 + p[k    ]]]
+            gradients[2] = p[i     + p[j + 1 + p[k + 1]]]
+        elif y >= x >= z:
+            coords[1] = x     + g, y - 1 + g, z     + g
+            coords[2] = x - 1 + f, y - 1 + f, z     + f
+
+            gradients[1] = p[i     + p[j + 1 + p[k    ]]]
+            gradients[2] = p[i + 1 + p[j + 1 + p[k    ]]]
+        else:
+            raise Exception("You broke maths. Good work.")
+
+        coords[3] = x - 1 + 0.5, y - 1 + 0.5, z - 1 + 0.5
+        gradients[3] = p[i + 1 + p[j + 1 + p[k + 1]]]
+
+        n = 0
+        for coord, gradient in izip(coords, gradients):
+            t = (0.6 - coord[0] * coord[0] - coord[1] * coord[1] - coord[2] *
+                coord[2])
+            if t > 0:
+                n += t**4 * dot3(edges2[gradient % 12], coord)
+
+        # Where's this scaling factor come from?
+        return n * 32
+
+    def simplex(self, *args):
+        if len(args) == 2:
+            return self.simplex2(*args)
+        if len(args) == 3:
+            return self.simplex3(*args)
+        else:
+            raise Exception("Don't know how to do %dD noise!" % len(args))
+
+    def octaves2(self, x, y, count):
+        """
+        Generate fractal octaves of noise.
+
+        Summing increasingly scaled amounts of noise with itself creates
+        fractal clouds of noise.
+
+        :param int x: X coordinate
+        :param int y: Y coordinate
+        :param int count: number of octaves
+
+        :returns: Scaled fractal noise
+        """
+
+        sigma = 0
+        divisor = 1
+        while count:
+            sigma += self.simplex2(x * divisor, y * divisor) / divisor
+            divisor *= 2
+            count -= 1
+        return sigma
+
+    def octaves3(self, x, y, z, count):
+        """
+        Generate fractal octaves of noise.
+
+        :param int x: X coordinate
+        :param int y: Y coordinate
+        :param int z: Z coordinate
+        :param int count: number of octaves
+
+        :returns: Scaled fractal noise
+        """
+
+        sigma = 0
+        divisor = 1
+        while count:
+            sigma += self.simplex3(x * divisor, y * divisor,
+                z * divisor) / divisor
+            divisor *= 2
+            count -= 1
+        return sigma
+
+    def offset2(self, x, y, xoffset, yoffset, octaves=1):
+        """
+        Generate an offset noise difference field.
+
+        :param int x: X coordinate
+        :param int y: Y coordinate
+        :param int xoffset: X offset
+        :param int yoffset: Y offset
+
+        :returns: Difference of noises
+        """
+
+        return (self.octaves2(x, y, octaves) -
+            self.octaves2(x + xoffset, y + yoffset, octaves) + 1) * 0.5
+
+    def octaves2_grid(self, x, y, xsize, ysize, scale, count):
+        """
+        Generate fractal octaves of noise over a grid of coordinates.
+
+        The grid starts at integer coordinates and takes unit steps, which
+        are then scaled, so that ``octaves2_grid(x, y, w, h, scale,
+        count)[i * h + j]`` is ``octaves2((x + i) * scale, (y + j) * scale,
+        count)``. With ``xsize`` and ``ysize`` of 16, this is the order of a
+        chunk's heightmap.
+
+        NumPy is used when it is available. Either way, the results are
+        exactly those of the scalar functions, so that terrain doesn't
+        depend on whether NumPy is installed.
+
+        :param int x: X coordinate of the corner of the grid
+        :param int y: Y coordinate of the corner of the grid
+        :param int xsize: number of points along X
+        :param int ysize: number of points along Y
+        :param float scale: scale of the grid, or a tuple of scales per axis
+        :param int count: number of octaves
+
+        :returns: list of scaled fractal noise
+        """
+
+        if not isinstance(scale, tuple):
+            scale = scale, scale
+
+        xs = _axis(x, xsize, scale[0])
+        ys = _axis(y, ysize, scale[1])
+
+        if numpy is not None:
+            p = self.array()
+            xs, ys = numpy.meshgrid(xs, ys, indexing="ij")
+            xs = xs.ravel()
+            ys = ys.ravel()
+
+            sigma = numpy.zeros(xs.shape)
+            divisor = 1
+            while count:
+                sigma += _simplex2_array(p, xs * divisor,
+                    ys * divisor) / divisor
+                divisor *= 2
+                count -= 1
+            return sigma.tolist()
+
+        p = self.p
+        sigma = [0] * (xsize * ysize)
+        divisor = 1
+        while count:
+            noise = _simplex2_list(p, [i * divisor for i in xs],
+                [j * divisor for j in ys])
+            sigma = [a + b / divisor for a, b in izip(sigma, noise)]
+            divisor *= 2
+            count -= 1
+        return sigma
+
+    def octaves3_grid(self, x, y, z, xsize, ysize, zsize, scale, count):
+        """
+        Generate fractal octaves of noise over a grid of coordinates.
+
+        This is the 3-dimensional flavor of ``octaves2_grid()``. Points are
+        ordered with Z varying fastest, so that ``octaves3_grid(x, y, z, w,
+        h, d, scale, count)[(i * h + j) * d + k]`` is ``octaves3((x + i) *
+        scale, (y + j) * scale, (z + k) * scale, count)``.
+
+        :param int x: X coordinate of the corner of the grid
+        :param int y: Y coordinate of the corner of the grid
+        :param int z: Z coordinate of the corner of the grid
+        :param int xsize: number of points along X
+        :param int ysize: number of points along Y
+        :param int zsize: number of points along Z
+        :param float scale: scale of the grid, or a tuple of scales per axis
+        :param int count: number of octaves
+
+        :returns: list of scaled fractal noise
+        """
+
+        if not isinstance(scale, tuple):
+            scale = scale, scale, scale
+
+        xs = _axis(x, xsize, scale[0])
+        ys = _axis(y, ysize, scale[1])
+        zs = _axis(z, zsize, scale[2])
+
+        if numpy is not None:
+            p = self.array()
+            xs, ys, zs = numpy.meshgrid(xs, ys, zs, indexing="ij")
+            xs = xs.ravel()
+            ys = ys.ravel()
+            zs = zs.ravel()
+
+            sigma = numpy.zeros(xs.shape)
+            divisor = 1
+            while count:
+                sigma += _simplex3_array(p, xs * divisor, ys * divisor,
+                    zs * divisor) / divisor
+                divisor *= 2
+                count -= 1
+            return sigma.tolist()
+
+        p = self.p
+        sigma = [0] * (xsize * ysize * zsize)
+        divisor = 1
+        while count:
+            noise = _simplex3_list(p, [i * divisor for i in xs],
+                [j * divisor for j in ys], [k * divisor for k in zs])
+            sigma = [a + b / divisor for a, b in izip(sigma, noise)]
+            divisor *= 2
+            count -= 1
+        return sigma
+
+FIELDS = 16
+"""
+The number of gradient fields kept by ``get_noise()``.
+"""
+
+fields = OrderedDict()
+fields_lock = Lock()
+
+def get_noise(seed):
+    """
+    Get the noise for a seed.
 
-    :param int x: X coordinate
-    :param int y: Y coordinate
+    Noise is cached for the most recently used seeds, since shuffling a new
+    gradient field is not free. The cache may be used from any thread.
 
-    :returns: simplex noise
-    :raises Exception: the gradient field is not seeded
+    :returns: ``SimplexNoise``
     """
 
-    if current_seed is None:
-        raise Exception("The gradient field is unseeded!")
+    with fields_lock:
+        noise = fields.pop(seed, None)
+        if noise is None:
+            noise = SimplexNoise(seed)
+        fields[seed] = noise
 
-    p = fields[current_seed]
+        while len(fields) > FIELDS:
+            fields.popitem(last=False)
 
-    # Set up our scalers and arrays.
-    coords = [None] * 3
-    gradients = [None] * 3
+    return noise
 
-    s = (x + y) * f2
-    i = math.floor(x + s)
-    j = math.floor(y + s)
-    t = (i + j) * g2
-    x -= i - t
-    y -= j - t
-
-    # Clamp to the size of the simplex array.
-    i = int(i) % SIZE
-    j = int(j) % SIZE
-
-    # Look up coordinates and gradients for each contributing point in the
-    # simplex space.
-    coords[0] = x, y
-    gradients[0] = p[i + p[j]]
-    if x > y:
-        coords[1] = x - 1 + g2, y     + g2
-        gradients[1] = p[i + 1 + p[j    ]]
-    else:
-        coords[1] = x     + g2, y - 1 + g2
-        gradients[1] = p[i     + p[j + 1]]
-    coords[2] = x - 1 + 2 * g2, y - 1 + 2 * g2
-    gradients[2] = p[i + 1 + p[j + 1]]
-
-    # Do our summation.
-    n = 0
-    for coord, gradient in izip(coords, gradients):
-        t = 0.5 - coord[0] * coord[0] - coord[1] * coord[1]
-        if t > 0:
-            n += t**4 * dot2(edges2[gradient % 12], coord)
-
-    # Where's this scaling factor come from?
-    return n * 70
+# The module-level functions use a single, global seed. They are kept for
+# convenience; anything which might share the module with other users of
+# noise should use its own SimplexNoise instead.
 
-def simplex3(x, y, z):
+current_seed = None
+current_noise = None
+
+def reseed(seed):
+    """
+    Reseed the simplex gradient field.
     """
-    Generate simplex noise at the given coordinates.
 
-    This is a 3-dimensional flavor of ``simplex2()``; all of the same caveats
-    apply.
+    get_noise(seed)
 
-    The gradient field must be seeded prior to calling this function; call
-    ``reseed()`` first.
+def set_seed(seed):
+    """
+    Set the current seed.
+    """
+
+    global current_seed, current_noise
+
+    current_noise = get_noise(seed)
+    current_seed = seed
 
-    :param int x: X coordinate
-    :param int y: Y coordinate
-    :param int z: Z coordinate
+def _current():
+    """
+    Get the noise for the current seed.
 
-    :returns: simplex noise
-    :raises Exception: the gradient field is not seeded or you broke the
-                       function somehow
+    :raises Exception: the gradient field is not seeded
     """
 
-    if current_seed is None:
+    if current_noise is None:
         raise Exception("The gradient field is unseeded!")
 
-    p = fields[current_seed]
+    return current_noise
 
-    f = 1 / 3
-    g = 1 / 6
-    coords = [None] * 4
-    gradients = [None] * 4
+def simplex2(x, y):
+    """
+    Generate simplex noise at the given coordinates, with the current seed.
 
-    s = (x + y + z) * f
-    i = math.floor(x + s)
-    j = math.floor(y + s)
-    k = math.floor(z + s)
-    t = (i + j + k) * g
-    x -= i - t
-    y -= j - t
-    z -= k - t
-
-    i = int(i) % SIZE
-    j = int(j) % SIZE
-    k = int(k) % SIZE
-
-    # Do the coord and gradient lookups. Unrolled for speed and clarity.
-    # These should be + 2 * g, but instead we do + f because we already have
-    # it calculated. (2g == 2/6 == 1/3 == f)
-    coords[0] = x, y, z
-    gradients[0] = p[i + p[j + p[k]]]
-    if x >= y >= z:
-        coords[1] = x - 1 + g, y     + g, z     + g
-        coords[2] = x - 1 + f, y - 1 + f, z     + f
-
-        gradients[1] = p[i + 1 + p[j     + p[k    ]]]
-        gradients[2] = p[i + 1 + p[j + 1 + p[k    ]]]
-    elif x >= z >= y:
-        coords[1] = x - 1 + g, y     + g, z     + g
-        coords[2] = x - 1 + f, y     + f, z - 1 + f
-
-        gradients[1] = p[i + 1 + p[j     + p[k    ]]]
-        gradients[2] = p[i + 1 + p[j     + p[k + 1]]]
-    elif z >= x >= y:
-        coords[1] = x     + g, y     + g, z - 1 + g
-        coords[2] = x - 1 + f, y     + f, z - 1 + f
-
-        gradients[1] = p[i     + p[j     + p[k + 1]]]
-        gradients[2] = p[i + 1 + p[j     + p[k + 1]]]
-    elif z >= y >= x:
-        coords[1] = x     + g, y     + g, z - 1 + g
-        coords[2] = x     + f, y - 1 + f, z - 1 + f
-
-        gradients[1] = p[i     + p[j     + p[k + 1]]]
-        gradients[2] = p[i     + p[j + 1 + p[k + 1]]]
-    elif y >= z >= x:
-        coords[1] = x     + g, y - 1 + g, z     + g
-        coords[2] = x     + f, y - 1 + f, z - 1 + f
-
-        gradients[1] = p[i     + p[j + 1 + p[k    ]]]
-        gradients[2] = p[i     + p[j + 1 + p[k + 1]]]
-    elif y >= x >= z:
-        coords[1] = x     + g, y - 1 + g, z     + g
-        coords[2] = x - 1 + f, y - 1 + f, z     + f
-
-        gradients[1] = p[i     + p[j + 1 + p[k    ]]]
-        gradients[2] = p[i + 1 + p[j + 1 + p[k    ]]]
-    else:
-        raise Exception("You broke maths. Good work.")
-
-    coords[3] = x - 1 + 0.5, y - 1 + 0.5, z - 1 + 0.5
-    gradients[3] = p[i + 1 + p[j + 1 + p[k + 1]]]
-
-    n = 0
-    for coord, gradient in izip(coords, gradients):
-        t = (0.6 - coord[0] * coord[0] - coord[1] * coord[1] - coord[2] *
-            coord[2])
-        if t > 0:
-            n += t**4 * dot3(edges2[gradient % 12], coord)
-
-    # Where's this scaling factor come from?
-    return n * 32
+    See ``SimplexNoise.simplex2()``.
+    """
 
-def simplex(*args):
-    if len(args) == 2:
-        return simplex2(*args)
-    if len(args) == 3:
-        return simplex3(*args)
-    else:
-        raise Exception("Don't know how to do %dD noise!" % len(args))
+    return _current().simplex2(x, y)
 
-def octaves2(x, y, count):
+def simplex3(x, y, z):
+    """
+    Generate simplex noise at the given coordinates, with the current seed.
+
+    See ``SimplexNoise.simplex3()``.
     """
-    Generate fractal octaves of noise.
 
-    Summing increasingly scaled amounts of noise with itself creates fractal
-    clouds of noise.
+    return _current().simplex3(x, y, z)
+
+def simplex(*args):
+    return _current().simplex(*args)
 
-    :param int x: X coordinate
-    :param int y: Y coordinate
-    :param int count: number of octaves
+def octaves2(x, y, count):
+    """
+    Generate fractal octaves of noise, with the current seed.
 
-    :returns: Scaled fractal noise
+    See ``SimplexNoise.octaves2()``.
     """
 
-    sigma = 0
-    divisor = 1
-    while count:
-        sigma += simplex2(x * divisor, y * divisor) / divisor
-        divisor *= 2
-        count -= 1
-    return sigma
+    return _current().octaves2(x, y, count)
 
 def octaves3(x, y, z, count):
     """
-    Generate fractal octaves of noise.
-
-    :param int x: X coordinate
-    :param int y: Y coordinate
-    :param int z: Z coordinate
-    :param int count: number of octaves
+    Generate fractal octaves of noise, with the current seed.
 
-    :returns: Scaled fractal noise
+    See ``SimplexNoise.octaves3()``.
     """
 
-    sigma = 0
-    divisor = 1
-    while count:
-        sigma += simplex3(x * divisor, y * divisor, z * divisor) / divisor
-        divisor *= 2
-        count -= 1
-    return sigma
+    return _current().octaves3(x, y, z, count)
 
 def offset2(x, y, xoffset, yoffset, octaves=1):
     """
-    Generate an offset noise difference field.
+    Generate an offset noise difference field, with the current seed.
+
+    See ``SimplexNoise.offset2()``.
+    """
+
+    return _current().offset2(x, y, xoffset, yoffset, octaves)
+
+def octaves2_grid(x, y, xsize, ysize, scale, count):
+    """
+    Generate fractal octaves of noise over a grid, with the current seed.
+
+    See ``SimplexNoise.octaves2_grid()``.
+    """
+
+    return _current().octaves2_grid(x, y, xsize, ysize, scale, count)
 
-    :param int x: X coordinate
-    :param int y: Y coordinate
-    :param int xoffset: X offset
-    :param int yoffset: Y offset
+def octaves3_grid(x, y, z, xsize, ysize, zsize, scale, count):
+    """
+    Generate fractal octaves of noise over a grid, with the current seed.
 
-    :returns: Difference of noises
+    See ``SimplexNoise.octaves3_grid()``.
     """
 
-    return (octaves2(x, y, octaves) -
-        octaves2(x + xoffset, y + yoffset, octaves) + 1) * 0.5
+    return _current().octaves3_grid(x, y, z, xsize, ysize, zsize, scale,
+        count)
@@ -0,0 +1,132 @@
+from array import array
+
+from bravo.chunk import CHUNK_HEIGHT
+from bravo.simplex import get_noise
+from bravo.terrain.decoration import DecorationQueue
+from bravo.terrain.density import chunk_density
+from bravo.utilities.coords import XZ
+
+class GenerationContext(object):
+    """
+    State shared by the stages of the terrain pipeline while they populate a
+    chunk.
+
+    A fresh context is made for every chunk, and handed to each stage in
+    turn. It remembers the noise fields which stages have sampled, so that a
+    field which several stages need is only sampled once, and it keeps the
+    chunk's heightmap up to date without rescanning the whole chunk every
+    time a stage needs it.
+
+    Stages which build structures reaching past the edges of the chunk write
+    them with ``decorate()``. The parts which land in other chunks are
+    collected in ``decorations``, and handed to the world once the chunk is
+    done.
+
+    :ivar chunk: the chunk being populated
+    :ivar int seed: the world seed
+    :ivar noise: the ``SimplexNoise`` for the seed
+    :ivar decorations: a ``DecorationQueue`` of writes to other chunks
+    """
+
+    def __init__(self, chunk, seed, noise=None):
+        self.chunk = chunk
+        self.seed = seed
+        self.noise = get_noise(seed) if noise is None else noise
+
+        self.fields = {}
+        self.decorations = DecorationQueue()
+        self._snapshot = None
+
+    def field(self, key, f, *args):
+        """
+        Get a noise field, sampling it only if it hasn't been sampled yet.
+
+        Fields are shared between stages and must not be modified.
+
+        :param tuple key: everything which determines the field's values
+        :param f: callable which samples the field
+        :param args: arguments for ``f``
+        """
+
+        if key not in self.fields:
+            self.fields[key] = f(*args)
+        return self.fields[key]
+
+    def octaves2_grid(self, x, y, xsize, ysize, scale, count):
+        """
+        Sample 2D fractal noise over a grid, as
+        ``SimplexNoise.octaves2_grid()``.
+        """
+
+        key = ("octaves2", self.noise.seed, x, y, xsize, ysize, scale, count)
+        return self.field(key, self.noise.octaves2_grid, x, y, xsize, ysize,
+            scale, count)
+
+    def density(self, height, scale, count, lattice, noise=None):
+        """
+        Sample 3D noise for the columns of the chunk, as
+        ``bravo.terrain.density.chunk_density()``.
+
+        :param noise: ``SimplexNoise`` to sample instead of the seed's own
+        """
+
+        if noise is None:
+            noise = self.noise
+
+        key = ("density", noise.seed, height, scale, count, lattice)
+        return self.field(key, chunk_density, noise, self.chunk, height,
+            scale, count, lattice)
+
+    def decorate(self, coords, block, metadata=0, replace=None):
+        """
+        Write a block which might lie outside of the chunk.
+
+        :param tuple coords: coordinates relative to the chunk, which may be
+            out of its bounds along X and Z
+        :param int block: block type
+        :param int metadata: block metadata
+        :param replace: blocks which may be overwritten, or None for any
+        """
+
+        x, y, z = coords
+
+        if 0 <= x < 16 and 0 <= z < 16:
+            if not 0 <= y < CHUNK_HEIGHT:
+                return
+            chunk = self.chunk
+            if replace is None or chunk.get_block(coords) in replace:
+                chunk.set_block(coords, block)
+                chunk.set_metadata(coords, metadata)
+        else:
+            self.decorations.add((self.chunk.x * 16 + x, y,
+                self.chunk.z * 16 + z), block, metadata, replace)
+
+    def regenerate_heightmap(self):
+        """
+        Bring the chunk's heightmap up to date.
+
+        The first time around, every column is scanned. After that, only
+        the columns of sections which have changed since the last time are
+        compared against a copy of the section, and rescanned if they
+        differ.
+        """
+
+        sections = self.chunk.sections
+
+        if self._snapshot is None:
+            columns = None
+        else:
+            columns = set()
+            for section, old in zip(sections, self._snapshot):
+                blocks = section.blocks
+                if blocks == old:
+                    continue
+                for x, z in XZ:
+                    i = z * 16 + x
+                    if blocks[i::256] != old[i::256]:
+                        columns.add(x * 16 + z)
+
+        if columns is None or columns:
+            self.chunk.regenerate_heightmap(columns)
+
+        self._snapshot = [array("B", section.blocks) for section in sections]
@@ -0,0 +1,117 @@
+import json
+
+from bravo.chunk import CHUNK_HEIGHT
+from bravo.utilities.coords import split_coords
+
+class DecorationQueue(object):
+    """
+    Block writes waiting for chunks which aren't loaded yet.
+
+    Trees, ores, and other structures often reach past the edge of the chunk
+    they start in. Rather than loading the neighboring chunks just to finish
+    them, the writes which land in unloaded chunks are kept here, keyed by
+    their chunk, and applied once the chunk is generated or loaded.
+
+    Writes are kept in chunk coordinates, as tuples of ``(x, y, z, block,
+    metadata, replace)``, where ``replace`` is either None, to overwrite
+    whatever is there, or a tuple of the blocks which may be overwritten.
+
+    :ivar dict pending: lists of writes, by chunk coordinates
+    :ivar bool dirty: whether the queue has changed since it was last saved
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.dirty = False
+
+    def __len__(self):
+        return sum(len(writes) for writes in self.pending.itervalues())
+
+    def __contains__(self, key):
+        return key in self.pending
+
+    def add(self, coords, block, metadata=0, replace=None):
+        """
+        Queue a write.
+
+        :param tuple coords: world coordinates of the block
+        :param int block: block type
+        :param int metadata: block metadata
+        :param replace: blocks which may be overwritten, or None for any
+        """
+
+        x, y, z = coords
+
+        if not 0 <= y < CHUNK_HEIGHT:
+            return
+
+        if replace is not None:
+            replace = tuple(replace)
+
+        bigx, smallx, bigz, smallz = split_coords(x, z)
+        self.pending.setdefault((bigx, bigz), []).append(
+            (smallx, y, smallz, block, metadata, replace))
+        self.dirty = True
+
+    def update(self, other):
+        """
+        Take on all of the writes of another queue.
+        """
+
+        for key, writes in other.pending.iteritems():
+            self.pending.setdefault(key, []).extend(writes)
+            self.dirty = True
+
+    def apply(self, chunk):
+        """
+        Apply, and forget, the writes waiting for a chunk.
+
+        Writes are applied in the order in which they were queued, so later
+        writes win.
+
+        :returns: the number of writes which were applied
+        """
+
+        writes = self.pending.pop((chunk.x, chunk.z), None)
+        if not writes:
+            return 0
+
+        self.dirty = True
+        applied = 0
+
+        for x, y, z, block, metadata, replace in writes:
+            coords = x, y, z
+            if replace is None or chunk.get_block(coords) in replace:
+                chunk.set_block(coords, block)
+                chunk.set_metadata(coords, metadata)
+                applied += 1
+
+        chunk.dirty = True
+        return applied
+
+    def save(self):
+        """
+        Serialize the queue.
+
+        :returns: str
+        """
+
+        self.dirty = False
+        return json.dumps([[x, z, writes]
+            for (x, z), writes in sorted(self.pending.iteritems())])
+
+    def load(self, data):
+        """
+        Add the writes from a serialized queue.
+
+        :param str data: a serialized queue; empty strings are ignored
+        """
+
+        if not data:
+            return
+
+        for x, z, writes in json.loads(data):
+            self.pending.setdefault((x, z), []).extend(
+                (x2, y, z2, block, metadata,
+                    None if replace is None else tuple(replace))
+                for x2, y, z2, block, metadata, replace in writes)
@@ -0,0 +1,147 @@
+from __future__ import division
+
+from itertools import izip
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def lattice_points(size, step):
+    """
+    Count the lattice points needed to cover an axis.
+
+    The lattice starts at the first point of the axis, and extends to or
+    past the last point, so that every point of the axis lies between two
+    lattice points.
+    """
+
+    return -(-(size - 1) // step) + 1
+
+def _weights(size, step):
+    """
+    Find, for every point of an axis, the lattice point below it and how far
+    along it is towards the next one.
+    """
+
+    return [(i // step, (i % step) / step) for i in range(size)]
+
+def _stretch(values, outer, points, inner, size, step):
+    """
+    Linearly interpolate the middle axis of a flat grid of ``outer`` by
+    ``points`` by ``inner`` values out to ``size`` values.
+    """
+
+    weights = _weights(size, step)
+    stretched = []
+    extend = stretched.extend
+
+    if inner == 1:
+        for i in range(outer):
+            row = values[i * points:(i + 1) * points]
+            extend([row[k] + (row[k + 1] - row[k]) * t if t else row[k]
+                for k, t in weights])
+        return stretched
+
+    for i in range(outer):
+        base = i * points * inner
+        rows = [values[base + k * inner:base + (k + 1) * inner]
+            for k in range(points)]
+        for k, t in weights:
+            if t:
+                extend([a + (b - a) * t for a, b in izip(rows[k],
+                    rows[k + 1])])
+            else:
+                extend(rows[k])
+
+    return stretched
+
+def _stretch_array(values, axis, size, step):
+    """
+    Linearly interpolate one axis of a NumPy array out to ``size`` values.
+    """
+
+    weights = _weights(size, step)
+    below = numpy.array([k for k, t in weights])
+    above = numpy.minimum(below + 1, values.shape[axis] - 1)
+    shape = [1] * values.ndim
+    shape[axis] = size
+    t = numpy.array([t for k, t in weights]).reshape(shape)
+
+    low = numpy.take(values, below, axis=axis)
+    high = numpy.take(values, above, axis=axis)
+    return low + (high - low) * t
+
+def lattice_grid(noise, x, y, z, xsize, ysize, zsize, scale, count, steps):
+    """
+    Sample fractal noise over a grid by interpolating between samples on a
+    coarser lattice.
+
+    This takes the same arguments, and gives results in the same order, as
+    ``SimplexNoise.octaves3_grid()``, with the addition of the spacing of
+    the lattice along each axis. Noise is only evaluated every ``steps``
+    points; everything in between is trilinearly interpolated. Noise which
+    is smooth at the scale of the lattice looks much the same, for a
+    fraction of the cost: a lattice of 4 by 4 by 8 takes one sample for
+    every 128 points.
+
+    :param noise: ``SimplexNoise`` to sample
+    :param tuple steps: spacing of the lattice along X, Y, and Z
+
+    :returns: list of interpolated fractal noise
+    """
+
+    if not isinstance(scale, tuple):
+        scale = scale, scale, scale
+
+    sx, sy, sz = steps
+    if steps == (1, 1, 1):
+        return noise.octaves3_grid(x, y, z, xsize, ysize, zsize, scale,
+            count)
+
+    px = lattice_points(xsize, sx)
+    py = lattice_points(ysize, sy)
+    pz = lattice_points(zsize, sz)
+
+    # Lattice coordinates, scaled up so that each lattice step is a unit
+    # step of the grid.
+    samples = noise.octaves3_grid(x / sx, y / sy, z / sz, px, py, pz,
+        (scale[0] * sx, scale[1] * sy, scale[2] * sz), count)
+
+    # Stretch the innermost axis first, while there is the least to do.
+    if numpy is not None:
+        samples = numpy.array(samples).reshape(px, py, pz)
+        samples = _stretch_array(samples, 2, zsize, sz)
+        samples = _stretch_array(samples, 1, ysize, sy)
+        samples = _stretch_array(samples, 0, xsize, sx)
+        return samples.ravel().tolist()
+
+    samples = _stretch(samples, px * py, pz, 1, zsize, sz)
+    samples = _stretch(samples, px, py, zsize, ysize, sy)
+    samples = _stretch(samples, 1, px, ysize * zsize, xsize, sx)
+    return samples
+
+def chunk_density(noise, chunk, height, scale, count, lattice):
+    """
+    Sample 3D noise for the columns of a chunk, up to a height.
+
+    Noise is sampled with the chunk's X and Z along its first two axes and Y
+    along its third, as the terrain generators have always done. The
+    results are in column order, so the sample for ``(x, y, z)`` is at
+    ``(x * 16 + z) * height + y``.
+
+    :param chunk: the chunk
+    :param int height: how many blocks of each column to sample
+    :param scale: scale of the noise, or a tuple of scales along X, Y, and Z
+    :param int count: number of octaves
+    :param tuple lattice: spacing of the lattice along X, Y, and Z
+
+    :returns: list of interpolated fractal noise
+    """
+
+    if isinstance(scale, tuple):
+        scale = scale[0], scale[2], scale[1]
+
+    x, y, z = lattice
+    return lattice_grid(noise, chunk.x * 16, chunk.z * 16, 0, 16, 16, height,
+        scale, count, (x, z, y))
@@ -2,12 +2,13 @@ from __future__ import division
 
 from itertools import product
 from math import cos, pi, sin, sqrt
-from random import choice, random, randint
+from random import choice, random, randint, randrange
 
 from zope.interface import Interface, implements
 
 from bravo.blocks import blocks
 from bravo.chunk import CHUNK_HEIGHT
+from bravo.terrain.decoration import DecorationQueue
 from bravo.utilities.maths import dist
 
 
@@ -28,6 +29,11 @@ Phi and inverse phi constants.
 DARK, ONE, TWO, FOUR = range(4)
 LIGHTING = DARK
 
+SHAPES = 4
+"""
+The number of shapes kept for each kind and height of tree.
+"""
+
 
 def dist_to_mat(cord, vec, matidxlist, world, invert=False, limit=None):
     """
@@ -85,6 +91,72 @@ class ITree(Interface):
 OAK, PINE, BIRCH, JUNGLE = range(4)
 
 
+class Structure(object):
+    """
+    A buffer of blocks, for building structures before they are placed.
+
+    Structures have the same ``decorate()`` as worlds, so trees can be built
+    into one just as they would be built into a world. Later writes to a
+    block win, as they would in a world.
+
+    :ivar dict blocks: writes of ``(block, metadata, replace)``, by
+        coordinates
+    """
+
+    def __init__(self):
+        self.blocks = {}
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def decorate(self, coords, block, metadata=0, replace=None):
+        if replace is not None:
+            replace = tuple(replace)
+        self.blocks[tuple(coords)] = block, metadata, replace
+
+    def queue(self, origin):
+        """
+        Move the structure into place, and sort its writes by chunk.
+
+        Writes which land above or below the world are dropped.
+
+        :param tuple origin: world coordinates of the structure's origin
+        :returns: a ``DecorationQueue`` of the writes
+        """
+
+        ox, oy, oz = origin
+        queue = DecorationQueue()
+        for (x, y, z), (block, metadata, replace) in self.blocks.iteritems():
+            queue.add((x + ox, y + oy, z + oz), block, metadata, replace)
+        return queue
+
+
+_shapes = {}
+
+
+def shape(cls, height):
+    """
+    Get the shape of a tree, built around the origin.
+
+    Shapes are only built once; one of a few shapes for each kind and height
+    of tree is picked at random.
+
+    :param cls: the kind of tree
+    :param int height: the height of the tree
+    :returns: a ``Structure``
+    """
+
+    key = cls, height, randrange(SHAPES)
+    if key not in _shapes:
+        structure = Structure()
+        tree = cls(pos=(0, 0, 0), height=height)
+        tree.prepare(structure)
+        tree.make_trunk(structure)
+        tree.make_foliage(structure)
+        _shapes[key] = structure
+    return _shapes[key]
+
+
 class Tree(object):
     """
     Set up the interface for tree objects.  Designed for subclassing.
@@ -110,6 +182,17 @@ class Tree(object):
     def make_foliage(self, world):
         pass
 
+    def grow(self, world):
+        """
+        Grow the whole tree in a world at once.
+
+        The tree takes one of the shapes kept for its kind and height, which
+        is written a chunk at a time; loaded chunks are changed and flushed
+        straight away, and the rest are changed when they are loaded.
+        """
+
+        world.queue_decorations(shape(type(self), self.height).queue(self.pos))
+
 
 class StickTree(Tree):
     """
@@ -121,8 +204,7 @@ class StickTree(Tree):
     def make_trunk(self, world):
         x, y, z = self.pos
         for y in range(y, y + self.height):
-            world.sync_set_block((x, y, z), blocks["log"].slot)
-            world.sync_set_metadata((x, y, z), self.species)
+            world.decorate((x, y, z), blocks["log"].slot, self.species)
 
 
 class NormalTree(StickTree):
@@ -151,8 +233,7 @@ class NormalTree(StickTree):
                 x = self.pos[0] + xoff
                 z = self.pos[2] + zoff
 
-                world.sync_set_block((x, y, z), blocks["leaves"].slot)
-                world.sync_set_metadata((x, y, z), self.species)
+                world.decorate((x, y, z), blocks["leaves"].slot, self.species)
 
 
 class BambooTree(StickTree):
@@ -171,7 +252,7 @@ class BambooTree(StickTree):
                 zoff = choice([-1, 1])
                 x = self.pos[0] + xoff
                 z = self.pos[2] + zoff
-                world.sync_set_block((x, y, z), blocks["leaves"].slot)
+                world.decorate((x, y, z), blocks["leaves"].slot)
 
 
 class PalmTree(StickTree):
@@ -188,7 +269,7 @@ class PalmTree(StickTree):
             if abs(xoff) == abs(zoff):
                 x = self.pos[0] + xoff
                 z = self.pos[2] + zoff
-                world.sync_set_block((x, y, z), blocks["leaves"].slot)
+                world.decorate((x, y, z), blocks["leaves"].slot)
 
 
 class ProceduralTree(Tree):
@@ -235,8 +316,7 @@ class ProceduralTree(Tree):
             coord[diraxis] = pri
             coord[secidx1] = sec1
             coord[secidx2] = sec2
-            world.sync_set_block(coord, matidx)
-            world.sync_set_metadata(coord, self.species)
+            world.decorate(coord, matidx, self.species)
 
     def shapefunc(self, y):
         """
@@ -329,18 +409,17 @@ class ProceduralTree(Tree):
         for coord in foliage_coords:
             self.foliage_cluster(coord, world)
         for x, y, z in foliage_coords:
-            world.sync_set_block((x, y, z), blocks["log"].slot)
-            world.sync_set_metadata((x, y, z), self.species)
+            world.decorate((x, y, z), blocks["log"].slot, self.species)
             if LIGHTING == ONE:
-                world.sync_set_block((x, y + 1, z), blocks["lightstone"].slot)
+                world.decorate((x, y + 1, z), blocks["lightstone"].slot)
             elif LIGHTING == TWO:
-                world.sync_set_block((x + 1, y, z), blocks["lightstone"].slot)
-                world.sync_set_block((x - 1, y, z), blocks["lightstone"].slot)
+                world.decorate((x + 1, y, z), blocks["lightstone"].slot)
+                world.decorate((x - 1, y, z), blocks["lightstone"].slot)
             elif LIGHTING == FOUR:
-                world.sync_set_block((x + 1, y, z), blocks["lightstone"].slot)
-                world.sync_set_block((x - 1, y, z), blocks["lightstone"].slot)
-                world.sync_set_block((x, y, z + 1), blocks["lightstone"].slot)
-                world.sync_set_block((x, y, z - 1), blocks["lightstone"].slot)
+                world.decorate((x + 1, y, z), blocks["lightstone"].slot)
+                world.decorate((x - 1, y, z), blocks["lightstone"].slot)
+                world.decorate((x, y, z + 1), blocks["lightstone"].slot)
+                world.decorate((x, y, z - 1), blocks["lightstone"].slot)
 
     def make_branches(self, world):
         """
@@ -0,0 +1,196 @@
+from twisted.internet.task import Clock
+from twisted.trial import unittest
+
+from bravo.beta.cork import CorkedTransport
+
+class FakeTransport(object):
+
+    lost = False
+    aborted = False
+
+    def __init__(self):
+        self.writes = []
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+    def writeSequence(self, data):
+        self.writes.append("".join(data))
+
+    def loseConnection(self):
+        self.lost = True
+
+    def abortConnection(self):
+        self.aborted = True
+
+    def getPeer(self):
+        return "peer"
+
+class FakeProducer(object):
+
+    paused = False
+    stopped = False
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+
+    def stopProducing(self):
+        self.stopped = True
+
+class TestCorkedTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.transport = FakeTransport()
+        self.t = CorkedTransport(self.transport, threshold=10)
+        self.t.clock = self.clock
+
+    def test_trivial(self):
+        pass
+
+    def test_coalesce(self):
+        self.t.write("abc")
+        self.t.write("def")
+        self.assertEqual(self.transport.writes, [])
+
+        self.clock.advance(0)
+        self.assertEqual(self.transport.writes, ["abcdef"])
+
+        stats = self.t.stats()
+        self.assertEqual(stats["packets"], 2)
+        self.assertEqual(stats["bytes"], 6)
+        self.assertEqual(stats["flushes"], 1)
+        self.assertEqual(stats["pending"], 0)
+
+    def test_threshold(self):
+        """
+        Writes are flushed immediately once enough data is waiting.
+        """
+
+        self.t.write("abcdef")
+        self.t.write("ghijkl")
+        self.assertEqual(self.transport.writes, ["abcdefghijkl"])
+        self.assertFalse(self.clock.getDelayedCalls())
+
+    def test_write_sequence(self):
+        self.t.writeSequence(["abc", "def"])
+        self.t.flush()
+        self.assertEqual(self.transport.writes, ["abcdef"])
+        self.assertEqual(self.t.packets, 2)
+
+    def test_flush_empty(self):
+        self.t.flush()
+        self.assertEqual(self.transport.writes, [])
+        self.assertEqual(self.t.flushes, 0)
+
+    def test_lose_connection(self):
+        """
+        Pending data is flushed before the connection is dropped.
+        """
+
+        self.t.write("bye")
+        self.t.loseConnection()
+        self.assertEqual(self.transport.writes, ["bye"])
+        self.assertTrue(self.transport.lost)
+
+    def test_passthrough(self):
+        self.assertEqual(self.t.getPeer(), "peer")
+
+    def test_registered(self):
+        self.assertTrue(self.transport.producer is self.t)
+
+class TestCorkedTransportFlow(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.transport = FakeTransport()
+        self.t = CorkedTransport(self.transport, threshold=10, high_water=40,
+            low_water=20, limit=100)
+        self.t.clock = self.clock
+        self.producer = FakeProducer()
+        self.t.registerProducer(self.producer, True)
+
+    def test_trivial(self):
+        pass
+
+    def test_blocked(self):
+        """
+        Data is held back while the wrapped transport is full.
+        """
+
+        self.t.pauseProducing()
+        self.t.write("a" * 15)
+        self.clock.advance(0)
+        self.assertEqual(self.transport.writes, [])
+        self.assertEqual(self.t.stats()["pending"], 15)
+
+        self.t.resumeProducing()
+        self.assertEqual(self.transport.writes, ["a" * 15])
+
+    def test_blocked_midway(self):
+        """
+        If the wrapped transport fills up during a flush, the rest of the
+        data is held back.
+        """
+
+        def writeSequence(data):
+            self.transport.writes.append("".join(data))
+            self.t.pauseProducing()
+        self.transport.writeSequence = writeSequence
+
+        self.t.pauseProducing()
+        for i in range(3):
+            self.t.write("a" * 10)
+        self.t.resumeProducing()
+
+        self.assertEqual(self.transport.writes, ["a" * 10])
+        self.assertEqual(self.t.pending_bytes, 20)
+
+    def test_water_marks(self):
+        self.t.pauseProducing()
+        for i in range(5):
+            self.t.write("a" * 10)
+        self.assertTrue(self.producer.paused)
+        self.assertEqual(self.t.pauses, 1)
+        self.assertEqual(self.t.peak, 50)
+
+        self.t.resumeProducing()
+        self.assertFalse(self.producer.paused)
+        self.assertFalse(self.t.stats()["paused"])
+
+    def test_limit(self):
+        """
+        Clients which fall too far behind are dropped.
+        """
+
+        self.t.pauseProducing()
+        for i in range(11):
+            self.t.write("a" * 10)
+        self.assertTrue(self.transport.aborted)
+        self.assertEqual(self.t.pending_bytes, 0)
+
+        self.t.write("more")
+        self.assertEqual(self.t.pending_bytes, 0)
+
+    def test_lose_connection_blocked(self):
+        """
+        Connections aren't dropped until pending data has been written.
+        """
+
+        self.t.pauseProducing()
+        self.t.write("bye")
+        self.t.loseConnection()
+        self.assertFalse(self.transport.lost)
+
+        self.t.resumeProducing()
+        self.assertEqual(self.transport.writes, ["bye"])
+        self.assertTrue(self.transport.lost)
+
+    def test_stop_producing(self):
+        self.t.write("bye")
+        self.t.stopProducing()
+        self.assertTrue(self.producer.stopped)
+        self.assertEqual(self.t.pending_bytes, 0)
@@ -1,6 +1,14 @@
+from random import Random
+from StringIO import StringIO
 from unittest import TestCase
 
-from bravo.beta.packets import simple
+from construct import Container, ConstructError
+
+from bravo.beta.packets import (simple, packets, compiled_packets,
+                                builders, make_packet, make_static_packet,
+                                parse_packets, parse_packets_incrementally,
+                                PacketBuffer)
+from bravo.errors import BufferOverflow
 
 class TestPacketBuilder(TestCase):
 
@@ -41,3 +49,283 @@ class TestPacketBuilder(TestCase):
         packet = self.cls(42, 32)
         result = packet.build()
         self.assertEqual(result, "\x2a\x00\x20")
+
+class TestCompiledPackets(TestCase):
+
+    def test_hot_packets_compiled(self):
+        for header in (0, 3, 10, 11, 12, 13, 14, 16, 18, 19, 204):
+            self.assertTrue(header in compiled_packets)
+
+    def test_location(self):
+        packet = make_packet("location",
+            position=Container(x=1.5, y=64, stance=65.62, z=-3.25),
+            orientation=Container(rotation=90, pitch=-10),
+            grounded=Container(grounded=1))
+        compiled, offset = compiled_packets[13](packet, 1)
+        self.assertEqual(offset, len(packet))
+        self.assertEqual(compiled, packets[13].parse(packet[1:]))
+        self.assertEqual(compiled.position.stance, 65.62)
+        self.assertEqual(compiled.grounded.grounded, 1)
+
+    def test_enums(self):
+        packet = make_packet("digging", state="stopped", x=1, y=2, z=3,
+            face="+x")
+        compiled, offset = compiled_packets[14](packet, 1)
+        self.assertEqual(compiled.state, "stopped")
+        self.assertEqual(compiled.face, "+x")
+        self.assertEqual(compiled, packets[14].parse(packet[1:]))
+
+    def test_strings_and_flags(self):
+        packet = make_packet("settings", locale=u"en_US", distance=2, chat=0,
+            difficulty="easy", cape=False)
+        compiled, offset = compiled_packets[204](packet, 1)
+        self.assertEqual(compiled.locale, u"en_US")
+        self.assertEqual(compiled.cape, False)
+        self.assertEqual(compiled, packets[204].parse(packet[1:]))
+
+    def test_equivalence(self):
+        """
+        Compiled parsers agree with construct on arbitrary data, both when
+        parsing succeeds and when it fails.
+        """
+
+        r = Random(42)
+
+        for header, parser in compiled_packets.iteritems():
+            for i in range(50):
+                length = r.randint(0, 64)
+                data = "".join(chr(r.randint(0, 255)) for j in range(length))
+
+                try:
+                    stream = StringIO(data)
+                    expected = packets[header].parse_stream(stream)
+                    expected = expected, stream.tell()
+                except Exception, e:
+                    expected = type(e)
+
+                try:
+                    actual = parser(data, 0)
+                except Exception, e:
+                    actual = type(e)
+
+                if isinstance(expected, type):
+                    self.assertTrue(isinstance(actual, type), header)
+                    self.assertTrue(issubclass(actual, ConstructError) ==
+                        issubclass(expected, ConstructError), header)
+                else:
+                    self.assertEqual(actual, expected, header)
+
+class TestParsePackets(TestCase):
+
+    def test_parse_packets(self):
+        data = make_packet("ping", pid=5) + make_packet("chat",
+            message=u"hi")
+        parsed, leftovers = parse_packets(data)
+        self.assertEqual([header for header, payload in parsed], [0, 3])
+        self.assertEqual(parsed[1][1].message, u"hi")
+        self.assertEqual(leftovers, "")
+
+    def test_parse_packets_leftovers(self):
+        data = make_packet("ping", pid=5) + make_packet("chat",
+            message=u"hi")
+        parsed, leftovers = parse_packets(data[:-1])
+        self.assertEqual(len(parsed), 1)
+        self.assertEqual(leftovers, data[5:-1])
+
+    def test_parse_packets_uncompiled(self):
+        """
+        Packets without compiled parsers are still parsed by construct.
+        """
+
+        self.assertFalse(51 in compiled_packets)
+        data = make_packet("chunk", x=1, z=2, continuous=True, primary=0,
+            add=0, data="test") + make_packet("ping", pid=5)
+        parsed, leftovers = parse_packets(data)
+        self.assertEqual([header for header, payload in parsed], [51, 0])
+        self.assertEqual(parsed[0][1].data, "test")
+        self.assertEqual(leftovers, "")
+
+    def test_parse_packets_unknown(self):
+        data = make_packet("ping", pid=5) + "\xee\x00"
+        parsed, leftovers = parse_packets(data)
+        self.assertEqual(len(parsed), 1)
+        self.assertEqual(leftovers, "\xee\x00")
+
+    def test_parse_packets_incrementally(self):
+        data = make_packet("ping", pid=5) + make_packet("poll", unused=0)
+        parsed = list(parse_packets_incrementally(data))
+        self.assertEqual([header for header, payload in parsed], [0, 254])
+
+class TestPacketBuffer(TestCase):
+
+    def setUp(self):
+        self.b = PacketBuffer(limit=64)
+
+    def test_trivial(self):
+        pass
+
+    def test_packets(self):
+        self.b.feed(make_packet("ping", pid=5) + make_packet("chat",
+            message=u"hi"))
+        parsed = self.b.packets()
+        self.assertEqual([header for header, payload in parsed], [0, 3])
+        self.assertEqual(parsed[1][1].message, u"hi")
+        self.assertEqual(len(self.b), 0)
+
+    def test_packets_split(self):
+        """
+        Packets split across several reads are parsed once complete.
+        """
+
+        data = make_packet("chat", message=u"hello")
+        for c in data[:-1]:
+            self.b.feed(c)
+            self.assertEqual(self.b.packets(), [])
+        self.b.feed(data[-1])
+        parsed = self.b.packets()
+        self.assertEqual(parsed[0][1].message, u"hello")
+
+    def test_packets_uncompiled(self):
+        self.b.limit = 1024
+        self.b.feed(make_packet("chunk", x=1, z=2, continuous=True,
+            primary=0, add=0, data="test"))
+        parsed = self.b.packets()
+        self.assertEqual(parsed[0][1].data, "test")
+
+    def test_packets_uncompiled_split(self):
+        """
+        Packets without compiled parsers can be split across reads, after
+        other packets, without upsetting compaction.
+        """
+
+        build = make_packet("build", x=1, y=2, z=3, face="+x", primary=-1,
+            cursorx=4, cursory=5, cursorz=6)
+        self.assertFalse(15 in compiled_packets)
+
+        self.b.feed(build + build[:5])
+        parsed = self.b.packets()
+        self.assertEqual([header for header, payload in parsed], [15])
+
+        self.b.feed(build[5:])
+        parsed = self.b.packets()
+        self.assertEqual([header for header, payload in parsed], [15])
+        self.assertEqual(parsed[0][1].cursorz, 6)
+        self.assertEqual(len(self.b), 0)
+
+    def test_compaction(self):
+        """
+        Consumed bytes are only discarded once they are at least half of the
+        buffer.
+        """
+
+        ping = make_packet("ping", pid=5)
+        self.b.feed(ping * 3 + ping[:2])
+        self.b.packets()
+        self.assertEqual(self.b.offset, 0)
+        self.assertEqual(len(self.b.buf), 2)
+
+        self.b.feed(ping[2:] + ping[:1])
+        self.b.packets()
+        self.assertEqual(len(self.b), 1)
+        self.assertEqual(self.b.offset, 0)
+
+        self.b.feed(ping[1:] + make_packet("chat", message=u"hello")[:10])
+        self.b.packets()
+        self.assertEqual(self.b.offset, 5)
+        self.assertEqual(len(self.b), 10)
+
+    def test_overflow(self):
+        self.b.feed("\x03" * 60)
+        self.assertRaises(BufferOverflow, self.b.feed, "\x03" * 5)
+        self.assertEqual(len(self.b), 60)
+
+    def test_overflow_after_parsing(self):
+        """
+        Only unparsed bytes count against the limit.
+        """
+
+        ping = make_packet("ping", pid=5)
+        for i in range(20):
+            self.b.feed(ping)
+            self.b.packets()
+
+class TestBuilders(TestCase):
+
+    def test_hot_packets_compiled(self):
+        for name in ("teleport", "entity-orientation", "time", "ping",
+                     "block", "chat", "location"):
+            self.assertTrue(name in builders)
+
+    def test_positional(self):
+        self.assertEqual(builders["time"](1, 2),
+            builders["time"](timestamp=1, time=2))
+
+    def test_nested(self):
+        payload = Container(
+            position=Container(x=1.5, y=64, stance=65.62, z=-3.25),
+            orientation=Container(rotation=90, pitch=-10),
+            grounded=Container(grounded=1))
+        self.assertEqual(builders["location"](**payload),
+            "\x0d" + packets[13].build(payload))
+
+    def test_strings_and_enums(self):
+        payload = Container(locale=u"en_US", distance=2, chat=0,
+            difficulty="easy", cape=False)
+        self.assertEqual(builders["settings"](**payload),
+            "\xcc" + packets[204].build(payload))
+
+    def test_equivalence(self):
+        """
+        Compiled builders agree with construct on anything construct can
+        parse.
+        """
+
+        r = Random(42)
+
+        for header, con in packets.iteritems():
+            if con.name not in builders:
+                continue
+
+            for i in range(50):
+                length = r.randint(0, 64)
+                data = "".join(chr(r.randint(0, 255)) for j in range(length))
+
+                try:
+                    payload = con.parse(data)
+                except Exception:
+                    continue
+
+                self.assertEqual(builders[con.name](**payload),
+                    chr(header) + con.build(payload), header)
+
+    def test_make_packet_invalid(self):
+        """
+        Bad payloads still fail the way that construct fails.
+        """
+
+        self.assertRaises(ConstructError, make_packet, "digging",
+            state="bogus", x=0, y=0, z=0, face="+x")
+
+    def test_make_packet_missing_field(self):
+        self.assertRaises(AttributeError, make_packet, "time", timestamp=1)
+
+    def test_make_packet_builder_bug(self):
+        """
+        Errors in builders which aren't about the payload aren't hidden.
+        """
+
+        def broken(**kwargs):
+            raise RuntimeError()
+
+        original = builders["time"]
+        builders["time"] = broken
+        try:
+            self.assertRaises(RuntimeError, make_packet, "time",
+                timestamp=1, time=2)
+        finally:
+            builders["time"] = original
+
+    def test_make_static_packet(self):
+        packet = make_static_packet("poll", unused=0)
+        self.assertEqual(packet, make_packet("poll", unused=0))
+        self.assertTrue(make_static_packet("poll", unused=0) is packet)
@@ -5,13 +5,24 @@ from twisted.trial import unittest
 from bravo.config import BravoConfigParser
 from bravo.beta.factory import BravoFactory
 
+class MockTransport(object):
+
+    def __init__(self):
+        self.data = []
+
+    def write(self, data):
+        self.data.append(data)
+
 class MockProtocol(object):
 
     username = None
+    host = "127.0.0.1"
 
     def __init__(self, player):
         self.player = player
         self.location = player.location if player else None
+        self.chunks = {}
+        self.transport = MockTransport()
 
 class TestBravoFactory(unittest.TestCase):
 
@@ -156,6 +167,56 @@ class TestBravoFactory(unittest.TestCase):
 
         self.assertFalse(self.f.set_username(p, "Hurp"))
 
+    def test_broadcast_for_chunk(self):
+        """
+        Only protocols subscribed to a chunk should receive its broadcasts.
+        """
+
+        first, second = MockProtocol(None), MockProtocol(None)
+        self.f.subscribe_chunk(first, 0, 0)
+        self.f.subscribe_chunk(second, 1, 0)
+
+        self.f.broadcast_for_chunk("packet", 0, 0)
+        self.assertEqual(first.transport.data, ["packet"])
+        self.assertEqual(second.transport.data, [])
+
+    def test_broadcast_for_chunk_unwatched(self):
+        """
+        Broadcasting to a chunk nobody is watching is a no-op, and doesn't
+        leave anything behind in the index.
+        """
+
+        self.f.broadcast_for_chunk("packet", 3, 3)
+        self.assertFalse(self.f.chunk_subscribers)
+
+    def test_unsubscribe_chunk(self):
+        p = MockProtocol(None)
+        self.f.subscribe_chunk(p, 0, 0)
+        self.f.unsubscribe_chunk(p, 0, 0)
+
+        self.assertEqual(self.f.subscribers_for_chunk(0, 0), frozenset())
+        self.assertFalse(self.f.chunk_subscribers)
+
+    def test_unsubscribe_chunk_unknown(self):
+        """
+        Unsubscribing from a chunk which was never subscribed is harmless.
+        """
+
+        self.f.unsubscribe_chunk(MockProtocol(None), 0, 0)
+
+    def test_teardown_protocol_unsubscribes(self):
+        p = MockProtocol(None)
+        p.username = "Hurp"
+        p.chunks[0, 0] = None
+        p.chunks[0, 1] = None
+        self.f.protocols["Hurp"] = p
+        self.f.subscribe_chunk(p, 0, 0)
+        self.f.subscribe_chunk(p, 0, 1)
+
+        self.f.teardown_protocol(p)
+
+        self.assertFalse(self.f.chunk_subscribers)
+
 class TestBravoFactoryStarted(unittest.TestCase):
     """
     Tests which require ``startFactory()`` to be called.
@@ -189,6 +250,32 @@ class TestBravoFactoryStarted(unittest.TestCase):
     def test_trivial(self):
         pass
 
+    def test_generator_lattice(self):
+        self.f.stopFactory()
+        self.bcp.set("world unittest", "generators", "complex, caves")
+        self.bcp.set("world unittest", "lattice_complex", "2, 2, 1")
+        self.f = BravoFactory(self.bcp, self.name)
+        self.f.startFactory()
+
+        lattices = dict((g.name, g.lattice) for g in self.f.generators)
+        self.assertEqual(lattices["complex"], (2, 2, 1))
+        self.assertEqual(lattices["caves"], (2, 4, 2))
+
+    def test_generator_lattice_invalid(self):
+        """
+        Lattices which aren't three positive integers are ignored.
+        """
+
+        for lattice in "4, 8", "4, 0, 4", "4, x, 4", "1, 1, 1, 1":
+            self.f.stopFactory()
+            self.bcp.set("world unittest", "generators", "complex")
+            self.bcp.set("world unittest", "lattice_complex", lattice)
+            self.f = BravoFactory(self.bcp, self.name)
+            self.f.startFactory()
+
+            generator, = self.f.generators
+            self.assertEqual(generator.lattice, type(generator).lattice)
+
     def test_create_entity_pickup(self):
         entity = self.f.create_entity(0, 0, 0, "Item")
         self.assertEqual(entity.eid, 2)
@@ -209,13 +296,13 @@ class TestBravoFactoryStarted(unittest.TestCase):
         to be spawned.
         """
 
-        # Our check consists of counting the number of times broadcast is
-        # called.
+        # Our check consists of counting the number of times an entity is
+        # spawned.
         count = [0]
 
-        def broadcast(packet):
+        def spawn(entity):
             count[0] += 1
-        self.patch(self.f, "broadcast", broadcast)
+        self.patch(self.f.tracker, "spawn", spawn)
 
         # 65 blocks should be split into two stacks.
         self.f.give((0, 0, 0), (2, 0), 65)
@@ -26,3 +26,39 @@ class TestSectionInternals(TestCase):
         self.assertEqual(self.s.blocks[1], 1)
         self.assertEqual(self.s.blocks[256], 2)
         self.assertEqual(self.s.blocks[16], 3)
+
+    def test_fill_column(self):
+        """
+        ``fill_column`` fills only the given column, up to but not including
+        the top.
+        """
+
+        self.s.fill_column(1, 2, 3, 6, 4)
+        for y in range(16):
+            self.assertEqual(self.s.get_block((1, y, 2)),
+                4 if 3 <= y < 6 else 0)
+        self.assertEqual(sum(self.s.blocks), 4 * 3)
+
+    def test_fill_column_empty(self):
+        self.s.fill_column(1, 2, 6, 6, 4)
+        self.assertFalse(any(self.s.blocks))
+
+    def test_fill_layers(self):
+        self.s.fill_layers(14, 16, 1)
+        self.assertEqual(self.s.get_block((15, 14, 15)), 1)
+        self.assertEqual(self.s.get_block((15, 13, 15)), 0)
+        self.assertEqual(sum(self.s.blocks), 512)
+        self.assertEqual(len(self.s.blocks), 4096)
+
+    def test_fill_layers_replace(self):
+        """
+        ``fill_layers`` with a block to replace leaves other blocks alone.
+        """
+
+        self.s.set_block((0, 0, 0), 1)
+        self.s.set_block((0, 1, 0), 1)
+        self.s.fill_layers(0, 1, 2, replace=0)
+        self.assertEqual(self.s.get_block((0, 0, 0)), 1)
+        self.assertEqual(self.s.get_block((1, 0, 0)), 2)
+        self.assertEqual(self.s.get_block((0, 1, 0)), 1)
+        self.assertEqual(self.s.get_block((1, 1, 0)), 0)
@@ -6,6 +6,8 @@ import bravo.blocks
 from bravo.chunk import Chunk, CHUNK_HEIGHT
 import bravo.ibravo
 import bravo.plugin
+import bravo.simplex
+from bravo.terrain.context import GenerationContext
 from bravo.utilities.coords import iterchunk
 
 class TestGenerators(unittest.TestCase):
@@ -24,7 +26,7 @@ class TestGenerators(unittest.TestCase):
 
         plugin = self.p["boring"]
 
-        plugin.populate(self.chunk, 0)
+        plugin.populate(self.chunk, 0, GenerationContext(self.chunk, 0))
         for x, z, y in iterchunk():
             if y < CHUNK_HEIGHT // 2:
                 self.assertEqual(self.chunk.get_block((x, y, z)),
@@ -44,7 +46,7 @@ class TestGenerators(unittest.TestCase):
             self.chunk.set_block((i, 61 + i, i),
                                  bravo.blocks.blocks["dirt"].slot)
 
-        plugin.populate(self.chunk, 0)
+        plugin.populate(self.chunk, 0, GenerationContext(self.chunk, 0))
         for i in range(5):
             self.assertEqual(self.chunk.get_block((i, 61 + i, i)),
                 bravo.blocks.blocks["sand"].slot,
@@ -72,8 +74,46 @@ class TestGenerators(unittest.TestCase):
             self.chunk.set_block((i, 61 + i, i),
                                  bravo.blocks.blocks["dirt"].slot)
 
-        plugin.populate(self.chunk, 0)
+        plugin.populate(self.chunk, 0, GenerationContext(self.chunk, 0))
         for i in range(5):
             self.assertEqual(self.chunk.get_block((i, 61 + i, i)),
                 bravo.blocks.blocks["sand"].slot,
                 "%d, %d, %d is wrong" % (i, 61 + i, i))
+
+class TestNumPyTerrain(unittest.TestCase):
+
+    stages = ["simplex", "complex", "cliffs", "float", "caves", "ore"]
+
+    def setUp(self):
+        if bravo.simplex.numpy is None:
+            raise unittest.SkipTest("NumPy not installed")
+
+        self.p = bravo.plugin.retrieve_plugins(bravo.ibravo.ITerrainGenerator)
+
+    def generate(self, x, z, seed):
+        chunk = Chunk(x, z)
+        context = GenerationContext(chunk, seed)
+        for stage in self.stages:
+            self.p[stage].populate(chunk, seed, context)
+        chunk.regenerate()
+        return chunk
+
+    def test_same_terrain(self):
+        """
+        A seed gives exactly the same terrain, whether or not NumPy is used.
+        """
+
+        for x, z in (0, 0), (3, -7):
+            expected = self.generate(x, z, 42)
+
+            numpy = bravo.simplex.numpy
+            bravo.simplex.numpy = None
+            try:
+                chunk = self.generate(x, z, 42)
+            finally:
+                bravo.simplex.numpy = numpy
+
+            for section, other in zip(expected.sections, chunk.sections):
+                self.assertEqual(section.blocks, other.blocks)
+                self.assertEqual(section.metadata, other.metadata)
+            self.assertEqual(expected.heightmap, chunk.heightmap)
@@ -6,6 +6,7 @@ from bravo.blocks import blocks
 from bravo.config import BravoConfigParser
 from bravo.ibravo import IDigHook
 import bravo.plugin
+from bravo.ticker import Ticker
 from bravo.world import ChunkNotLoaded, World
 
 class PhysicsMockFactory(object):
@@ -31,6 +32,7 @@ class TestWater(TestCase):
         # And finally the mock factory.
         self.f = PhysicsMockFactory()
         self.f.world = self.w
+        self.f.ticker = Ticker()
 
         # Using dig hook to grab the plugin since the build hook was nuked in
         # favor of the automaton interface.
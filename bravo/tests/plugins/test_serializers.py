@@ -98,6 +98,17 @@ class TestAnvilSerializer(unittest.TestCase):
         self.assertEqual(tag["Level"]["xPos"].value, 1)
         self.assertEqual(tag["Level"]["zPos"].value, 2)
 
+    def test_chunk_season_round_trip(self):
+        chunk = Chunk(1, 2)
+        tag = self.s._save_chunk_to_tag(chunk)
+        self.assertFalse("BravoSeason" in tag["Level"])
+
+        chunk.season = "winter"
+        tag = self.s._save_chunk_to_tag(chunk)
+        loaded = Chunk(1, 2)
+        self.s._load_chunk_from_tag(loaded, tag)
+        self.assertEqual(loaded.season, "winter")
+
     @unittest.skipIf("windows" in platform.system().lower(), 
                     "Windows can't handle this properly")
     def test_save_plugin_data(self):
@@ -126,6 +137,19 @@ class TestAnvilSerializer(unittest.TestCase):
 
         self.assertRaises(SerializerReadException, self.s.load_chunk, 0, 0)
 
+    def test_load_chunks(self):
+        """
+        Chunks can be loaded in bulk, skipping any which don't exist.
+        """
+
+        self.folder.child("region").makedirs()
+        self.s.save_chunk(Chunk(1, 2))
+        self.s.save_chunk(Chunk(40, 2))
+
+        chunks = self.s.load_chunks([(1, 2), (40, 2), (3, 4), (70, 70)])
+        self.assertEqual(sorted(chunks), [(1, 2), (40, 2)])
+        self.assertEqual(chunks[40, 2].x, 40)
+
     def test_load_player_first(self):
         """
         Loading a non-existent player raises an SRE.
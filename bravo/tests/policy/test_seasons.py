@@ -72,6 +72,17 @@ class TestWinter(unittest.TestCase):
         self.c.set_block((0, 127, 0), blocks["stone"].slot)
         self.hook.transform(self.c)
 
+    def test_snow_heightmap(self):
+        """
+        The heightmap takes in the snow which was laid.
+        """
+
+        self.c.set_block((1, 10, 2), blocks["stone"].slot)
+        self.c.set_block((2, 10, 2), blocks["torch"].slot)
+        self.hook.transform(self.c)
+        self.assertEqual(self.c.heightmap[1 * 16 + 2], 11)
+        self.assertEqual(self.c.heightmap[2 * 16 + 2], 10)
+
 class TestSpring(unittest.TestCase):
 
     def setUp(self):
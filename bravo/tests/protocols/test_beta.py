@@ -3,15 +3,19 @@ from twisted.trial.unittest import TestCase
 import warnings
 
 from twisted.internet import reactor
+from twisted.internet.defer import succeed
 from twisted.internet.task import deferLater
 
 from construct import Container
 
+import bravo.beta.protocol
+from bravo.beta.cork import CorkedTransport
 from bravo.beta.protocol import (BetaServerProtocol, BravoProtocol,
                                  STATE_LOCATED)
 from bravo.chunk import Chunk
 from bravo.config import BravoConfigParser
 from bravo.errors import BetaClientError
+from bravo.profiler import Profiler
 
 class FakeTransport(object):
 
@@ -24,6 +28,9 @@ class FakeTransport(object):
     def loseConnection(self):
         self.lost = True
 
+    def registerProducer(self, producer, streaming):
+        pass
+
 class FakeFactory(object):
 
     def broadcast(self, packet):
@@ -89,6 +96,29 @@ class TestBetaServerProtocol(TestCase):
         d = deferLater(reactor, 31, cb)
         return d
 
+    def test_data_received_overflow(self):
+        """
+        Clients which send too much data without completing a packet are
+        disconnected.
+        """
+
+        self.p.dataReceived("\x03\x7f\xff")
+        self.p.dataReceived("\x00" * self.p.max_buffered)
+        self.assertTrue(self.p.transport.lost)
+
+    def test_make_connection_corked(self):
+        transport = FakeTransport()
+        self.p.makeConnection(transport)
+        self.assertTrue(isinstance(self.p.transport, CorkedTransport))
+        self.assertTrue(self.p.transport.transport is transport)
+        self.assertTrue(self.p.transport.producer is self.p)
+
+    def test_make_connection_uncorked(self):
+        transport = FakeTransport()
+        self.p.cork_threshold = 0
+        self.p.makeConnection(transport)
+        self.assertTrue(self.p.transport is transport)
+
     def test_latency_overflow(self):
         """
         Massive latencies should not cause exceptions to be raised.
@@ -134,6 +164,38 @@ class TestBravoProtocol(TestCase):
 
         self.p.disable_chunk(0, 0)
 
+    def test_chat_command_profiled(self):
+        """
+        Chat commands are timed for as long as they take to run, not just
+        for as long as it takes to make their generators.
+        """
+
+        profiler = Profiler()
+        now = [0]
+        profiler.timer = lambda: now[0]
+
+        class Slow(object):
+            name = "slow"
+            aliases = ()
+
+            def chat_command(self, username, parameters):
+                for i in range(3):
+                    now[0] += 0.1
+                    yield "line %d" % i
+
+        self.patch(bravo.beta.protocol, "retrieve_plugins",
+            lambda interface, factory: {"slow": Slow()})
+        self.p.factory = FakeFactory()
+        self.p.factory.profiler = profiler
+        self.p.transport = FakeTransport()
+        self.p.transport.data = []
+
+        self.p.chat(Container(message="/slow"))
+
+        self.assertEqual(len(self.p.transport.data), 3)
+        self.assertAlmostEqual(profiler.histograms["command", "slow"].total,
+            0.3)
+
 
 class TestBravoProtocolChunks(TestCase):
 
@@ -147,6 +209,61 @@ class TestBravoProtocolChunks(TestCase):
     def test_trivial(self):
         pass
 
+    def test_update_chunks(self):
+        self.p.update_chunks()
+        queue = self.p.chunk_queue
+        self.assertEqual(queue[0], (0, 0))
+        self.assertEqual(len(queue), len(list(self.p.view)))
+
+        # Moving within the same chunk changes nothing.
+        self.p.location.pos = self.p.location.pos._replace(x=100, z=100)
+        self.p.update_chunks()
+        self.assertTrue(self.p.chunk_queue is queue)
+
+    def test_update_chunks_crossing(self):
+        """
+        Crossing into another chunk queues the chunks which came into view,
+        and drops the ones which left it.
+        """
+
+        self.p.update_chunks()
+        self.p.location.pos = self.p.location.pos._replace(x=16 * 32)
+        self.p.update_chunks()
+
+        self.assertEqual(self.p.chunk_queue[0], (1, 0))
+        self.assertTrue((9, 0) in self.p.chunk_queue)
+        self.assertFalse((-8, 0) in self.p.chunk_queue)
+        self.assertEqual(len(self.p.chunk_queue), len(list(self.p.view)))
+
+    def test_send_queued_chunks(self):
+        sent = []
+        def enable_chunks(coords):
+            sent.append(coords)
+            return succeed(None)
+        self.p.enable_chunks = enable_chunks
+        self.p.chunks_per_tick = 4
+        self.p.chunks_per_packet = 3
+
+        self.p.update_chunks()
+        self.p.send_queued_chunks()
+        self.assertEqual([len(batch) for batch in sent], [3, 1])
+        self.assertEqual(sent[0][0], (0, 0))
+        self.assertEqual(self.p.chunk_request, None)
+
+    def test_send_queued_chunks_paused(self):
+        """
+        Chunks aren't sent while the client is behind.
+        """
+
+        self.p.enable_chunks = lambda coords: self.fail("Sent chunks")
+
+        self.p.update_chunks()
+        self.p.pauseProducing()
+        self.p.send_queued_chunks()
+
+        self.p.stopProducing()
+        self.assertFalse(self.p.chunk_queue)
+
     def test_ascend_zero(self):
         """
         ``ascend()`` can take a count of zero to ensure that the client is
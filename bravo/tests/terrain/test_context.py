@@ -0,0 +1,141 @@
+from __future__ import division
+
+from array import array
+from random import Random
+
+from twisted.trial import unittest
+
+from bravo.chunk import Chunk
+from bravo.simplex import SimplexNoise
+from bravo.terrain.context import GenerationContext
+from bravo.terrain.density import chunk_density
+
+class TestGenerationContextFields(unittest.TestCase):
+
+    def setUp(self):
+        self.chunk = Chunk(1, 2)
+        self.context = GenerationContext(self.chunk, 0, SimplexNoise(0))
+
+    def test_trivial(self):
+        pass
+
+    def test_seed_noise(self):
+        context = GenerationContext(self.chunk, 5)
+        self.assertEqual(context.noise.seed, 5)
+
+    def test_field_memoized(self):
+        calls = []
+
+        def f(i):
+            calls.append(i)
+            return [i]
+
+        self.assertEqual(self.context.field(("f", 1), f, 1), [1])
+        self.assertEqual(self.context.field(("f", 1), f, 1), [1])
+        self.assertEqual(self.context.field(("f", 2), f, 2), [2])
+        self.assertEqual(calls, [1, 2])
+
+    def test_octaves2_grid(self):
+        first = self.context.octaves2_grid(16, 32, 16, 16, 1 / 256, 6)
+        self.assertEqual(first,
+            self.context.noise.octaves2_grid(16, 32, 16, 16, 1 / 256, 6))
+        self.assertTrue(first is
+            self.context.octaves2_grid(16, 32, 16, 16, 1 / 256, 6))
+        self.assertFalse(first is
+            self.context.octaves2_grid(32, 32, 16, 16, 1 / 256, 6))
+
+    def test_density_noise(self):
+        """
+        Densities of different noise are kept apart.
+        """
+
+        other = SimplexNoise(1)
+        first = self.context.density(16, 1 / 64, 2, (1, 1, 1))
+        second = self.context.density(16, 1 / 64, 2, (1, 1, 1), noise=other)
+
+        self.assertEqual(second,
+            chunk_density(other, self.chunk, 16, 1 / 64, 2, (1, 1, 1)))
+        self.assertNotEqual(first, second)
+
+    def test_decorate(self):
+        """
+        Writes inside the chunk are made straight away, and writes outside
+        of it are queued in world coordinates.
+        """
+
+        self.context.decorate((1, 64, 2), 5, 3)
+        self.context.decorate((1, 300, 2), 5)
+        self.context.decorate((-1, 64, 16), 5)
+
+        self.assertEqual(self.chunk.get_block((1, 64, 2)), 5)
+        self.assertEqual(self.chunk.get_metadata((1, 64, 2)), 3)
+        self.assertEqual(self.context.decorations.pending,
+            {(0, 3): [(15, 64, 0, 5, 0, None)]})
+
+    def test_decorate_replace(self):
+        self.chunk.set_block((1, 64, 2), 1)
+        self.context.decorate((1, 64, 2), 5, replace=[0])
+        self.assertEqual(self.chunk.get_block((1, 64, 2)), 1)
+
+class TestGenerationContextHeightmap(unittest.TestCase):
+
+    def setUp(self):
+        self.chunk = Chunk(0, 0)
+        self.context = GenerationContext(self.chunk, 0)
+        self.r = Random(0)
+
+    def test_trivial(self):
+        pass
+
+    def expected(self):
+        """
+        Regenerate the heightmap of a copy of the chunk.
+        """
+
+        chunk = Chunk(0, 0)
+        for section, other in zip(chunk.sections, self.chunk.sections):
+            section.blocks = array("B", other.blocks)
+        chunk.regenerate_heightmap()
+        return chunk.heightmap
+
+    def scatter(self, count):
+        for i in range(count):
+            coords = (self.r.randrange(16), self.r.randrange(256),
+                self.r.randrange(16))
+            self.chunk.set_block(coords, self.r.choice([0, 0, 1, 2]))
+
+    def test_empty(self):
+        self.chunk.heightmap[0] = 5
+        self.context.regenerate_heightmap()
+        self.assertEqual(self.chunk.heightmap, array("B", [0] * 256))
+
+    def test_top_of_chunk(self):
+        self.chunk.set_block((3, 255, 4), 1)
+        self.context.regenerate_heightmap()
+        self.assertEqual(self.chunk.heightmap[3 * 16 + 4], 255)
+
+    def test_incremental(self):
+        """
+        Changes between regenerations are picked up, including those made
+        straight into sections.
+        """
+
+        for i in range(10):
+            self.scatter(50)
+            self.chunk.fill_column(self.r.randrange(16), self.r.randrange(16),
+                0, self.r.randrange(256), 3)
+            self.chunk.sections[self.r.randrange(16)].fill_layers(2, 3, 0)
+            self.context.regenerate_heightmap()
+            self.assertEqual(self.chunk.heightmap, self.expected())
+
+    def test_unchanged(self):
+        """
+        Columns which haven't changed aren't rescanned.
+        """
+
+        self.chunk.set_block((1, 10, 1), 1)
+        self.context.regenerate_heightmap()
+        self.chunk.heightmap[0] = 99
+        self.context.regenerate_heightmap()
+        self.assertEqual(self.chunk.heightmap[0], 99)
+        self.assertEqual(self.chunk.heightmap[17], 10)
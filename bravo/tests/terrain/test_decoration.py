@@ -0,0 +1,70 @@
+from twisted.trial import unittest
+
+from bravo.chunk import Chunk
+from bravo.terrain.decoration import DecorationQueue
+
+class TestDecorationQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.q = DecorationQueue()
+
+    def test_trivial(self):
+        pass
+
+    def test_add(self):
+        self.q.add((-1, 64, 17), 2, 3)
+        self.assertTrue((-1, 1) in self.q)
+        self.assertEqual(self.q.pending[-1, 1], [(15, 64, 1, 2, 3, None)])
+        self.assertTrue(self.q.dirty)
+
+    def test_add_out_of_bounds(self):
+        self.q.add((0, 256, 0), 1)
+        self.q.add((0, -1, 0), 1)
+        self.assertEqual(len(self.q), 0)
+
+    def test_apply(self):
+        chunk = Chunk(1, 0)
+        self.q.add((17, 64, 1), 2, 3)
+        self.q.add((0, 64, 0), 2)
+
+        self.assertEqual(self.q.apply(chunk), 1)
+        self.assertEqual(chunk.get_block((1, 64, 1)), 2)
+        self.assertEqual(chunk.get_metadata((1, 64, 1)), 3)
+        self.assertTrue(chunk.dirty)
+
+        # Writes are only applied once, and other chunks' writes are kept.
+        self.assertEqual(self.q.apply(chunk), 0)
+        self.assertEqual(len(self.q), 1)
+
+    def test_apply_replace(self):
+        chunk = Chunk(0, 0)
+        chunk.set_block((0, 64, 0), 1)
+        self.q.add((0, 64, 0), 2, replace=[0])
+        self.q.add((1, 64, 0), 2, replace=[0])
+
+        self.assertEqual(self.q.apply(chunk), 1)
+        self.assertEqual(chunk.get_block((0, 64, 0)), 1)
+        self.assertEqual(chunk.get_block((1, 64, 0)), 2)
+
+    def test_update(self):
+        other = DecorationQueue()
+        other.add((0, 64, 0), 1)
+        self.q.add((1, 64, 0), 2)
+
+        self.q.update(other)
+        self.assertEqual(len(self.q.pending[0, 0]), 2)
+
+    def test_save_load(self):
+        self.q.add((-20, 64, 5), 2, 3, replace=[0, 18])
+        self.q.add((40, 70, 5), 1)
+
+        data = self.q.save()
+        self.assertFalse(self.q.dirty)
+
+        other = DecorationQueue()
+        other.load(data)
+        self.assertEqual(other.pending, self.q.pending)
+
+    def test_load_empty(self):
+        self.q.load("")
+        self.assertEqual(self.q.pending, {})
@@ -0,0 +1,89 @@
+from __future__ import division
+
+from twisted.trial import unittest
+
+from bravo.chunk import Chunk
+import bravo.terrain.density
+from bravo.terrain.density import chunk_density, lattice_grid, lattice_points
+from bravo.simplex import SimplexNoise
+
+class TestLatticePoints(unittest.TestCase):
+
+    def test_trivial(self):
+        pass
+
+    def test_exact(self):
+        self.assertEqual(lattice_points(17, 4), 5)
+
+    def test_past_end(self):
+        self.assertEqual(lattice_points(16, 4), 5)
+        self.assertEqual(lattice_points(256, 8), 33)
+
+    def test_unit(self):
+        self.assertEqual(lattice_points(16, 1), 16)
+
+class TestLatticeGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.noise = SimplexNoise(0)
+        self.scale = 1 / 64, 1 / 64, 1 / 32
+
+    def test_trivial(self):
+        pass
+
+    def test_unit_lattice(self):
+        self.assertEqual(
+            lattice_grid(self.noise, 0, 16, 0, 4, 4, 8, self.scale, 2,
+                (1, 1, 1)),
+            self.noise.octaves3_grid(0, 16, 0, 4, 4, 8, self.scale, 2))
+
+    def test_lattice_points(self):
+        """
+        Points on the lattice are sampled, not interpolated.
+        """
+
+        grid = lattice_grid(self.noise, 16, 0, -8, 9, 9, 17, self.scale, 3,
+            (4, 4, 8))
+        exact = self.noise.octaves3_grid(16, 0, -8, 9, 9, 17, self.scale, 3)
+        for i in range(0, 9, 4):
+            for j in range(0, 9, 4):
+                for k in range(0, 17, 8):
+                    index = (i * 9 + j) * 17 + k
+                    self.assertAlmostEqual(grid[index], exact[index])
+
+    def test_interpolated(self):
+        grid = lattice_grid(self.noise, 0, 0, 0, 3, 3, 3, self.scale, 1,
+            (2, 2, 2))
+        corners = [grid[(i * 3 + j) * 3 + k]
+            for i in (0, 2) for j in (0, 2) for k in (0, 2)]
+        self.assertAlmostEqual(grid[13], sum(corners) / 8)
+
+    def test_without_numpy(self):
+        numpy = bravo.terrain.density.numpy
+        grid = lattice_grid(self.noise, 3, 5, 7, 6, 7, 20, self.scale, 2,
+            (2, 4, 8))
+        bravo.terrain.density.numpy = None
+        try:
+            python = lattice_grid(self.noise, 3, 5, 7, 6, 7, 20, self.scale,
+                2, (2, 4, 8))
+        finally:
+            bravo.terrain.density.numpy = numpy
+
+        self.assertEqual(len(python), 6 * 7 * 20)
+        for a, b in zip(grid, python):
+            self.assertAlmostEqual(a, b)
+
+class TestChunkDensity(unittest.TestCase):
+
+    def test_trivial(self):
+        pass
+
+    def test_column_order(self):
+        noise = SimplexNoise(0)
+        chunk = Chunk(1, -1)
+        samples = chunk_density(noise, chunk, 4, (1 / 16, 1 / 32, 1 / 8), 2,
+            (1, 1, 1))
+
+        x, y, z = 3, 2, 5
+        self.assertAlmostEqual(samples[(x * 16 + z) * 4 + y],
+            noise.octaves3((16 + x) / 16, (-16 + z) / 8, y / 32, 2))
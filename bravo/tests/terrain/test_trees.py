@@ -0,0 +1,98 @@
+from twisted.internet.defer import inlineCallbacks
+from twisted.trial import unittest
+
+from bravo.blocks import blocks
+from bravo.config import BravoConfigParser
+from bravo.terrain import trees
+from bravo.terrain.trees import (ConeTree, NormalTree, RoundTree,
+    Structure, shape)
+from bravo.world import World
+
+class TestStructure(unittest.TestCase):
+
+    def setUp(self):
+        self.s = Structure()
+
+    def test_trivial(self):
+        pass
+
+    def test_decorate_overwrite(self):
+        self.s.decorate((0, 0, 0), 1)
+        self.s.decorate((0, 0, 0), 2, 3)
+        self.assertEqual(len(self.s), 1)
+        self.assertEqual(self.s.blocks[0, 0, 0], (2, 3, None))
+
+    def test_queue(self):
+        self.s.decorate((0, 0, 0), 1)
+        self.s.decorate((1, 2, 0), 2, 3)
+        self.s.decorate((0, 10, 0), 4)
+
+        queue = self.s.queue((15, 250, -1))
+        self.assertEqual(sorted(queue.pending), [(0, -1), (1, -1)])
+        self.assertEqual(queue.pending[0, -1], [(15, 250, 15, 1, 0, None)])
+        self.assertEqual(queue.pending[1, -1], [(0, 252, 15, 2, 3, None)])
+
+class TestShapes(unittest.TestCase):
+
+    def setUp(self):
+        self.patch(trees, "_shapes", {})
+        self.patch(trees, "SHAPES", 1)
+
+    def test_trivial(self):
+        pass
+
+    def test_shape_cached(self):
+        self.assertTrue(shape(NormalTree, 5) is shape(NormalTree, 5))
+        self.assertFalse(shape(NormalTree, 5) is shape(NormalTree, 6))
+        self.assertFalse(shape(NormalTree, 5) is shape(ConeTree, 5))
+
+    def test_shape_origin(self):
+        """
+        Trees are built around the origin, with their trunk rising from it.
+        """
+
+        for cls in NormalTree, ConeTree, RoundTree:
+            structure = shape(cls, 5)
+            block, metadata, replace = structure.blocks[0, 2, 0]
+            self.assertEqual(block, blocks["log"].slot)
+            self.assertEqual(metadata, cls.species)
+
+class TestTreeGrow(unittest.TestCase):
+
+    def setUp(self):
+        self.bcp = BravoConfigParser()
+        self.bcp.add_section("world unittest")
+        self.bcp.set("world unittest", "url", "")
+        self.bcp.set("world unittest", "serializer", "memory")
+
+        self.w = World(self.bcp, "unittest")
+        self.w.pipeline = []
+        self.w.start()
+
+    def tearDown(self):
+        self.w.stop()
+
+    def test_trivial(self):
+        pass
+
+    @inlineCallbacks
+    def test_grow(self):
+        """
+        Loaded chunks are changed straight away, and the rest of the tree
+        waits for its chunks to be loaded.
+        """
+
+        chunk = yield self.w.request_chunk(0, 0)
+        tree = NormalTree(pos=(15, 64, 0), height=5)
+        tree.grow(self.w)
+
+        self.assertEqual(chunk.get_block((15, 64, 0)), blocks["log"].slot)
+        self.assertEqual(chunk.get_block((15, 68, 0)), blocks["log"].slot)
+        self.assertEqual(chunk.get_block((14, 69, 0)), blocks["leaves"].slot)
+        self.assertFalse((0, 0) in self.w.decorations)
+        self.assertTrue((1, 0) in self.w.decorations)
+        self.assertTrue((0, -1) in self.w.decorations)
+
+        neighbor = yield self.w.request_chunk(1, 0)
+        self.assertEqual(neighbor.get_block((0, 69, 0)),
+            blocks["leaves"].slot)
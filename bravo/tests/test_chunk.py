@@ -1,11 +1,36 @@
 from twisted.trial import unittest
 
+from array import array
 from itertools import product
+from random import Random
 
+from bravo.beta.packets import parse_packets
 from bravo.blocks import blocks
-from bravo.chunk import Chunk
+from bravo.chunk import Chunk, save_chunks_to_packet
 from bravo.utilities.coords import XZ
 
+def scanned_heightmap(chunk):
+    """
+    Build a heightmap the slow way, one block at a time.
+    """
+
+    heightmap = array("B", [0] * (16 * 16))
+    for x, z in XZ:
+        for y in range(255, -1, -1):
+            if chunk.get_block((x, y, z)):
+                break
+        heightmap[x * 16 + z] = y
+    return heightmap
+
+def scatter(chunk, r, count):
+    """
+    Set random blocks, about a quarter of them to air.
+    """
+
+    for i in range(count):
+        coords = r.randrange(16), r.randrange(256), r.randrange(16)
+        chunk.set_block(coords, r.choice([0, 1, 2, 20]))
+
 class TestChunkBlocks(unittest.TestCase):
 
     def setUp(self):
@@ -40,6 +65,65 @@ class TestChunkBlocks(unittest.TestCase):
         self.assertEqual(self.c.get_block((2, 2, 2)), 2)
         self.assertEqual(self.c.get_block((3, 3, 3)), 3)
 
+    def test_sed_damage(self):
+        self.c.set_block((1, 1, 1), 1)
+        self.c.sed(2, 3)
+        self.assertFalse(self.c.all_damaged)
+        self.c.sed(1, 3)
+        self.assertTrue(self.c.all_damaged)
+
+    def test_top_blocks(self):
+        scatter(self.c, Random(0), 500)
+
+        tops = self.c.top_blocks()
+        heightmap = scanned_heightmap(self.c)
+        for x, z in XZ:
+            y = heightmap[x * 16 + z]
+            self.assertEqual(tops[x * 16 + z],
+                (y, self.c.get_block((x, y, z))))
+
+    def test_top_blocks_empty(self):
+        self.c.set_block((1, 255, 2), 3)
+        tops = self.c.top_blocks()
+        self.assertEqual(tops[1 * 16 + 2], (255, 3))
+        self.assertEqual(tops[0], (0, 0))
+
+    def test_regenerate_heightmap_random(self):
+        r = Random(1)
+        for i in range(5):
+            scatter(self.c, r, 300)
+            self.c.fill_column(r.randrange(16), r.randrange(16), 0,
+                r.randrange(256), 1)
+            self.c.regenerate_heightmap()
+            self.assertEqual(self.c.heightmap, scanned_heightmap(self.c))
+
+    def test_regenerate_heightmap_columns(self):
+        self.c.set_block((1, 30, 2), 1)
+        self.c.set_block((2, 40, 2), 1)
+        self.c.regenerate_heightmap([1 * 16 + 2])
+        self.assertEqual(self.c.heightmap[1 * 16 + 2], 30)
+        self.assertEqual(self.c.heightmap[2 * 16 + 2], 0)
+
+    def test_set_block_heightmap_random(self):
+        """
+        The heightmap is kept up to date as blocks are set and destroyed.
+        """
+
+        self.c.populated = True
+        r = Random(2)
+        for i in range(5):
+            scatter(self.c, r, 300)
+            self.assertEqual(self.c.heightmap, scanned_heightmap(self.c))
+
+    def test_opaque_heightmap(self):
+        self.c.set_block((1, 10, 2), blocks["stone"].slot)
+        self.c.set_block((1, 20, 2), blocks["glass"].slot)
+        self.c.set_block((2, 20, 2), blocks["glass"].slot)
+
+        heightmap = self.c.opaque_heightmap()
+        self.assertEqual(heightmap[1 * 16 + 2], 10)
+        self.assertEqual(heightmap[2 * 16 + 2], 0)
+
     def test_set_block_heightmap(self):
         """
         Heightmaps work.
@@ -77,6 +161,46 @@ class TestChunkBlocks(unittest.TestCase):
         self.c.destroy((0, 30, 0))
         self.assertEqual(self.c.heightmap[0], 10)
 
+    def test_fill_column(self):
+        """
+        ``fill_column()`` matches setting the blocks one by one, across
+        section boundaries.
+        """
+
+        other = Chunk(0, 0)
+        for y in range(10, 40):
+            other.set_block((3, y, 4), 1)
+
+        self.c.fill_column(3, 4, 10, 40, 1)
+        for this, that in zip(self.c.sections, other.sections):
+            self.assertEqual(this.blocks, that.blocks)
+
+    def test_fill_column_clamped(self):
+        self.c.fill_column(0, 0, -5, 300, 1)
+        self.assertEqual(self.c.get_block((0, 0, 0)), 1)
+        self.assertEqual(self.c.get_block((0, 255, 0)), 1)
+
+    def test_fill_slab(self):
+        self.c.fill_slab(15, 17, 1)
+        for x, z in XZ:
+            self.assertEqual(self.c.get_block((x, 14, z)), 0)
+            self.assertEqual(self.c.get_block((x, 15, z)), 1)
+            self.assertEqual(self.c.get_block((x, 16, z)), 1)
+            self.assertEqual(self.c.get_block((x, 17, z)), 0)
+
+    def test_fill_slab_replace(self):
+        self.c.set_block((1, 20, 1), 2)
+        self.c.fill_slab(0, 30, 9, replace=0)
+        self.assertEqual(self.c.get_block((1, 20, 1)), 2)
+        self.assertEqual(self.c.get_block((1, 21, 1)), 9)
+        self.assertEqual(self.c.get_block((1, 30, 1)), 0)
+
+    def test_set_layer(self):
+        heights = [None] * 256
+        heights[1 * 16 + 2] = 70
+        self.c.set_layer(heights, 1)
+        self.assertEqual(self.c.get_block((1, 70, 2)), 1)
+        self.assertEqual(sum(sum(s.blocks) for s in self.c.sections), 1)
 
 class TestLightmaps(unittest.TestCase):
 
@@ -229,3 +353,24 @@ class TestLightmaps(unittest.TestCase):
         self.c.set_block((0, 0, 0), blocks["air"].slot)
 
         self.assertEqual(self.c.get_skylight((0, 0, 0)), 15)
+
+class TestChunkPackets(unittest.TestCase):
+
+    def test_save_chunks_to_packet(self):
+        first = Chunk(1, 2)
+        first.set_block((0, 0, 0), blocks["dirt"].slot)
+        second = Chunk(-3, 4)
+        second.set_block((0, 20, 0), blocks["stone"].slot)
+
+        packets, leftovers = parse_packets(save_chunks_to_packet([first,
+            second]))
+        self.assertEqual(leftovers, "")
+
+        header, payload = packets[0]
+        self.assertEqual(header, 56)
+        self.assertEqual(payload.count, 2)
+        self.assertEqual([(m.x, m.z, m.primary) for m in payload.metadata],
+            [(1, 2, 0x1), (-3, 4, 0x2)])
+
+        expected = first.pack_sections()[1] + second.pack_sections()[1]
+        self.assertEqual(payload.data.decode("zlib"), expected)
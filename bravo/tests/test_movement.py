@@ -0,0 +1,183 @@
+from twisted.trial import unittest
+
+from bravo.beta.packets import parse_packets
+from bravo.location import Location
+from bravo.movement import MovementBroadcaster
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.data = []
+
+    def write(self, data):
+        self.data.append(data)
+
+class FakeProtocol(object):
+
+    def __init__(self):
+        self.transport = FakeTransport()
+
+    def packets(self):
+        packets, leftovers = parse_packets("".join(self.transport.data))
+        self.transport.data = []
+        return packets
+
+class FakeTracker(object):
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def viewers(self, eid):
+        return self.factory.protocols.values()
+
+class FakeFactory(object):
+
+    def __init__(self):
+        self.protocols = {}
+        self.tracker = FakeTracker(self)
+
+class TestMovementBroadcaster(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = FakeFactory()
+        self.viewer = FakeProtocol()
+        self.factory.protocols["viewer"] = self.viewer
+        self.mb = MovementBroadcaster(self.factory)
+
+        self.location = Location()
+        self.location.pos = self.location.pos._replace(x=0, y=0, z=0)
+
+    def move(self, dx=0, dy=0, dz=0, theta=None):
+        pos = self.location.pos
+        self.location.pos = pos._replace(x=pos.x + dx, y=pos.y + dy,
+            z=pos.z + dz)
+        if theta is not None:
+            self.location.ori = self.location.ori._replace(theta=theta)
+        self.mb.move(1, self.location)
+
+    def test_trivial(self):
+        pass
+
+    def test_first_teleport(self):
+        self.move(dx=10)
+        self.mb.flush()
+
+        packets = self.viewer.packets()
+        self.assertEqual(len(packets), 1)
+        header, payload = packets[0]
+        self.assertEqual(header, 34)
+        self.assertEqual(payload.x, 10)
+
+    def test_relative(self):
+        self.move()
+        self.mb.flush()
+        self.viewer.packets()
+
+        self.move(dx=10, dz=-5)
+        self.mb.flush()
+
+        packets = self.viewer.packets()
+        header, payload = packets[0]
+        self.assertEqual(header, 31)
+        self.assertEqual((payload.dx, payload.dy, payload.dz), (10, 0, -5))
+
+    def test_orientation(self):
+        self.move()
+        self.mb.flush()
+        self.viewer.packets()
+
+        self.move(theta=1)
+        self.mb.flush()
+        self.assertEqual(self.viewer.packets()[0][0], 32)
+
+        self.move(dy=1, theta=2)
+        self.mb.flush()
+        self.assertEqual(self.viewer.packets()[0][0], 33)
+
+    def test_unchanged(self):
+        self.move()
+        self.mb.flush()
+        self.viewer.packets()
+
+        self.move()
+        self.mb.flush()
+        self.assertEqual(self.viewer.packets(), [])
+
+    def test_collapse(self):
+        """
+        Several moves in a single tick are sent as one.
+        """
+
+        self.move()
+        self.mb.flush()
+        self.viewer.packets()
+
+        for i in range(5):
+            self.move(dx=10)
+        self.mb.flush()
+
+        packets = self.viewer.packets()
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(packets[0][1].dx, 50)
+
+    def test_large_jump(self):
+        self.move()
+        self.mb.flush()
+        self.viewer.packets()
+
+        self.move(dx=200)
+        self.mb.flush()
+        self.assertEqual(self.viewer.packets()[0][0], 34)
+
+    def test_periodic_teleport(self):
+        self.mb.teleport_interval = 3
+
+        self.move()
+        self.mb.flush()
+        headers = []
+        for i in range(3):
+            self.move(dx=1)
+            self.mb.flush()
+            headers.extend(header for header, payload in self.viewer.packets())
+
+        self.assertEqual(headers, [34, 31, 31, 34])
+
+    def test_source(self):
+        """
+        Entities aren't sent to the protocol which moved them.
+        """
+
+        self.mb.move(1, self.location, self.viewer)
+        self.mb.flush()
+        self.assertEqual(self.viewer.packets(), [])
+
+    def test_forget(self):
+        self.move()
+        self.mb.flush()
+        self.viewer.packets()
+
+        self.mb.forget(self.viewer, [1])
+        self.move(dx=1)
+        self.mb.flush()
+        self.assertEqual(self.viewer.packets()[0][0], 34)
+
+    def test_forget_entity(self):
+        self.move()
+        self.mb.flush()
+        self.viewer.packets()
+
+        self.move(dx=1)
+        self.mb.forget_entity(1)
+        self.mb.flush()
+        self.assertEqual(self.viewer.packets(), [])
+        self.assertFalse(self.mb.sent[self.viewer])
+
+    def test_stats(self):
+        self.move()
+        self.mb.flush()
+        self.move(dx=1)
+        self.mb.flush()
+
+        self.assertEqual(self.mb.counts["teleport"], 1)
+        self.assertEqual(self.mb.counts["entity-position"], 1)
+        self.assertEqual(self.mb.bytes, 19 + 8)
@@ -0,0 +1,171 @@
+from twisted.internet.defer import Deferred
+from twisted.trial import unittest
+
+from bravo.profiler import Histogram, Profiler, format_duration
+from bravo.ticker import Ticker
+
+class TestHistogram(unittest.TestCase):
+
+    def setUp(self):
+        self.h = Histogram()
+
+    def test_trivial(self):
+        pass
+
+    def test_empty(self):
+        self.assertEqual(self.h.mean, 0.0)
+        self.assertEqual(self.h.percentile(50), 0.0)
+
+    def test_record(self):
+        self.h.record(0.002)
+        self.h.record(0.004)
+
+        self.assertEqual(self.h.count, 2)
+        self.assertAlmostEqual(self.h.total, 0.006)
+        self.assertAlmostEqual(self.h.mean, 0.003)
+        self.assertEqual(self.h.max, 0.004)
+
+    def test_percentile(self):
+        for i in range(99):
+            self.h.record(0.00001)
+        self.h.record(0.2)
+
+        self.assertEqual(self.h.percentile(50), 0.00001)
+        self.assertEqual(self.h.percentile(99), 0.00001)
+        self.assertEqual(self.h.percentile(100), 0.5)
+
+    def test_percentile_unbounded(self):
+        self.h.record(5)
+        self.assertEqual(self.h.percentile(50), None)
+
+class TestFormatDuration(unittest.TestCase):
+
+    def test_format(self):
+        self.assertEqual(format_duration(0.000005), "5us")
+        self.assertEqual(format_duration(0.0025), "2.5ms")
+        self.assertEqual(format_duration(2), "2.00s")
+        self.assertEqual(format_duration(None), "inf")
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.now = [0]
+        self.p = Profiler()
+        self.p.timer = lambda: self.now[0]
+
+    def test_trivial(self):
+        pass
+
+    def work(self, duration):
+        self.now[0] += duration
+        return "done"
+
+    def test_call(self):
+        retval = self.p.call("dig_hook", "torch", self.work, 0.002)
+
+        self.assertEqual(retval, "done")
+        h = self.p.histograms["dig_hook", "torch"]
+        self.assertEqual(h.count, 1)
+        self.assertAlmostEqual(h.total, 0.002)
+
+    def test_call_exception(self):
+        """
+        Calls which raise are still recorded.
+        """
+
+        def broken():
+            self.now[0] += 1
+            raise RuntimeError()
+
+        self.assertRaises(RuntimeError, self.p.call, "use_hook", "broken",
+            broken)
+        self.assertEqual(self.p.histograms["use_hook", "broken"].count, 1)
+
+    def test_call_generator(self):
+        """
+        Generators, like most chat commands, do their work while being
+        iterated, so they are timed by iterating them inside the call.
+        """
+
+        def command():
+            for i in range(3):
+                self.work(0.01)
+                yield "line %d" % i
+
+        lines = self.p.call("command", "status", lambda: list(command()))
+
+        self.assertEqual(lines, ["line 0", "line 1", "line 2"])
+        self.assertAlmostEqual(self.p.histograms["command", "status"].total,
+            0.03)
+
+    def test_call_deferred(self):
+        """
+        Deferreds are timed until they fire.
+        """
+
+        d = Deferred()
+        result = self.p.call_deferred("dig_hook", "slow", lambda: d)
+        self.assertFalse(self.p.histograms)
+
+        self.work(0.5)
+        d.callback("done")
+
+        results = []
+        result.addCallback(results.append)
+        self.assertEqual(results, ["done"])
+        self.assertAlmostEqual(self.p.histograms["dig_hook", "slow"].total,
+            0.5)
+
+    def test_call_deferred_failure(self):
+        def broken():
+            self.work(0.1)
+            raise RuntimeError()
+
+        d = self.p.call_deferred("dig_hook", "broken", broken)
+        self.assertFailure(d, RuntimeError)
+        self.assertEqual(self.p.histograms["dig_hook", "broken"].count, 1)
+        return d
+
+    def test_disabled(self):
+        self.p.enabled = False
+
+        retval = self.p.call("dig_hook", "torch", self.work, 0.002)
+
+        self.assertEqual(retval, "done")
+        self.assertFalse(self.p.histograms)
+
+    def test_stats_order(self):
+        self.p.call("dig_hook", "fast", self.work, 0.001)
+        self.p.call("dig_hook", "slow", self.work, 0.1)
+
+        keys = [key for key, h in self.p.stats()]
+        self.assertEqual(keys, [("dig_hook", "slow"), ("dig_hook", "fast")])
+
+    def test_report(self):
+        self.p.call("dig_hook", "fast", self.work, 0.001)
+        self.p.call("dig_hook", "slow", self.work, 0.1)
+
+        lines = self.p.report(limit=1)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith("dig_hook slow: 1 calls"))
+
+    def test_reset(self):
+        self.p.call("dig_hook", "torch", self.work, 0.002)
+        self.p.reset()
+        self.assertFalse(self.p.stats())
+
+    def test_ticker(self):
+        """
+        Ticked systems are recorded by name.
+        """
+
+        t = Ticker()
+        t.timer = self.p.timer
+        t.profiler = self.p
+
+        t.add(lambda: self.work(0.01), name="mobs")
+        t.advance()
+
+        h = self.p.histograms["tick", "mobs"]
+        self.assertEqual(h.count, 1)
+        self.assertAlmostEqual(h.total, 0.01)
@@ -0,0 +1,416 @@
+from twisted.internet.defer import fail, succeed
+from twisted.trial import unittest
+
+from bravo.amp import (Arrive, BlockChanged, Decorate, EntityMoved,
+                       EntityRemoved, ShardBusFactory)
+from bravo.beta.protocol import ShardProxyProtocol
+from bravo.beta.packets import make_packet
+from bravo.chunk import Chunk
+from bravo.config import BravoConfigParser
+from bravo.entity import Player
+from bravo.location import Location
+from bravo.movement import MovementBroadcaster
+from bravo.shard import Shard, ShardMap
+from bravo.terrain.decoration import DecorationQueue
+from bravo.tracker import EntityTracker
+
+class FakeTransport(object):
+
+    lost = False
+
+    def __init__(self):
+        self.data = []
+
+    def write(self, data):
+        self.data.append(data)
+
+    def loseConnection(self):
+        self.lost = True
+
+class FakeBus(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def callRemote(self, command, **kwargs):
+        self.calls.append((command, kwargs))
+        return succeed({})
+
+class FakeLonelyBus(FakeBus):
+    """
+    A bus on which no other shards are connected.
+    """
+
+    def callRemote(self, command, **kwargs):
+        self.calls.append((command, kwargs))
+        return fail(KeyError(1))
+
+class FakeWorld(object):
+
+    def __init__(self):
+        self.chunk_cache = {}
+        self.dirty_chunk_cache = {}
+        self.saved = []
+        self.queued = []
+
+    def queue_decorations(self, queue):
+        self.queued.append(queue)
+
+    def save_player(self, username, player):
+        self.saved.append(username)
+
+class FakeProtocol(object):
+
+    handed_off = False
+
+    def __init__(self, eid, x=0, z=0):
+        location = Location()
+        location.pos = location.pos._replace(x=x * 32, y=64 * 32, z=z * 32)
+        self.player = Player(eid=eid, username=u"player%d" % eid,
+            location=location)
+        self.username = self.player.username
+        self.location = location
+        self.transport = FakeTransport()
+        self.chunks = {}
+
+class FakeFactory(object):
+
+    config_name = "world unittest"
+
+    def __init__(self):
+        self.config = BravoConfigParser()
+        self.config.add_section(self.config_name)
+        self.config.set(self.config_name, "shard", "0")
+        self.config.set(self.config_name, "shards", "2")
+        self.config.set(self.config_name, "shard_size", "2")
+        self.config.set(self.config_name, "shard_border", "1")
+
+        self.world = FakeWorld()
+        self.protocols = {}
+        self.broadcasts = []
+        self.movement = MovementBroadcaster(self)
+        self.tracker = EntityTracker(self)
+        self.shard = Shard(self)
+
+    def broadcast_for_chunk(self, packet, x, z):
+        self.broadcasts.append((packet, x, z))
+
+class TestShardMap(unittest.TestCase):
+
+    def setUp(self):
+        self.sm = ShardMap(3, size=4)
+
+    def test_trivial(self):
+        pass
+
+    def test_shard_for(self):
+        self.assertEqual(self.sm.shard_for(0, 0), 0)
+        self.assertEqual(self.sm.shard_for(3, 3), 0)
+        self.assertEqual(self.sm.shard_for(4, 0), 1)
+        self.assertEqual(self.sm.shard_for(4, 4), 2)
+        self.assertEqual(self.sm.shard_for(-1, 0), 2)
+
+    def test_shard_at(self):
+        self.assertEqual(self.sm.shard_at(63, 0), 0)
+        self.assertEqual(self.sm.shard_at(64, 0), 1)
+
+    def test_shards_near(self):
+        self.assertEqual(self.sm.shards_near(1, 1, 1), set([0]))
+        self.assertEqual(self.sm.shards_near(3, 1, 1), set([0, 1]))
+        self.assertEqual(self.sm.shards_near(0, 0, 1), set([0, 1, 2]))
+
+class TestShard(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = FakeFactory()
+        self.shard = self.factory.shard
+        self.bus = FakeBus()
+        self.shard.bus = self.bus
+
+    def test_trivial(self):
+        pass
+
+    def test_owns(self):
+        self.assertTrue(self.shard.owns(0, 1))
+        self.assertFalse(self.shard.owns(2, 1))
+
+    def test_handoff_target(self):
+        # Chunk 2 belongs to shard 1; its first block column is 32.
+        self.assertEqual(self.shard.handoff_target(20, 8), None)
+        self.assertEqual(self.shard.handoff_target(36, 8), None)
+        self.assertEqual(self.shard.handoff_target(40, 8), 1)
+
+    def test_publish_damage(self):
+        chunk = Chunk(1, 0)
+        chunk.populated = True
+        chunk.set_block((15, 64, 3), 1)
+        self.shard.publish_damage(chunk)
+
+        command, kwargs = self.bus.calls[0]
+        self.assertEqual(command, BlockChanged)
+        self.assertEqual((kwargs["x"], kwargs["y"], kwargs["z"]),
+            (31, 64, 3))
+        self.assertEqual(kwargs["block"], 1)
+
+    def test_publish_damage_far(self):
+        self.shard.border = 0
+        chunk = Chunk(0, 0)
+        chunk.populated = True
+        chunk.set_block((0, 64, 0), 1)
+        self.shard.publish_damage(chunk)
+
+        self.assertEqual(self.bus.calls, [])
+
+    def test_block_changed(self):
+        chunk = Chunk(2, 0)
+        chunk.populated = True
+        self.factory.world.chunk_cache[2, 0] = chunk
+
+        self.shard.block_changed(33, 64, 1, 1, 0)
+
+        self.assertEqual(chunk.get_block((1, 64, 1)), 1)
+        self.assertFalse(chunk.damaged)
+        packet, x, z = self.factory.broadcasts[0]
+        self.assertEqual((x, z), (2, 0))
+
+    def test_block_changed_unloaded(self):
+        """
+        Changes to other shards' chunks are dropped unless they're loaded.
+        """
+
+        self.shard.block_changed(33, 64, 1, 1, 0)
+        self.assertEqual(self.factory.broadcasts, [])
+
+    def test_send_decorations(self):
+        """
+        Writes to other shards' chunks are sent to their owners, and writes
+        to this shard's chunks are kept.
+        """
+
+        queue = DecorationQueue()
+        queue.add((1, 64, 1), 17)
+        queue.add((33, 64, 1), 17, 2, [0])
+
+        self.shard.send_decorations(queue)
+
+        self.assertEqual(list(queue.pending), [(0, 0)])
+        command, kwargs = self.bus.calls[0]
+        self.assertEqual(command, Decorate)
+        self.assertEqual(kwargs["shard"], 1)
+        sent = DecorationQueue()
+        sent.load(kwargs["decorations"])
+        self.assertEqual(sent.pending, {(2, 0): [(1, 64, 1, 17, 2, (0,))]})
+
+    def test_send_decorations_batched(self):
+        self.shard.decoration_batch = 2
+
+        queue = DecorationQueue()
+        for y in range(5):
+            queue.add((33, y, 1), 17)
+
+        self.shard.send_decorations(queue)
+
+        self.assertEqual(len(self.bus.calls), 3)
+        self.assertFalse(queue.pending)
+
+    def test_send_decorations_unreachable(self):
+        """
+        Writes stay queued, in order, while their owner isn't on the bus.
+        """
+
+        self.shard.bus = FakeLonelyBus()
+
+        queue = DecorationQueue()
+        queue.add((33, 64, 1), 17)
+        self.shard.send_decorations(queue)
+        queue.add((33, 65, 1), 17)
+        self.shard.send_decorations(queue)
+
+        self.assertEqual(queue.pending[2, 0],
+            [(1, 64, 1, 17, 0, None), (1, 65, 1, 17, 0, None)])
+        self.assertTrue(queue.dirty)
+
+    def test_send_decorations_without_bus(self):
+        self.shard.bus = None
+
+        queue = DecorationQueue()
+        queue.add((33, 64, 1), 17)
+        self.shard.send_decorations(queue)
+
+        self.assertEqual(len(queue), 1)
+
+    def test_decorate(self):
+        sent = DecorationQueue()
+        sent.add((1, 64, 1), 17)
+
+        self.shard.decorate(sent.save())
+
+        queue, = self.factory.world.queued
+        self.assertEqual(queue.pending, {(0, 0): [(1, 64, 1, 17, 0, None)]})
+
+    def test_entity_moved(self):
+        self.shard.entity_moved(5, u"remote", 64, 2048, 64, 0, 0)
+        self.assertTrue(5 in self.shard.remote)
+
+        self.shard.entity_moved(5, u"remote", 96, 2048, 64, 0, 0)
+        self.assertEqual(self.shard.remote[5].location.pos.x, 96)
+
+        self.shard.entity_removed(5)
+        self.assertFalse(self.shard.remote)
+
+    def test_remote_players_tracked(self):
+        viewer = FakeProtocol(2)
+        viewer.chunks[0, 0] = Chunk(0, 0)
+        self.factory.protocols[viewer.username] = viewer
+
+        self.shard.entity_moved(5, u"remote", 64, 2048, 64, 0, 0)
+        self.factory.tracker.update()
+        self.assertEqual(self.factory.tracker.visible[viewer], set([5]))
+
+    def test_admit(self):
+        protocol = FakeProtocol(2)
+        self.shard.arrivals[protocol.username] = 9
+
+        self.assertTrue(self.shard.admit(protocol))
+        self.assertEqual(protocol.eid, 9)
+        self.assertFalse(self.shard.admit(protocol))
+
+    def test_update_publishes(self):
+        protocol = FakeProtocol(2, 20, 0)
+        self.factory.protocols[protocol.username] = protocol
+
+        self.shard.update()
+        self.assertEqual(self.bus.calls[0][0], EntityMoved)
+
+        # Standing still isn't news.
+        self.shard.update()
+        self.assertEqual(len(self.bus.calls), 1)
+
+        self.shard.forget(protocol)
+        self.assertEqual(self.bus.calls[1], (EntityRemoved, {"eid": 2}))
+
+    def test_update_handoff(self):
+        protocol = FakeProtocol(2, 40, 8)
+        self.factory.protocols[protocol.username] = protocol
+
+        self.shard.update()
+
+        self.assertTrue(protocol.handed_off)
+        self.assertEqual(self.factory.world.saved, [protocol.username])
+        self.assertEqual(self.bus.calls[0][1]["shard"], 1)
+        self.assertTrue(protocol.transport.lost)
+
+class FakeProxy(object):
+
+    def __init__(self):
+        self.name = "unittest"
+        self.clients = {}
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.switched = []
+
+    def switch(self, shard):
+        self.switched.append(shard)
+
+class TestShardBusFactory(unittest.TestCase):
+
+    def setUp(self):
+        self.proxy = FakeProxy()
+        self.hub = ShardBusFactory(self.proxy)
+        self.workers = [FakeBus(), FakeBus()]
+        self.hub.workers.update(enumerate(self.workers))
+
+    def test_trivial(self):
+        pass
+
+    def test_relay(self):
+        self.hub.relay(self.workers[0], EntityRemoved, eid=5)
+
+        self.assertEqual(self.workers[0].calls, [])
+        self.assertEqual(self.workers[1].calls, [(EntityRemoved, {"eid": 5})])
+
+    def test_deliver(self):
+        self.hub.deliver(1, Decorate, shard=1, decorations="[]")
+
+        self.assertEqual(self.workers[0].calls, [])
+        self.assertEqual(self.workers[1].calls,
+            [(Decorate, {"shard": 1, "decorations": "[]"})])
+
+    def test_deliver_unknown(self):
+        self.assertRaises(KeyError, self.hub.deliver, 2, Decorate, shard=2,
+            decorations="[]")
+
+    def test_handoff(self):
+        client = FakeClient()
+        self.proxy.clients[u"player"] = client
+
+        self.hub.handoff(u"player", 5, 1)
+
+        self.assertEqual(self.workers[1].calls,
+            [(Arrive, {"username": u"player", "eid": 5})])
+        self.assertEqual(client.switched, [1])
+
+    def test_handoff_unknown(self):
+        self.assertRaises(KeyError, self.hub.handoff, u"nobody", 5, 1)
+
+class TestShardProxyProtocol(unittest.TestCase):
+
+    def setUp(self):
+        self.p = ShardProxyProtocol()
+        self.p.factory = FakeProxy()
+        self.p.transport = FakeTransport()
+        self.p.greeting = make_packet("handshake", protocol=60,
+            username="player", host="localhost", port=25565)
+        self.p.setTimeout(None)
+
+    def upstream(self, handoff=False):
+        upstream = self.p.make_upstream(handoff)
+        upstream.transport = FakeTransport()
+        upstream.connectionMade()
+        return upstream
+
+    def test_trivial(self):
+        pass
+
+    def test_relay(self):
+        upstream = self.upstream()
+        self.assertEqual(upstream.transport.data, [self.p.greeting])
+
+        upstream.dataReceived("abc")
+        self.assertEqual(self.p.transport.data, ["abc"])
+
+        self.p.dataReceived("def")
+        self.assertEqual(upstream.transport.data[-1], "def")
+
+    def test_switch(self):
+        """
+        Switching workers drops the new worker's login, and keeps the two
+        workers' data in order.
+        """
+
+        old = self.upstream()
+        new = self.upstream(True)
+
+        login = make_packet("login", eid=5, leveltype="default",
+            mode="creative", dimension="earth", difficulty="peaceful",
+            unused=0, maxplayers=20)
+        new.dataReceived(login[:4])
+        new.dataReceived(login[4:] + "new")
+        self.p.dataReceived("client")
+        old.dataReceived("old")
+
+        self.assertEqual(self.p.transport.data, ["old"])
+        self.assertEqual(new.transport.data, [self.p.greeting])
+
+        old.connectionLost(None)
+
+        self.assertEqual("".join(self.p.transport.data), "oldnew")
+        self.assertEqual(new.transport.data[-1], "client")
+        self.assertFalse(self.p.transport.lost)
+
+    def test_upstream_lost(self):
+        upstream = self.upstream()
+        upstream.connectionLost(None)
+        self.assertTrue(self.p.transport.lost)
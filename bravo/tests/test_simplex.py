@@ -1,6 +1,11 @@
+from __future__ import division
+
+from threading import Thread
 import unittest
 
-from bravo.simplex import set_seed, simplex, octaves2, octaves3
+import bravo.simplex
+from bravo.simplex import (SimplexNoise, get_noise, set_seed, simplex,
+                           octaves2, octaves3, octaves2_grid, octaves3_grid)
 
 class TestOctaves(unittest.TestCase):
 
@@ -15,3 +20,117 @@ class TestOctaves(unittest.TestCase):
             self.assertEqual(simplex(i, i), octaves2(i, i, 1))
         for i in range(512):
             self.assertEqual(simplex(i, i, i), octaves3(i, i, i, 1))
+
+class TestGrids(unittest.TestCase):
+
+    def setUp(self):
+        set_seed(0)
+
+    def test_trivial(self):
+        pass
+
+    def test_octaves2_grid(self):
+        grid = octaves2_grid(-20, 7, 16, 8, 1 / 16, 4)
+        self.assertEqual(len(grid), 16 * 8)
+        for i in range(16):
+            for j in range(8):
+                self.assertAlmostEqual(grid[i * 8 + j],
+                    octaves2((-20 + i) / 16, (7 + j) / 16, 4))
+
+    def test_octaves3_grid(self):
+        grid = octaves3_grid(5, -9, 60, 4, 3, 10, (1 / 16, 1 / 16, 1 / 32), 3)
+        self.assertEqual(len(grid), 4 * 3 * 10)
+        for i in range(4):
+            for j in range(3):
+                for k in range(10):
+                    self.assertAlmostEqual(grid[(i * 3 + j) * 10 + k],
+                        octaves3((5 + i) / 16, (-9 + j) / 16, (60 + k) / 32,
+                            3))
+
+    def test_grid_without_numpy(self):
+        """
+        The pure-Python grids give exactly the scalar results.
+        """
+
+        numpy = bravo.simplex.numpy
+        bravo.simplex.numpy = None
+        try:
+            grid2 = octaves2_grid(0, 0, 4, 4, 0.3, 2)
+            grid3 = octaves3_grid(0, 0, 0, 4, 4, 4, 0.3, 2)
+        finally:
+            bravo.simplex.numpy = numpy
+
+        for i in range(4):
+            for j in range(4):
+                self.assertEqual(grid2[i * 4 + j],
+                    octaves2(i * 0.3, j * 0.3, 2))
+                for k in range(4):
+                    self.assertEqual(grid3[(i * 4 + j) * 4 + k],
+                        octaves3(i * 0.3, j * 0.3, k * 0.3, 2))
+
+class TestSimplexNoise(unittest.TestCase):
+
+    def test_trivial(self):
+        pass
+
+    def test_matches_global(self):
+        noise = SimplexNoise(5)
+        set_seed(5)
+        for i in range(64):
+            self.assertEqual(noise.simplex2(i / 7, i / 3),
+                simplex(i / 7, i / 3))
+            self.assertEqual(noise.octaves3(i, i / 5, i / 9, 3),
+                octaves3(i, i / 5, i / 9, 3))
+
+    def test_independent(self):
+        """
+        Using one seed's noise doesn't disturb another's.
+        """
+
+        first = SimplexNoise(1)
+        second = SimplexNoise(2)
+        before = first.octaves2(3.5, 4.5, 4)
+        second.octaves2(3.5, 4.5, 4)
+        set_seed(3)
+        self.assertEqual(first.octaves2(3.5, 4.5, 4), before)
+        self.assertNotEqual(second.octaves2(3.5, 4.5, 4), before)
+
+    def test_get_noise_cached(self):
+        self.assertTrue(get_noise(42) is get_noise(42))
+        self.assertEqual(get_noise(42).seed, 42)
+
+    def test_get_noise_bounded(self):
+        for i in range(bravo.simplex.FIELDS * 2):
+            get_noise(1000 + i)
+        self.assertEqual(len(bravo.simplex.fields), bravo.simplex.FIELDS)
+        self.assertFalse(1000 in bravo.simplex.fields)
+
+    def test_get_noise_threads(self):
+        """
+        Noise can be fetched from many threads at once, and the cache stays
+        consistent.
+        """
+
+        seen = []
+        failures = []
+
+        def fetch(offset):
+            try:
+                for i in range(200):
+                    seed = 2000 + (i + offset) % (bravo.simplex.FIELDS * 3)
+                    noise = get_noise(seed)
+                    if noise.seed != seed:
+                        failures.append(seed)
+                    seen.append((seed, noise))
+            except Exception, e:
+                failures.append(e)
+
+        threads = [Thread(target=fetch, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(len(seen), 8 * 200)
+        self.assertEqual(len(bravo.simplex.fields), bravo.simplex.FIELDS)
@@ -0,0 +1,139 @@
+from twisted.internet.task import Clock
+from twisted.trial import unittest
+
+from bravo.ticker import Ticker
+
+class TestTicker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.t = Ticker()
+        self.t.clock = self.clock
+
+    def tearDown(self):
+        self.t.stop()
+
+    def test_trivial(self):
+        pass
+
+    def test_interval_invalid(self):
+        self.assertRaises(ValueError, self.t.add, lambda: None, 0)
+
+    def test_interval(self):
+        """
+        Systems are run once per interval.
+        """
+
+        calls = []
+        self.t.add(lambda: calls.append(self.t.tick), 2)
+        self.t.start()
+
+        self.clock.pump([0.05] * 6)
+        self.assertEqual(calls, [2, 4, 6])
+
+    def test_now(self):
+        calls = []
+        self.t.add(lambda: calls.append(None), 10, now=True)
+        self.assertEqual(len(calls), 1)
+
+    def test_order(self):
+        """
+        Systems run in order, and then in the order that they were added.
+        """
+
+        calls = []
+        self.t.add(lambda: calls.append("late"), order=2)
+        self.t.add(lambda: calls.append("early"), order=1)
+        self.t.add(lambda: calls.append("earlier"), order=0)
+        self.t.add(lambda: calls.append("early2"), order=1)
+        self.t.advance()
+
+        self.assertEqual(calls, ["earlier", "early", "early2", "late"])
+
+    def test_stop_system(self):
+        calls = []
+        system = self.t.add(lambda: calls.append(None))
+        self.t.advance()
+        system.stop()
+        self.t.advance()
+
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(system.running)
+        self.assertFalse(self.t.systems)
+
+    def test_missed_ticks(self):
+        """
+        Missed ticks are counted and passed along to counting systems.
+        """
+
+        counts = []
+        self.t.add(counts.append, 2, with_count=True)
+        self.t.start()
+
+        self.clock.advance(1)
+
+        self.assertEqual(self.t.tick, 20)
+        self.assertEqual(self.t.missed, 19)
+        self.assertEqual(counts, [10])
+
+    def test_budget_defers(self):
+        """
+        Once the tick's budget is exhausted, remaining systems are deferred to
+        the next tick, and run first.
+        """
+
+        now = [0]
+        self.t.timer = lambda: now[0]
+        self.t.budget = 1
+
+        calls = []
+
+        def slow():
+            calls.append("slow")
+            now[0] += 2
+
+        self.t.add(slow)
+        self.t.add(lambda: calls.append("fast"))
+
+        self.t.advance()
+        self.assertEqual(calls, ["slow"])
+        self.assertEqual(self.t.overruns, 1)
+        self.assertEqual(self.t.deferrals, 1)
+
+        self.t.advance()
+        self.assertEqual(calls, ["slow", "fast", "slow"])
+
+    def test_deferred_count(self):
+        """
+        Deferred counting systems are told about the ticks they waited out.
+        """
+
+        now = [0]
+        self.t.timer = lambda: now[0]
+        self.t.budget = 1
+
+        counts = []
+
+        def slow():
+            now[0] += 2
+
+        self.t.add(slow)
+        self.t.add(counts.append, with_count=True)
+
+        self.t.advance()
+        self.t.advance()
+        self.assertEqual(counts, [2])
+
+    def test_duration(self):
+        now = [0]
+        self.t.timer = lambda: now[0]
+
+        def work():
+            now[0] += 0.01
+
+        self.t.add(work)
+        self.t.advance()
+
+        self.assertAlmostEqual(self.t.last_duration, 0.01)
+        self.assertAlmostEqual(self.t.max_duration, 0.01)
+        self.assertEqual(self.t.stats()["tick"], 1)
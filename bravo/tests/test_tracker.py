@@ -0,0 +1,180 @@
+from twisted.trial import unittest
+
+from bravo.beta.packets import parse_packets
+from bravo.chunk import Chunk
+from bravo.config import BravoConfigParser
+from bravo.entity import Player, Pickup, Cow
+from bravo.location import Location
+from bravo.movement import MovementBroadcaster
+from bravo.tracker import EntityTracker
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.data = []
+
+    def write(self, data):
+        self.data.append(data)
+
+class FakeProtocol(object):
+
+    def __init__(self, eid, x=0, z=0):
+        self.player = Player(eid=eid, username="player%d" % eid,
+            location=self.at(x, z))
+        self.location = self.player.location
+        self.transport = FakeTransport()
+        self.chunks = {}
+
+    @staticmethod
+    def at(x, z):
+        location = Location()
+        location.pos = location.pos._replace(x=x * 32, y=64 * 32, z=z * 32)
+        return location
+
+    def load(self, x, z):
+        chunk = Chunk(x, z)
+        self.chunks[x, z] = chunk
+        return chunk
+
+    def headers(self):
+        packets, leftovers = parse_packets("".join(self.transport.data))
+        self.transport.data = []
+        return [header for header, payload in packets]
+
+class FakeFactory(object):
+
+    config_name = "world unittest"
+    shard = None
+
+    def __init__(self):
+        self.config = BravoConfigParser()
+        self.protocols = {}
+        self.movement = MovementBroadcaster(self)
+
+class TestEntityTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = FakeFactory()
+        self.tracker = EntityTracker(self.factory)
+        self.factory.tracker = self.tracker
+
+        self.viewer = FakeProtocol(1)
+        self.factory.protocols["viewer"] = self.viewer
+        self.chunk = self.viewer.load(0, 0)
+
+    def test_trivial(self):
+        pass
+
+    def test_config(self):
+        self.factory.config.add_section("world unittest")
+        self.factory.config.set("world unittest", "tracking_range", "20")
+        self.factory.config.set("world unittest", "tracking_range_item", "5")
+
+        tracker = EntityTracker(self.factory)
+        self.assertEqual(tracker.default_range, 20)
+        self.assertEqual(tracker.ranges["Item"], 5)
+        self.assertEqual(tracker.ranges["Player"], 128)
+
+    def test_range_enter_exit(self):
+        cow = Cow(eid=10, location=FakeProtocol.at(5, 5))
+        self.chunk.entities.add(cow)
+
+        self.tracker.update()
+        self.assertEqual(self.tracker.visible[self.viewer], set([10]))
+        self.assertEqual(self.tracker.viewers(10), set([self.viewer]))
+        self.assertTrue(24 in self.viewer.headers())
+
+        # Walk far away, but keep the chunk loaded.
+        self.viewer.location.pos = self.viewer.location.pos._replace(
+            x=200 * 32)
+        self.tracker.update()
+        self.assertFalse(self.tracker.visible[self.viewer])
+        self.assertEqual(self.viewer.headers(), [29])
+
+    def test_per_type_range(self):
+        """
+        Pickups are only tracked from close by.
+        """
+
+        pickup = Pickup(eid=10, location=FakeProtocol.at(10, 70))
+        cow = Cow(eid=11, location=FakeProtocol.at(10, 70))
+        self.viewer.load(0, 4).entities.update([pickup, cow])
+
+        self.tracker.update()
+        self.assertEqual(self.tracker.visible[self.viewer], set([11]))
+
+    def test_unloaded_chunk(self):
+        cow = Cow(eid=10, location=FakeProtocol.at(20, 5))
+        Chunk(1, 0).entities.add(cow)
+
+        self.tracker.spawn(cow)
+        self.assertFalse(self.tracker.visible[self.viewer])
+
+    def test_players(self):
+        other = FakeProtocol(2, 10, 10)
+        other.load(0, 0)
+        self.factory.protocols["other"] = other
+
+        self.tracker.update()
+        self.assertEqual(self.tracker.visible[self.viewer], set([2]))
+        self.assertEqual(self.tracker.visible[other], set([1]))
+
+    def test_spawn_despawn(self):
+        cow = Cow(eid=10, location=FakeProtocol.at(5, 5))
+
+        self.tracker.spawn(cow)
+        self.assertTrue(24 in self.viewer.headers())
+
+        self.tracker.despawn(cow)
+        self.assertEqual(self.viewer.headers(), [29])
+        self.assertFalse(self.tracker.viewers(10))
+
+    def test_hide(self):
+        cow = Cow(eid=10, location=FakeProtocol.at(5, 5))
+        self.tracker.spawn(cow)
+        self.viewer.headers()
+
+        self.tracker.hide(self.viewer, [10, 11])
+        self.assertEqual(self.viewer.headers(), [29])
+
+        self.tracker.hide(self.viewer, [10])
+        self.assertEqual(self.viewer.headers(), [])
+
+    def test_broadcast(self):
+        """
+        Packets about an entity only go to its trackers.
+        """
+
+        far = FakeProtocol(2, 1000, 1000)
+        self.factory.protocols["far"] = far
+        cow = Cow(eid=10, location=FakeProtocol.at(5, 5))
+        self.tracker.spawn(cow)
+        self.viewer.headers()
+
+        self.tracker.broadcast(10, "\x00\x00\x00\x00\x00")
+        self.assertEqual(self.viewer.headers(), [0])
+        self.assertEqual(far.headers(), [])
+
+    def test_movement(self):
+        """
+        Movement only goes to trackers.
+        """
+
+        far = FakeProtocol(2, 1000, 1000)
+        self.factory.protocols["far"] = far
+        cow = Cow(eid=10, location=FakeProtocol.at(5, 5))
+        self.tracker.spawn(cow)
+        self.viewer.headers()
+
+        self.factory.movement.move(10, cow.location)
+        self.factory.movement.flush()
+        self.assertEqual(self.viewer.headers(), [34])
+        self.assertEqual(far.headers(), [])
+
+    def test_forget_viewer(self):
+        cow = Cow(eid=10, location=FakeProtocol.at(5, 5))
+        self.tracker.spawn(cow)
+
+        self.tracker.forget_viewer(self.viewer)
+        self.assertFalse(self.tracker.viewers(10))
+        self.assertFalse(self.viewer in self.tracker.visible)
@@ -0,0 +1,54 @@
+from twisted.trial import unittest
+
+from bravo.utilities.maths import circling
+from bravo.view import View, ring_offsets
+
+class TestRingOffsets(unittest.TestCase):
+
+    def test_nearest_first(self):
+        offsets = ring_offsets(4)
+        self.assertEqual(offsets[0], (0, 0))
+        distances = [i ** 2 + j ** 2 for i, j in offsets]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_circle(self):
+        self.assertEqual(sorted(ring_offsets(8)), sorted(circling(0, 0, 8)))
+
+class TestView(unittest.TestCase):
+
+    def setUp(self):
+        self.v = View()
+
+    def test_trivial(self):
+        pass
+
+    def test_empty(self):
+        self.assertFalse((0, 0) in self.v)
+        self.assertEqual(list(self.v), [])
+
+    def test_first_move(self):
+        added, removed = self.v.move(3, 4, 2)
+        self.assertEqual(added[0], (3, 4))
+        self.assertEqual(sorted(added), sorted(circling(3, 4, 2)))
+        self.assertEqual(removed, [])
+        self.assertTrue((5, 4) in self.v)
+        self.assertFalse((5, 5) in self.v)
+
+    def test_unchanged(self):
+        self.v.move(0, 0, 8)
+        self.assertEqual(self.v.move(0, 0, 8), None)
+
+    def test_deltas(self):
+        """
+        Deltas match the differences between the old and new circles.
+        """
+
+        moves = [(0, 0, 8), (1, 0, 8), (1, 1, 8), (0, 2, 8), (0, 2, 4),
+            (5, -3, 4), (40, 40, 4), (40, 41, 16)]
+        old = set()
+        for x, z, r in moves:
+            added, removed = self.v.move(x, z, r)
+            new = set(circling(x, z, r))
+            self.assertEqual(set(added), new - old)
+            self.assertEqual(set(removed), old - new)
+            old = new
@@ -1,13 +1,19 @@
 from twisted.trial import unittest
 
 from twisted.internet.defer import inlineCallbacks
+from twisted.internet.task import Clock
 
 from array import array
 from itertools import product
 import os
 
+from bravo.chunk import Chunk
 from bravo.config import BravoConfigParser
+from bravo.entity import Furnace, Painting, Pig
 from bravo.errors import ChunkNotLoaded
+from bravo.location import Location
+from bravo.terrain.decoration import DecorationQueue
+from bravo.ticker import Ticker
 from bravo.world import World
 
 class TestWorldChunks(unittest.TestCase):
@@ -169,6 +175,27 @@ class TestWorldChunks(unittest.TestCase):
             block = self.w.sync_get_block((x, y, z))
             self.assertEqual(block, chunk.get_block((x, y, z)))
 
+    @inlineCallbacks
+    def test_request_chunks(self):
+        cached = yield self.w.request_chunk(0, 0)
+
+        saved = yield self.w.request_chunk(1, 0)
+        self.w.save_chunk(saved)
+        self.w.chunk_cache.clear()
+        self.w.dirty_chunk_cache.clear()
+        self.w.chunk_cache[0, 0] = cached
+
+        chunks = yield self.w.request_chunks([(0, 0), (1, 0), (2, 0)])
+        self.assertEqual(sorted(chunks), [(0, 0), (1, 0), (2, 0)])
+        self.assertTrue(chunks[0, 0] is cached)
+        self.assertTrue(chunks[1, 0] is not saved)
+        self.assertTrue(chunks[1, 0].populated)
+        self.assertTrue(chunks[2, 0].populated)
+
+        # Everything requested is now loaded.
+        chunk = yield self.w.request_chunk(2, 0)
+        self.assertTrue(chunk is chunks[2, 0])
+
     def test_sync_get_block_unloaded(self):
         self.assertRaises(ChunkNotLoaded, self.w.sync_get_block, (0, 0, 0))
 
@@ -189,6 +216,306 @@ class TestWorldChunks(unittest.TestCase):
 
         return d
 
+    @inlineCallbacks
+    def test_decorate_loaded(self):
+        chunk = yield self.w.request_chunk(0, 0)
+
+        self.w.decorate((1, 64, 2), 5, 3)
+        self.assertEqual(chunk.get_block((1, 64, 2)), 5)
+        self.assertEqual(chunk.get_metadata((1, 64, 2)), 3)
+        self.assertFalse(self.w.decorations.pending)
+
+    @inlineCallbacks
+    def test_decorate_unloaded(self):
+        """
+        Writes to unloaded chunks are made when the chunk is generated.
+        """
+
+        self.w.decorate((17, 64, 2), 5, 3)
+        self.w.decorate((17, 300, 2), 5)
+        self.assertEqual(len(self.w.decorations), 1)
+
+        chunk = yield self.w.request_chunk(1, 0)
+        self.assertEqual(chunk.get_block((1, 64, 2)), 5)
+        self.assertEqual(chunk.get_metadata((1, 64, 2)), 3)
+        self.assertEqual(chunk.heightmap[1 * 16 + 2], 64)
+        self.assertFalse(chunk.damaged)
+        self.assertFalse(self.w.decorations.pending)
+
+    @inlineCallbacks
+    def test_decorate_replace(self):
+        chunk = yield self.w.request_chunk(0, 0)
+        chunk.set_block((1, 64, 2), 1)
+
+        self.w.decorate((1, 64, 2), 5, replace=[0])
+        self.assertEqual(chunk.get_block((1, 64, 2)), 1)
+
+    @inlineCallbacks
+    def test_generated_decorations(self):
+        """
+        Generators' writes to other chunks are applied to loaded neighbors
+        straight away, and saved for the rest.
+        """
+
+        class Spill(object):
+            def populate(self, chunk, seed, context):
+                context.decorate((-1, 64, 0), 5)
+                context.decorate((16, 64, 0), 5)
+                context.decorate((0, 64, 0), 5)
+
+        neighbor = yield self.w.request_chunk(-1, 0)
+        self.w.pipeline = [Spill()]
+        chunk = yield self.w.request_chunk(0, 0)
+
+        self.assertEqual(chunk.get_block((0, 64, 0)), 5)
+        self.assertEqual(neighbor.get_block((15, 64, 0)), 5)
+        self.assertEqual(list(self.w.decorations.pending), [(1, 0)])
+
+    def test_decorations_saved(self):
+        self.w.decorate((17, 64, 2), 5)
+        self.w.sort_chunks()
+
+        self.assertFalse(self.w.decorations.dirty)
+        self.assertEqual(self.w.serializer.plugins["decorations"],
+            self.w.decorations.save())
+
+class FakeShard(object):
+
+    index = 0
+
+    def __init__(self):
+        self.sent = []
+
+    def owns(self, x, z):
+        return x < 1
+
+    def send_decorations(self, queue):
+        self.sent.append(queue)
+
+class FakeShardFactory(object):
+
+    def __init__(self):
+        self.shard = FakeShard()
+
+    def flush_chunk(self, chunk):
+        chunk.clear_damage()
+
+    def scan_chunk(self, chunk):
+        pass
+
+class TestWorldShardDecorations(unittest.TestCase):
+
+    def setUp(self):
+        self.bcp = BravoConfigParser()
+        self.bcp.add_section("world unittest")
+        self.bcp.set("world unittest", "url", "")
+        self.bcp.set("world unittest", "serializer", "memory")
+
+        self.w = World(self.bcp, "unittest")
+        self.w.factory = FakeShardFactory()
+        self.w.pipeline = []
+        self.w.start()
+
+    def tearDown(self):
+        self.w.stop()
+
+    def test_trivial(self):
+        pass
+
+    @inlineCallbacks
+    def test_queue_across_border(self):
+        """
+        Structures which cross into another shard's chunks only write this
+        shard's half, and keep the rest for the other shard, even when the
+        other half is loaded here.
+        """
+
+        chunk = yield self.w.request_chunk(0, 0)
+        foreign = yield self.w.request_chunk(1, 0)
+
+        queue = DecorationQueue()
+        queue.add((15, 64, 0), 17)
+        queue.add((16, 64, 0), 17)
+        self.w.queue_decorations(queue)
+
+        self.assertEqual(chunk.get_block((15, 64, 0)), 17)
+        self.assertEqual(foreign.get_block((0, 64, 0)), 0)
+        self.assertEqual(list(self.w.decorations.pending), [(1, 0)])
+
+        self.w.send_decorations()
+        self.assertEqual(self.w.factory.shard.sent, [self.w.decorations])
+
+    @inlineCallbacks
+    def test_decorate_foreign_loaded(self):
+        foreign = yield self.w.request_chunk(1, 0)
+
+        self.w.decorate((16, 64, 0), 17)
+
+        self.assertEqual(foreign.get_block((0, 64, 0)), 0)
+        self.assertEqual(list(self.w.decorations.pending), [(1, 0)])
+
+    @inlineCallbacks
+    def test_foreign_chunk_loaded_later(self):
+        """
+        Loading another shard's chunk doesn't use up the writes waiting for
+        it.
+        """
+
+        self.w.decorate((16, 64, 0), 17)
+        foreign = yield self.w.request_chunk(1, 0)
+
+        self.assertEqual(foreign.get_block((0, 64, 0)), 0)
+        self.assertEqual(len(self.w.decorations), 1)
+
+class TestWorldUnloading(unittest.TestCase):
+
+    def setUp(self):
+        self.name = "unittest"
+        self.bcp = BravoConfigParser()
+
+        self.bcp.add_section("world unittest")
+        self.bcp.set("world unittest", "url", "")
+        self.bcp.set("world unittest", "serializer", "memory")
+        self.bcp.set("world unittest", "unload_grace", "10")
+
+        self.clock = Clock()
+
+        self.w = World(self.bcp, self.name)
+        self.w.clock = self.clock
+        self.w.pipeline = []
+        self.w.start()
+
+    def tearDown(self):
+        self.w.stop()
+
+    def loaded(self, x, z):
+        return (x, z) in self.w.chunk_cache or (x, z) in self.w.dirty_chunk_cache
+
+    def test_trivial(self):
+        pass
+
+    def test_unload_grace(self):
+        """
+        Unneeded chunks are kept for the grace period, then unloaded.
+        """
+
+        self.w.request_chunk(0, 0)
+
+        self.assertEqual(self.w.unload_chunks(), 0)
+        self.assertEqual(self.w.resident["grace"], 1)
+
+        # The world's own ticker does the unloading.
+        self.clock.advance(11)
+        self.assertFalse(self.loaded(0, 0))
+        self.assertEqual(self.w.unloaded, 1)
+
+    def test_shared_ticker(self):
+        """
+        Worlds given a ticker run their chunk management on it, and leave
+        starting and stopping it to its owner.
+        """
+
+        self.w.stop()
+
+        ticker = Ticker()
+        self.w.ticker = ticker
+        self.w.start()
+
+        names = [system.name for system in ticker.systems]
+        self.assertTrue("chunk-unloading" in names)
+        self.assertFalse(ticker.running)
+
+        self.w.stop()
+        self.assertFalse(ticker.systems)
+        self.assertTrue(self.w.ticker is ticker)
+
+        self.w.ticker = None
+        self.w.start()
+
+    @inlineCallbacks
+    def test_unload_saves(self):
+        chunk = yield self.w.request_chunk(0, 0)
+        chunk.set_block((1, 2, 3), 4)
+        chunk.dirty = True
+
+        self.clock.advance(11)
+        self.w.unload_chunks()
+
+        self.assertFalse(self.loaded(0, 0))
+        chunk = yield self.w.request_chunk(0, 0)
+        self.assertEqual(chunk.get_block((1, 2, 3)), 4)
+
+    def test_unload_pinned(self):
+        self.w.request_chunk(0, 0)
+        self.w.pin_chunk(0, 0)
+
+        self.clock.advance(11)
+        self.w.unload_chunks()
+        self.assertTrue(self.loaded(0, 0))
+        self.assertEqual(self.w.resident["pinned"], 1)
+
+        self.w.unpin_chunk(0, 0)
+
+        # The grace period starts over once the pin is released.
+        self.clock.advance(5)
+        self.w.unload_chunks()
+        self.assertTrue(self.loaded(0, 0))
+
+        self.clock.advance(6)
+        self.w.unload_chunks()
+        self.assertFalse(self.loaded(0, 0))
+
+    @inlineCallbacks
+    def test_unload_saving_off(self):
+        """
+        Chunks with changes that can't be saved are kept.
+        """
+
+        chunk = yield self.w.request_chunk(0, 0)
+        chunk.dirty = True
+        self.w.save_off()
+
+        self.clock.advance(11)
+        self.w.unload_chunks()
+        self.assertTrue(self.loaded(0, 0))
+        self.assertEqual(self.w.resident["unsaved"], 1)
+
+        self.w.save_on()
+
+    @inlineCallbacks
+    def test_unload_quiesces_furnaces(self):
+        chunk = yield self.w.request_chunk(0, 0)
+
+        class FakeSystem(object):
+            running = True
+            def stop(self):
+                self.running = False
+
+        furnace = Furnace(1, 2, 3)
+        furnace.burning = system = FakeSystem()
+        furnace.running = True
+        chunk.tiles[1, 2, 3] = furnace
+
+        self.clock.advance(11)
+        self.w.unload_chunks()
+
+        self.assertFalse(system.running)
+        self.assertFalse(furnace.running)
+
+    @inlineCallbacks
+    def test_unload_stops_mobs(self):
+        chunk = yield self.w.request_chunk(0, 0)
+
+        pig = Pig(location=Location())
+        painting = Painting(location=Location())
+        chunk.entities.update([pig, painting])
+        self.w.mob_manager.mobs.add(pig)
+
+        self.clock.advance(11)
+        self.w.unload_chunks()
+
+        self.assertFalse(pig in self.w.mob_manager.mobs)
+
 class TestWorld(unittest.TestCase):
 
     def setUp(self):
@@ -249,3 +576,101 @@ class TestWorldConfig(unittest.TestCase):
         self.w.start()
         self.assertEqual(self.w.level.seed, 42)
         self.w.stop()
+
+class CountingSeason(object):
+
+    name = "counting"
+
+    def __init__(self, now):
+        self.now = now
+        self.transformed = []
+
+    def transform(self, chunk):
+        self.now[0] += 0.004
+        self.transformed.append((chunk.x, chunk.z))
+
+class TestWorldSeasons(unittest.TestCase):
+
+    def setUp(self):
+        self.name = "unittest"
+        self.bcp = BravoConfigParser()
+
+        self.bcp.add_section("world unittest")
+        self.bcp.set("world unittest", "url", "")
+        self.bcp.set("world unittest", "serializer", "memory")
+
+        self.clock = Clock()
+        self.now = [0]
+
+        self.w = World(self.bcp, self.name)
+        self.w.clock = self.clock
+        self.w.pipeline = []
+        self.w.start()
+        self.w.ticker.timer = lambda: self.now[0]
+
+        self.season = CountingSeason(self.now)
+
+    def tearDown(self):
+        self.w.stop()
+
+    def test_trivial(self):
+        pass
+
+    def test_apply_season_once(self):
+        chunk = Chunk(0, 0)
+        self.w.season = self.season
+
+        self.assertTrue(self.w.apply_season(chunk))
+        self.assertFalse(self.w.apply_season(chunk))
+        self.assertEqual(chunk.season, "counting")
+        self.assertEqual(self.season.transformed, [(0, 0)])
+
+    @inlineCallbacks
+    def test_postprocess_seasoned(self):
+        """
+        Chunks which are already in the season aren't transformed again when
+        they are loaded.
+        """
+
+        self.w.change_season(self.season)
+        chunk = yield self.w.request_chunk(0, 0)
+        self.assertEqual(chunk.season, "counting")
+
+        self.w.postprocess_chunk(chunk)
+        self.assertEqual(self.season.transformed, [(0, 0)])
+
+    @inlineCallbacks
+    def test_change_season_gradual(self):
+        """
+        Loaded chunks are brought into a new season a few each tick, for as
+        long as the season's share of the tick budget lasts.
+        """
+
+        for x in range(5):
+            yield self.w.request_chunk(x, 0)
+
+        self.w.change_season(self.season)
+        self.assertEqual(self.season.transformed, [])
+
+        # A quarter of the 40ms budget is enough for three 4ms transforms.
+        self.clock.advance(0.05)
+        self.assertEqual(len(self.season.transformed), 3)
+
+        self.clock.advance(0.05)
+        self.assertEqual(sorted(self.season.transformed),
+            [(x, 0) for x in range(5)])
+
+    @inlineCallbacks
+    def test_season_chunks_at_least_one(self):
+        for x in range(2):
+            yield self.w.request_chunk(x, 0)
+
+        self.w.change_season(self.season)
+        self.w.season_share = 0
+        self.assertEqual(self.w.season_chunks(), 1)
+
+    def test_change_season_same(self):
+        self.w.change_season(self.season)
+        self.w.request_chunk(0, 0)
+        self.w.change_season(self.season)
+        self.assertFalse(self.w._unseasoned)
@@ -7,6 +7,7 @@ from bravo.blocks import items, blocks
 from bravo.inventory import Inventory
 from bravo.entity import Furnace as FurnaceTile
 from bravo.inventory.windows import FurnaceWindow
+from bravo.ticker import Ticker
 from bravo.utilities.furnace import update_all_windows_slot, update_all_windows_progress
 
 class FakeChunk(object):
@@ -27,6 +28,7 @@ class FakeFactory(object):
     def __init__(self):
         self.protocols = []
         self.world = FakeWorld()
+        self.ticker = Ticker()
 
     def flush_chunk(self, chunk):
         pass
@@ -143,6 +145,7 @@ class TestFurnaceProcessCrafting(unittest.TestCase):
         self.factory.protocols = {1: self.protocol}
 
     def tearDown(self):
+        self.factory.ticker.stop()
         self.factory.world.chunk.states = []
         self.protocol.write_packet_calls = []
 
@@ -153,7 +156,8 @@ class TestFurnaceProcessCrafting(unittest.TestCase):
 
         # Patch the clock.
         clock = Clock()
-        self.tile.burning.clock = clock
+        self.factory.ticker.clock = clock
+        self.factory.ticker.start()
 
         self.tile.inventory.fuel[0] = Slot(blocks['wood'].slot, 0, 1)
         self.tile.inventory.crafting[0] = Slot(blocks['sand'].slot, 0, 1)
@@ -178,7 +182,8 @@ class TestFurnaceProcessCrafting(unittest.TestCase):
 
         # Patch the clock.
         clock = Clock()
-        self.tile.burning.clock = clock
+        self.factory.ticker.clock = clock
+        self.factory.ticker.start()
 
         self.tile.inventory.fuel[0] = Slot(blocks['wood'].slot, 0, 1)
         self.tile.inventory.crafting[0] = Slot(blocks['sand'].slot, 0, 1)
@@ -200,7 +205,8 @@ class TestFurnaceProcessCrafting(unittest.TestCase):
 
         # Patch the clock.
         clock = Clock()
-        self.tile.burning.clock = clock
+        self.factory.ticker.clock = clock
+        self.factory.ticker.start()
 
         self.tile.inventory.fuel[0] = Slot(blocks['sapling'].slot, 0, 10)
         self.tile.inventory.crafting[0] = Slot(blocks['sand'].slot, 0, 2)
@@ -226,7 +232,8 @@ class TestFurnaceProcessCrafting(unittest.TestCase):
 
         # Patch the clock.
         clock = Clock()
-        self.tile.burning.clock = clock
+        self.factory.ticker.clock = clock
+        self.factory.ticker.start()
 
         self.tile.inventory.fuel[0] = Slot(blocks['sapling'].slot, 0, 10)
         self.tile.inventory.crafting[0] = Slot(blocks['sand'].slot, 0, 2)
@@ -246,7 +253,8 @@ class TestFurnaceProcessCrafting(unittest.TestCase):
     def test_timer_mega_drift(self):
         # Patch the clock.
         clock = Clock()
-        self.tile.burning.clock = clock
+        self.factory.ticker.clock = clock
+        self.factory.ticker.start()
 
         # we have more wood than we need and we can process 2 blocks
         # but we have space only for one
@@ -0,0 +1,312 @@
+from itertools import count
+from time import time
+
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+
+TPS = 20
+"""
+The number of ticks per second. Notchian servers tick at 20 Hz.
+"""
+
+# Phases of a tick. Systems are run in this order within each tick.
+(PHASE_WORLD, PHASE_AUTOMATONS, PHASE_ENTITIES, PHASE_TILES,
+    PHASE_NETWORK) = range(5)
+
+class TickedSystem(object):
+    """
+    A callable which has been registered with a ``Ticker``.
+
+    Handles are returned from ``Ticker.add()``, and quack a bit like a
+    ``LoopingCall``; they have a ``running`` attribute and a ``stop()``
+    method.
+    """
+
+    running = True
+
+    def __init__(self, ticker, f, interval, name, order, with_count, serial):
+        self.ticker = ticker
+        self.f = f
+        self.interval = interval
+        self.name = name
+        self.order = order
+        self.with_count = with_count
+        self.serial = serial
+
+        self.last = ticker.tick
+
+    def __repr__(self):
+        return "TickedSystem(%s, interval=%d)" % (self.name, self.interval)
+
+    __str__ = __repr__
+
+    def due(self, tick):
+        """
+        Get the number of this system's intervals which have elapsed by the
+        given tick.
+        """
+
+        return (tick - self.last) // self.interval
+
+    def stop(self):
+        """
+        Stop running this system.
+        """
+
+        if self.running:
+            self.running = False
+            self.ticker.remove(self)
+
+class Ticker(object):
+    """
+    A single scheduler for all of a world's periodic work.
+
+    Systems are registered with ``add()`` and are run in a fixed order, each
+    on its own interval, measured in ticks. Each tick has a time budget; once
+    the budget is spent, any systems which are still due are deferred to the
+    next tick, where they are run first.
+
+    If the reactor falls behind and whole ticks are missed, the missed ticks
+    are counted, and systems are told how many of their intervals have passed
+    when they are next run, so that they may catch up.
+
+    :ivar int tick: the number of ticks which have elapsed since starting
+    :ivar float last_duration: the wall time, in seconds, spent in the last
+        tick
+    :ivar float average_duration: a moving average of tick durations
+    :ivar float max_duration: the longest tick seen so far
+    :ivar int missed: the total number of ticks which were skipped
+    :ivar int overruns: the number of ticks which ran out of budget
+    :ivar int deferrals: the number of times a system was deferred
+    """
+
+    clock = reactor
+    """
+    The clock driving this ticker. Replaceable for testing, just like on a
+    ``LoopingCall``.
+    """
+
+    timer = staticmethod(time)
+    """
+    The function used to measure how long systems take to run.
+    """
+
+    tick = 0
+    start_time = None
+
+    last_duration = 0.0
+    average_duration = 0.0
+    max_duration = 0.0
+
+    missed = 0
+    overruns = 0
+    deferrals = 0
+
+    profiler = None
+    """
+    An optional ``Profiler`` which will be told how long each system takes.
+    """
+
+    def __init__(self, budget=0.04):
+        """
+        :param float budget: seconds of work allowed per tick
+        """
+
+        self.budget = budget
+
+        self.systems = []
+        self._deferred = []
+        self._serial = count()
+
+        self.loop = None
+
+    @property
+    def running(self):
+        return self.loop is not None and self.loop.running
+
+    def start(self):
+        """
+        Start ticking.
+        """
+
+        if self.running:
+            return
+
+        self.start_time = self.clock.seconds()
+        self.tick = 0
+        for system in self.systems:
+            system.last = 0
+
+        self.loop = LoopingCall(self.advance)
+        self.loop.clock = self.clock
+        self.loop.start(1.0 / TPS, now=False)
+
+    def stop(self):
+        """
+        Stop ticking.
+
+        Registered systems stay registered, and will resume when the ticker
+        is started again.
+        """
+
+        if self.running:
+            self.loop.stop()
+
+    def add(self, f, interval=1, name=None, order=0, with_count=False,
+            now=False):
+        """
+        Register a system to be run periodically.
+
+        Systems are run in ascending ``order``; systems with equal order are
+        run in the order in which they were added.
+
+        :param callable f: the system; if ``with_count`` is set, it will be
+            called with the number of intervals which have elapsed since it
+            last ran, which is usually one, but will be more after lag
+        :param int interval: how many ticks to wait between runs
+        :param str name: a name for logging and statistics
+        :param int order: the position of this system within a tick
+        :param bool now: whether to run the system once immediately, like
+            ``LoopingCall.start()`` does
+        :returns: a ``TickedSystem`` handle, which can be stopped
+        """
+
+        if interval < 1:
+            raise ValueError("Interval %r is less than one tick" % interval)
+
+        if name is None:
+            name = getattr(f, "__name__", repr(f))
+
+        system = TickedSystem(self, f, int(interval), name, order, with_count,
+            next(self._serial))
+        self.systems.append(system)
+        self.systems.sort(key=lambda s: (s.order, s.serial))
+
+        if now:
+            self.run_system(system, 0)
+
+        return system
+
+    def add_seconds(self, f, seconds, **kwargs):
+        """
+        Register a system with its interval given in seconds.
+
+        The interval is rounded to the nearest whole tick.
+        """
+
+        interval = max(1, int(round(seconds * TPS)))
+        return self.add(f, interval, **kwargs)
+
+    def remove(self, system):
+        """
+        Unregister a system.
+
+        This is safe to call from inside a running system.
+        """
+
+        system.running = False
+
+        if system in self.systems:
+            self.systems.remove(system)
+        if system in self._deferred:
+            self._deferred.remove(system)
+
+    def current_tick(self):
+        """
+        Work out which tick it should be, according to the clock.
+        """
+
+        if self.start_time is None:
+            return self.tick
+
+        elapsed = self.clock.seconds() - self.start_time
+        # The epsilon guards against float error turning, say, 1.5 seconds
+        # into 29.999... ticks.
+        return int(elapsed * TPS + 1e-6)
+
+    def advance(self):
+        """
+        Run a single tick.
+
+        This is called by the ticker's loop, but may be called by hand to
+        force a tick.
+        """
+
+        tick = max(self.current_tick(), self.tick + 1)
+
+        skipped = tick - self.tick - 1
+        if skipped > 0:
+            self.missed += skipped
+            log.msg("Ticker is lagging; skipped %d ticks" % skipped)
+
+        self.tick = tick
+
+        started = self.timer()
+        deadline = started + self.budget
+
+        # Systems deferred from the last tick go first, so that a slow system
+        # early in the order can't starve the rest of them forever.
+        deferred, self._deferred = self._deferred, []
+        ordered = deferred + [s for s in self.systems if s not in deferred]
+
+        ran = False
+        for system in ordered:
+            if not system.running:
+                continue
+
+            due = system.due(tick)
+            if due < 1:
+                continue
+
+            if ran and self.timer() >= deadline:
+                self._deferred.append(system)
+                continue
+
+            self.run_system(system, due)
+            ran = True
+
+        if self._deferred:
+            self.overruns += 1
+            self.deferrals += len(self._deferred)
+
+        duration = self.timer() - started
+        self.last_duration = duration
+        self.average_duration += (duration - self.average_duration) * 0.05
+        self.max_duration = max(self.max_duration, duration)
+
+    def run_system(self, system, due):
+        """
+        Run a system which is due.
+        """
+
+        system.last += due * system.interval
+
+        started = self.timer()
+        try:
+            if system.with_count:
+                system.f(max(due, 1))
+            else:
+                system.f()
+        except Exception:
+            log.err(None, "Error in ticked system %s" % system.name)
+
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.record("tick", system.name,
+                self.timer() - started)
+
+    def stats(self):
+        """
+        Get a dictionary of statistics describing this ticker's health.
+        """
+
+        return {
+            "tick": self.tick,
+            "systems": len(self.systems),
+            "last_duration": self.last_duration,
+            "average_duration": self.average_duration,
+            "max_duration": self.max_duration,
+            "missed": self.missed,
+            "overruns": self.overruns,
+            "deferrals": self.deferrals,
+        }
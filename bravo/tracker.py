@@ -0,0 +1,226 @@
+from collections import defaultdict
+
+from bravo.beta.packets import make_packet
+
+class EntityTracker(object):
+    """
+    Keeps track of which entities each player can see.
+
+    Players are only told about entities which are within range of them, and
+    in chunks which they have loaded. Ranges are measured in blocks and
+    depend on the kind of entity; far-off pickups aren't worth sending, but
+    paintings and other players are.
+
+    Entities are spawned on a player's client when they come into range and
+    destroyed when they leave it. Anything else about an entity, like its
+    movement, only needs to go to its trackers, the players who can see it.
+
+    :ivar dict visible: the IDs of the entities which each player can see
+    :ivar dict trackers: the players which can see each entity
+    """
+
+    ranges = {
+        "Item": 64,
+        "Painting": 160,
+        "Player": 128,
+    }
+    """
+    Tracking ranges, in blocks, for particular kinds of entity.
+    """
+
+    default_range = 80
+    """
+    The tracking range, in blocks, for any other kind of entity.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+
+        config = factory.config
+        self.default_range = config.getintdefault(factory.config_name,
+            "tracking_range", self.default_range)
+        self.ranges = dict(self.ranges)
+        for name in self.ranges:
+            option = "tracking_range_%s" % name.lower()
+            self.ranges[name] = config.getintdefault(factory.config_name,
+                option, self.ranges[name])
+
+        self.visible = defaultdict(set)
+        self.trackers = defaultdict(set)
+
+    def range_for(self, entity):
+        """
+        Get the tracking range of an entity, in pixels.
+        """
+
+        return self.ranges.get(entity.name, self.default_range) * 32
+
+    def can_see(self, viewer, entity):
+        """
+        Whether a player should be able to see an entity.
+        """
+
+        if viewer.player is entity:
+            return False
+
+        x, chaff, z = entity.location.pos
+        if (x // 512, z // 512) not in viewer.chunks:
+            return False
+
+        return (viewer.location.pos.distance(entity.location.pos)
+            <= self.range_for(entity))
+
+    def candidates(self, viewer):
+        """
+        Find the entities which might be within range of a player.
+        """
+
+        reach = max([self.default_range] + self.ranges.values()) // 16 + 1
+        x, chaff, z = viewer.location.pos
+        x //= 512
+        z //= 512
+
+        for i in xrange(x - reach, x + reach + 1):
+            for j in xrange(z - reach, z + reach + 1):
+                chunk = viewer.chunks.get((i, j))
+                if chunk is not None:
+                    for entity in chunk.entities:
+                        yield entity
+
+        for protocol in self.factory.protocols.itervalues():
+            if protocol.player is not None:
+                yield protocol.player
+
+        if self.factory.shard:
+            for player in self.factory.shard.remote.itervalues():
+                yield player
+
+    def spawn_packet(self, entity):
+        """
+        Make the packets which introduce an entity to a client.
+        """
+
+        packet = entity.save_to_packet()
+        if entity.name == "Player":
+            packet += entity.save_equipment_to_packet()
+        return packet + make_packet("create", eid=entity.eid)
+
+    def show(self, viewer, entities):
+        """
+        Spawn some entities on a player's client.
+        """
+
+        if not entities:
+            return
+
+        visible = self.visible[viewer]
+        eids = []
+        for entity in entities:
+            visible.add(entity.eid)
+            self.trackers[entity.eid].add(viewer)
+            eids.append(entity.eid)
+            viewer.transport.write(self.spawn_packet(entity))
+
+        # The spawn packets are absolute, so movement for these entities
+        # starts afresh.
+        self.factory.movement.forget(viewer, eids)
+
+    def hide(self, viewer, eids):
+        """
+        Destroy some entities on a player's client, if it can see them.
+        """
+
+        visible = self.visible.get(viewer)
+        if not visible:
+            return
+
+        eids = [eid for eid in eids if eid in visible]
+        if not eids:
+            return
+
+        for eid in eids:
+            visible.discard(eid)
+            trackers = self.trackers.get(eid)
+            if trackers is not None:
+                trackers.discard(viewer)
+                if not trackers:
+                    del self.trackers[eid]
+
+        viewer.transport.write(make_packet("destroy", count=len(eids),
+            eid=eids))
+        self.factory.movement.forget(viewer, eids)
+
+    def update_viewer(self, viewer):
+        """
+        Work out which entities a player can see, spawning and destroying
+        entities on its client as they come into and leave range.
+        """
+
+        seen = set()
+        entering = []
+        visible = self.visible.get(viewer, ())
+
+        for entity in self.candidates(viewer):
+            if entity.eid in seen or not self.can_see(viewer, entity):
+                continue
+            seen.add(entity.eid)
+            if entity.eid not in visible:
+                entering.append(entity)
+
+        self.hide(viewer, [eid for eid in visible if eid not in seen])
+        self.show(viewer, entering)
+
+    def update(self):
+        """
+        Update what every player can see.
+        """
+
+        for viewer in self.factory.protocols.values():
+            if viewer.player is not None:
+                self.update_viewer(viewer)
+
+    def spawn(self, entity):
+        """
+        Spawn a new entity on the clients of everybody who can see it.
+        """
+
+        for viewer in self.factory.protocols.values():
+            if (viewer.player is not None
+                and entity.eid not in self.visible[viewer]
+                and self.can_see(viewer, entity)):
+                self.show(viewer, [entity])
+
+    def despawn(self, entity):
+        """
+        Destroy an entity on the clients of everybody who can see it.
+        """
+
+        for viewer in list(self.trackers.get(entity.eid, ())):
+            self.hide(viewer, [entity.eid])
+
+    def broadcast(self, eid, packet):
+        """
+        Send a packet to every player which can see an entity.
+        """
+
+        for viewer in self.trackers.get(eid, ()):
+            viewer.transport.write(packet)
+
+    def viewers(self, eid):
+        """
+        Get the players which can see an entity.
+        """
+
+        return self.trackers.get(eid, ())
+
+    def forget_viewer(self, viewer):
+        """
+        Forget about a player which has gone away.
+        """
+
+        for eid in self.visible.pop(viewer, ()):
+            trackers = self.trackers.get(eid)
+            if trackers is not None:
+                trackers.discard(viewer)
+                if not trackers:
+                    del self.trackers[eid]
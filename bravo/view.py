@@ -0,0 +1,102 @@
+_offsets = {}
+_deltas = {}
+
+def ring_offsets(radius):
+    """
+    Get the offsets of every chunk within a radius, nearest first.
+
+    Offsets are cached, since there are only a handful of view distances.
+    """
+
+    if radius not in _offsets:
+        offsets = [(i, j)
+            for i in range(-radius, radius + 1)
+            for j in range(-radius, radius + 1)
+            if i ** 2 + j ** 2 <= radius ** 2]
+        offsets.sort(key=lambda t: t[0] ** 2 + t[1] ** 2)
+        _offsets[radius] = offsets
+
+    return _offsets[radius]
+
+def ring_delta(old_radius, radius, dx, dz):
+    """
+    Work out which chunks come into view, and which go out of view, when a
+    view moves by the given offset or changes its radius.
+
+    Deltas for single steps, which are by far the most common, are cached.
+
+    :returns: a tuple of the added offsets, relative to the new center and
+        nearest first, and the removed offsets, relative to the old center
+    """
+
+    key = old_radius, radius, dx, dz
+    if key in _deltas:
+        return _deltas[key]
+
+    old = old_radius ** 2
+    new = radius ** 2
+
+    added = [(i, j) for i, j in ring_offsets(radius)
+        if (i + dx) ** 2 + (j + dz) ** 2 > old]
+    removed = [(i, j) for i, j in ring_offsets(old_radius)
+        if (i - dx) ** 2 + (j - dz) ** 2 > new]
+
+    if abs(dx) <= 1 and abs(dz) <= 1:
+        _deltas[key] = added, removed
+
+    return added, removed
+
+class View(object):
+    """
+    The circle of chunks which a player can see.
+
+    The view only changes when its center moves to another chunk or its
+    radius changes, and only the chunks on the edges of the circle are
+    examined when that happens.
+    """
+
+    center = None
+    radius = None
+
+    def __contains__(self, coords):
+        if self.center is None:
+            return False
+
+        x, z = coords
+        cx, cz = self.center
+        return (x - cx) ** 2 + (z - cz) ** 2 <= self.radius ** 2
+
+    def __iter__(self):
+        if self.center is None:
+            return iter([])
+
+        x, z = self.center
+        return ((x + i, z + j) for i, j in ring_offsets(self.radius))
+
+    def move(self, x, z, radius):
+        """
+        Move the view.
+
+        :param int x: the X coordinate of the new center chunk
+        :param int z: the Z coordinate of the new center chunk
+        :param int radius: the new radius, in chunks
+        :returns: a tuple of lists of the chunk coordinates which came into
+            view, nearest first, and the chunk coordinates which went out of
+            view, or None if the view didn't change
+        """
+
+        if (x, z) == self.center and radius == self.radius:
+            return None
+
+        old_center, old_radius = self.center, self.radius
+        self.center = x, z
+        self.radius = radius
+
+        if old_center is None:
+            return list(self), []
+
+        ox, oz = old_center
+        added, removed = ring_delta(old_radius, radius, x - ox, z - oz)
+
+        return ([(x + i, z + j) for i, j in added],
+            [(ox + i, oz + j) for i, j in removed])
@@ -1,4 +1,4 @@
-from bravo.beta.packets import make_packet
+from bravo.beta.packets import make_static_packet
 
 class WeatherVane(object):
     """
@@ -27,8 +27,10 @@ class WeatherVane(object):
         # XXX this probably should use the factory's mode rather than
         # hardcoding creative mode. Probably.
         if self.weather == "rainy":
-            return make_packet("state", state="start_rain", mode="creative")
+            return make_static_packet("state", state="start_rain",
+                mode="creative")
         elif self.weather == "sunny":
-            return make_packet("state", state="stop_rain", mode="creative")
+            return make_static_packet("state", state="stop_rain",
+                mode="creative")
         else:
             return ""
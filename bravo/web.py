@@ -6,6 +6,7 @@ from bravo import version
 from bravo.beta.factory import BravoFactory
 from bravo.ibravo import IWorldResource
 from bravo.plugin import retrieve_plugins
+from bravo.profiler import format_duration
 
 root_template = """
 <html xmlns:t="http://twistedmatrix.com/ns/twisted.web.template/0.1">
@@ -29,6 +30,7 @@ world_template = """
 <h1 t:render="title" />
 <div t:render="user" />
 <div t:render="status" />
+<div t:render="profile" />
 <div t:render="plugin" />
 </body>
 </html>
@@ -101,9 +103,40 @@ class BravoWorldElement(Element):
                 len(world.permanent_cache)))
         else:
             l.append(tags.li("Permanent cache: disabled"))
+        for reason, count in sorted(world.resident.iteritems()):
+            l.append(tags.li("Chunks kept (%s): %d" % (reason, count)))
+        l.append(tags.li("Chunks unloaded: %d" % world.unloaded))
         status = tags.ul(*l)
         return tag(tags.h2("Status"), status)
 
+    @renderer
+    def profile(self, request, tag):
+        stats = self.factory.ticker.stats()
+        l = []
+        l.append(tags.li("Tick: %d" % stats["tick"]))
+        l.append(tags.li("Last tick: %s" %
+            format_duration(stats["last_duration"])))
+        l.append(tags.li("Average tick: %s" %
+            format_duration(stats["average_duration"])))
+        l.append(tags.li("Longest tick: %s" %
+            format_duration(stats["max_duration"])))
+        l.append(tags.li("Missed ticks: %d" % stats["missed"]))
+        l.append(tags.li("Ticks over budget: %d" % stats["overruns"]))
+        ticker = tags.ul(*l)
+
+        header = tags.tr(*[tags.th(s) for s in ("Category", "Plugin",
+            "Calls", "Total", "Mean", "p50", "p99", "Max")])
+        rows = [header]
+        for (category, name), h in self.factory.profiler.stats():
+            cells = (category, name, str(h.count), format_duration(h.total),
+                format_duration(h.mean), format_duration(h.percentile(50)),
+                format_duration(h.percentile(99)), format_duration(h.max))
+            rows.append(tags.tr(*[tags.td(cell) for cell in cells]))
+        plugins = tags.table(*rows)
+
+        return tag(tags.h2("Ticker"), ticker, tags.h2("Plugin Profile"),
+            plugins)
+
     @renderer
     def plugin(self, request, tag):
         plugins = []
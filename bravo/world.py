@@ -1,23 +1,25 @@
 from array import array
+from collections import defaultdict, deque
 from functools import wraps
 from itertools import product
 import random
 import sys
-import weakref
 
 from twisted.internet import reactor
 from twisted.internet.defer import (inlineCallbacks, maybeDeferred,
                                     returnValue, succeed)
-from twisted.internet.task import LoopingCall
 from twisted.python import log
 
 from bravo.beta.structures import Level
 from bravo.chunk import Chunk, CHUNK_HEIGHT
-from bravo.entity import Player, Furnace
+from bravo.entity import Furnace, Mob, Player
 from bravo.errors import (ChunkNotLoaded, SerializerReadException,
                           SerializerWriteException)
 from bravo.ibravo import ISerializer
 from bravo.plugin import retrieve_named_plugins
+from bravo.terrain.context import GenerationContext
+from bravo.terrain.decoration import DecorationQueue
+from bravo.ticker import PHASE_WORLD, Ticker
 from bravo.utilities.coords import split_coords
 from bravo.utilities.temporal import PendingEvent
 from bravo.mobmanager import MobManager
@@ -127,6 +129,30 @@ class World(object):
     The initial level data.
     """
 
+    clock = reactor
+    """
+    The clock used to time how long chunks have gone unneeded.
+    """
+
+    season_share = 0.25
+    """
+    The share of each tick's budget which may be spent bringing loaded chunks
+    into a new season.
+    """
+
+    ticker = None
+    """
+    The ``Ticker`` which runs the world's periodic work.
+
+    Worlds owned by a factory share the factory's ticker. Worlds without one
+    make and run their own when they are started.
+    """
+
+    unloaded = 0
+    """
+    The number of chunks which have been unloaded so far.
+    """
+
     def __init__(self, config, name):
         """
         :Parameters:
@@ -137,11 +163,25 @@ class World(object):
         self.config = config
         self.config_name = "world %s" % name
 
-        self.chunk_cache = weakref.WeakValueDictionary()
+        self.chunk_cache = dict()
         self.dirty_chunk_cache = dict()
 
         self._pending_chunks = dict()
 
+        # How long, in seconds, a chunk may go unneeded before it is
+        # unloaded.
+        self.unload_grace = config.getintdefault(self.config_name,
+            "unload_grace", 30)
+
+        self._unseasoned = deque()
+
+        self.pins = defaultdict(int)
+        self.resident = dict()
+        self._last_needed = dict()
+
+        # Writes waiting for chunks which haven't been loaded yet.
+        self.decorations = DecorationQueue()
+
     def connect(self):
         """
         Connect to the world.
@@ -179,6 +219,9 @@ class World(object):
 
         self.level = self.level._replace(seed=seed)
 
+        self.decorations.load(
+            self.serializer.load_plugin_data(self.decorations_name()))
+
         # Check if we should offload chunk requests to ampoule.
         if self.config.getbooleandefault("bravo", "ampoule", False):
             try:
@@ -207,11 +250,27 @@ class World(object):
             log.msg("Had issues loading level data, continuing anyway...")
 
             # And now save our level.
-            if self.saving:
+            if self.saving and self.owns_level():
                 self.serializer.save_level(self.level)
 
-        self.chunk_management_loop = LoopingCall(self.sort_chunks)
-        self.chunk_management_loop.start(1)
+        self._own_ticker = self.ticker is None
+        if self._own_ticker:
+            self.ticker = Ticker()
+            self.ticker.clock = self.clock
+
+        self.tick_systems = [
+            self.ticker.add_seconds(self.sort_chunks, 1, name="chunk-sorting",
+                order=PHASE_WORLD, now=True),
+            self.ticker.add_seconds(self.unload_chunks, 1,
+                name="chunk-unloading", order=PHASE_WORLD),
+            self.ticker.add(self.season_chunks, name="seasons",
+                order=PHASE_WORLD),
+            self.ticker.add_seconds(self.send_decorations, 1,
+                name="decoration-sending", order=PHASE_WORLD),
+        ]
+
+        if self._own_ticker:
+            self.ticker.start()
 
         self.mob_manager = MobManager() # XXX Put this in init or here?
         self.mob_manager.world = self # XXX  Put this in the managers constructor?
@@ -227,7 +286,13 @@ class World(object):
         forget to write it back before calling this method!
         """
 
-        self.chunk_management_loop.stop()
+        for system in self.tick_systems:
+            system.stop()
+        self.tick_systems = []
+
+        if self._own_ticker:
+            self.ticker.stop()
+            self.ticker = None
 
         # Flush all dirty chunks to disk.
         for chunk in self.dirty_chunk_cache.itervalues():
@@ -236,9 +301,13 @@ class World(object):
         # Evict all chunks.
         self.chunk_cache.clear()
         self.dirty_chunk_cache.clear()
+        self._last_needed.clear()
 
         # Save the level data.
-        self.serializer.save_level(self.level)
+        if self.owns_level():
+            self.serializer.save_level(self.level)
+
+        self.save_decorations()
 
     def enable_cache(self, size):
         """
@@ -294,6 +363,9 @@ class World(object):
             else:
                 self.chunk_cache[coords] = chunk
 
+        if self.decorations.dirty:
+            self.save_decorations()
+
     def save_off(self):
         """
         Disable saving to disk.
@@ -302,11 +374,6 @@ class World(object):
         interfering, for backing up the world.
         """
 
-        if not self.saving:
-            return
-
-        d = dict(self.chunk_cache)
-        self.chunk_cache = d
         self.saving = False
 
     def save_on(self):
@@ -314,12 +381,193 @@ class World(object):
         Enable saving to disk.
         """
 
-        if self.saving:
+        self.saving = True
+
+    def pin_chunk(self, x, z):
+        """
+        Keep a chunk from being unloaded, even if nobody is looking at it.
+
+        Pins are counted; each call must eventually be matched by a call to
+        ``unpin_chunk()``.
+        """
+
+        self.pins[x, z] += 1
+
+    def unpin_chunk(self, x, z):
+        """
+        Release a pin on a chunk.
+        """
+
+        if (x, z) in self.pins:
+            self.pins[x, z] -= 1
+            if self.pins[x, z] <= 0:
+                del self.pins[x, z]
+
+    def retention_reason(self, chunk, pinned):
+        """
+        Work out why a chunk needs to stay loaded.
+
+        :param set pinned: coordinates of all currently pinned chunks
+        :returns: the reason, as a string, or None if the chunk isn't needed
+        """
+
+        if self.permanent_cache and chunk in self.permanent_cache:
+            return "permanent"
+        elif self.factory and self.factory.subscribers_for_chunk(chunk.x,
+                                                                 chunk.z):
+            return "viewed"
+        elif (chunk.x, chunk.z) in pinned:
+            return "pinned"
+        elif chunk.dirty and not self.saving:
+            return "unsaved"
+
+        return None
+
+    def unload_chunks(self):
+        """
+        Unload chunks which have not been needed for a while.
+
+        Chunks are needed while they are in the permanent cache, viewed by
+        players, pinned by plugins or by automatons with pending work, or
+        holding changes which cannot be saved yet. Once a chunk has gone
+        unneeded for longer than the grace period, it is unloaded.
+
+        The number of chunks kept for each reason is recorded in
+        ``resident``, with chunks inside their grace period counted as
+        "grace".
+
+        :returns: the number of chunks unloaded
+        """
+
+        now = self.clock.seconds()
+
+        pinned = set(self.pins)
+        if self.factory:
+            pinned.update(self.factory.automaton_pins())
+
+        resident = dict.fromkeys(("permanent", "viewed", "pinned", "unsaved",
+            "grace"), 0)
+        unloaded = 0
+
+        all_chunks = dict(self.chunk_cache)
+        all_chunks.update(self.dirty_chunk_cache)
+        for coords, chunk in all_chunks.iteritems():
+            reason = self.retention_reason(chunk, pinned)
+
+            if reason is None:
+                since = self._last_needed.setdefault(coords, now)
+                if now - since < self.unload_grace:
+                    reason = "grace"
+                elif not self.unload_chunk(chunk):
+                    reason = "unsaved"
+            else:
+                self._last_needed[coords] = now
+
+            if reason is None:
+                unloaded += 1
+            else:
+                resident[reason] += 1
+
+        self.resident = resident
+        self.unloaded += unloaded
+
+        return unloaded
+
+    def change_season(self, season):
+        """
+        Switch to another season.
+
+        Chunks loaded from now on are brought into the new season as they are
+        loaded. Chunks which are already loaded are brought into it a few
+        every tick by ``season_chunks()``, rather than all at once.
+
+        :param season: the new `ISeason`, or None
+        """
+
+        if season is self.season:
             return
 
-        d = weakref.WeakValueDictionary(self.chunk_cache)
-        self.chunk_cache = d
-        self.saving = True
+        self.season = season
+
+        self._unseasoned = deque(self.chunk_cache)
+        self._unseasoned.extend(self.dirty_chunk_cache)
+
+    def season_chunks(self):
+        """
+        Bring loaded chunks into the current season, and send them to any
+        players who have them.
+
+        Chunks are changed until this tick's share of the ticker's budget is
+        spent, but always at least one, so that the work gets done even on
+        a busy server.
+
+        :returns: the number of chunks which were changed
+        """
+
+        timer = self.ticker.timer
+        deadline = timer() + self.ticker.budget * self.season_share
+        changed = 0
+
+        while self._unseasoned:
+            coords = self._unseasoned.popleft()
+            chunk = self.chunk_cache.get(coords)
+            if chunk is None:
+                chunk = self.dirty_chunk_cache.get(coords)
+
+            if chunk is not None and self.apply_season(chunk):
+                changed += 1
+                if self.factory:
+                    self.factory.flush_chunk(chunk)
+
+            if timer() >= deadline:
+                break
+
+        return changed
+
+    def apply_season(self, chunk):
+        """
+        Bring a chunk into the current season, unless it's already in it.
+
+        :returns: whether the chunk was changed
+        """
+
+        if self.season is None or chunk.season == self.season.name:
+            return False
+
+        self.season.transform(chunk)
+        chunk.season = self.season.name
+        chunk.dirty = True
+        return True
+
+    def unload_chunk(self, chunk):
+        """
+        Save a chunk, stop everything running inside it, and release it.
+
+        Mobs stop being updated and furnaces stop burning; both pick up where
+        they left off when the chunk is loaded again.
+
+        :returns: whether the chunk was unloaded; chunks which could not be
+            saved are kept
+        """
+
+        self.save_chunk(chunk)
+        if chunk.dirty:
+            return False
+
+        for entity in chunk.entities:
+            if isinstance(entity, Mob):
+                self.mob_manager.stop_mob(entity)
+
+        for tile in chunk.tiles.itervalues():
+            if type(tile) == Furnace:
+                tile.stop_burning()
+
+        coords = chunk.x, chunk.z
+        self.chunk_cache.pop(coords, None)
+        self.dirty_chunk_cache.pop(coords, None)
+        self._last_needed.pop(coords, None)
+
+        return True
 
     def postprocess_chunk(self, chunk):
         """
@@ -329,9 +577,15 @@ class World(object):
         not be harmful to do so.
         """
 
-        # Apply the current season to the chunk.
-        if self.season:
-            self.season.transform(chunk)
+        # Finish any structures which were waiting for this chunk. Writes
+        # to other shards' chunks are left for their owners, since the
+        # damage from them is about to be cleared, and the chunk won't be
+        # saved here.
+        if self.owns_chunk(chunk):
+            self.decorations.apply(chunk)
+
+        # Apply the current season to the chunk, if it isn't in it already.
+        self.apply_season(chunk)
 
         # Since this chunk hasn't been given to any player yet, there's no
         # conceivable way that any meaningful damage has been accumulated;
@@ -344,14 +598,10 @@ class World(object):
         if not self.factory:
             return chunk
 
-        # XXX slightly icky, print statements are bad
         # Register the chunk's entities with our parent factory.
         for entity in chunk.entities:
-            if hasattr(entity,'loop'):
-                print "Started mob!"
+            if isinstance(entity, Mob):
                 self.mob_manager.start_mob(entity)
-            else:
-                print "I have no loop"
             self.factory.register_entity(entity)
 
         # XXX why is this for furnaces only? :T
@@ -392,20 +642,100 @@ class World(object):
             chunk = Chunk(x, z)
 
         if chunk.populated:
-            self.chunk_cache[x, z] = chunk
-            self.postprocess_chunk(chunk)
-            if self.factory:
-                self.factory.scan_chunk(chunk)
-            returnValue(chunk)
+            returnValue(self.adopt_chunk(chunk))
+
+        retval = yield self.generate_chunk(chunk)
+        returnValue(retval)
+
+    @inlineCallbacks
+    def request_chunks(self, coords):
+        """
+        Request several ``Chunk``s to be delivered later.
+
+        Chunks which aren't already loaded are fetched from the serializer in
+        a single batch. Any of them which then need generating are generated
+        one at a time, just as with ``request_chunk()``.
+
+        :param coords: iterable of (x, z) chunk coordinates
+        :returns: ``Deferred`` that will be called with a dict of coordinates
+                  to ``Chunk``s
+        """
+
+        chunks = {}
+        pending = {}
+        wanted = []
+
+        for key in set(coords):
+            if key in self.chunk_cache:
+                chunks[key] = self.chunk_cache[key]
+            elif key in self.dirty_chunk_cache:
+                chunks[key] = self.dirty_chunk_cache[key]
+            elif key in self._pending_chunks:
+                pending[key] = self._pending_chunks[key].deferred()
+            else:
+                wanted.append(key)
+
+        if wanted:
+            loaded = yield maybeDeferred(self.serializer.load_chunks, wanted)
+        else:
+            loaded = {}
+
+        for key in wanted:
+            # Somebody else might have brought this chunk in while we were
+            # waiting on the serializer.
+            if key in self.chunk_cache:
+                chunks[key] = self.chunk_cache[key]
+            elif key in self.dirty_chunk_cache:
+                chunks[key] = self.dirty_chunk_cache[key]
+            elif key in self._pending_chunks:
+                pending[key] = self._pending_chunks[key].deferred()
+            elif key in loaded and loaded[key].populated:
+                chunks[key] = self.adopt_chunk(loaded[key])
+            else:
+                chunk = loaded.get(key, None) or Chunk(*key)
+                pending[key] = self.generate_chunk(chunk)
+
+        for key, d in pending.iteritems():
+            chunks[key] = yield d
+
+        returnValue(chunks)
+
+    def adopt_chunk(self, chunk):
+        """
+        Bring a populated chunk, fresh from the serializer, into the world.
+
+        :returns: the chunk
+        """
+
+        key = chunk.x, chunk.z
+
+        self.chunk_cache[key] = chunk
+        self._last_needed[key] = self.clock.seconds()
+        self.postprocess_chunk(chunk)
+        if self.factory:
+            self.factory.scan_chunk(chunk)
+
+        return chunk
+
+    def generate_chunk(self, chunk):
+        """
+        Populate a chunk and bring it into the world.
+
+        :returns: ``Deferred`` that will be called with the chunk
+        """
+
+        x, z = chunk.x, chunk.z
 
         if self.async:
             from ampoule import deferToAMPProcess
             from bravo.remote import MakeChunk
 
             generators = [plugin.name for plugin in self.pipeline]
+            lattices = [{"name": plugin.name, "lattice": list(plugin.lattice)}
+                for plugin in self.pipeline if hasattr(plugin, "lattice")]
 
             d = deferToAMPProcess(MakeChunk, x=x, z=z, seed=self.level.seed,
-                                  generators=generators)
+                                  generators=generators, lattices=lattices)
 
             # Get chunk data into our chunk object.
             def fill_chunk(kwargs):
@@ -419,14 +749,21 @@ class World(object):
                 chunk.skylight.fromstring(kwargs["skylight"])
                 chunk.blocklight = array("B")
                 chunk.blocklight.fromstring(kwargs["blocklight"])
+
+                decorations = DecorationQueue()
+                decorations.load(kwargs["decorations"])
+                self.queue_decorations(decorations)
+
                 return chunk
             d.addCallback(fill_chunk)
         else:
             # Populate the chunk the slow way. :c
+            context = GenerationContext(chunk, self.level.seed)
             for stage in self.pipeline:
-                stage.populate(chunk, self.level.seed)
+                stage.populate(chunk, self.level.seed, context)
 
             chunk.regenerate()
+            self.queue_decorations(context.decorations)
             d = succeed(chunk)
 
         # Set up our event and generate our return-value Deferred. It has to
@@ -447,6 +784,7 @@ class World(object):
             self.postprocess_chunk(chunk)
 
             self.dirty_chunk_cache[x, z] = chunk
+            self._last_needed[x, z] = self.clock.seconds()
             del self._pending_chunks[x, z]
 
             return chunk
@@ -456,20 +794,135 @@ class World(object):
         d.chainDeferred(pe)
 
         # Because multiple people might be attached to this callback, we're
-        # going to do something magical here. We will yield a forked version
-        # of our Deferred. This means that we will wait right here, for a
-        # long, long time, before actually returning with the chunk, *but*,
-        # when we actually finish, we'll be ready to return the chunk
-        # immediately. Our caller cannot possibly care because they only see a
-        # Deferred either way.
-        retval = yield retval
-        returnValue(retval)
+        # going to do something magical here. We will return a forked version
+        # of our Deferred. This means that our caller will wait for a long,
+        # long time before actually getting the chunk, *but*, when we
+        # actually finish, everybody waiting will get the chunk immediately.
+        return retval
+
+    def decorations_name(self):
+        """
+        The name under which the decoration queue is saved.
+
+        When a world is split between shards, each shard keeps its own.
+        """
+
+        shard = getattr(self.factory, "shard", None)
+        if shard:
+            return "decorations-%d" % shard.index
+        return "decorations"
+
+    def save_decorations(self):
+        if self.saving:
+            self.serializer.save_plugin_data(self.decorations_name(),
+                self.decorations.save())
+
+    def decorate(self, coords, block, metadata=0, replace=None):
+        """
+        Write a block, whether or not its chunk is loaded.
+
+        If the chunk is loaded, the block is written straight away; otherwise,
+        it is queued, and written when the chunk is next loaded or generated.
+        Structures which cross chunk borders should be built with this, so
+        that they don't have to load their neighbors, or be left half-built
+        at the edge of the loaded world. Blocks above or below the world are
+        dropped, so that structures are cut off at the top of the world.
+
+        Blocks in chunks belonging to other shards are always queued, and
+        sent to their owners by ``send_decorations()``.
+
+        :param tuple coords: world coordinates
+        :param int block: block type
+        :param int metadata: block metadata
+        :param replace: blocks which may be overwritten, or None for any
+        """
+
+        x, y, z = coords
+
+        if not 0 <= y < CHUNK_HEIGHT:
+            return
+
+        bigx, smallx, bigz, smallz = split_coords(x, z)
+        chunk = self.chunk_cache.get((bigx, bigz))
+        if chunk is None:
+            chunk = self.dirty_chunk_cache.get((bigx, bigz))
+
+        if chunk is None or not self.owns_chunk(chunk):
+            self.decorations.add(coords, block, metadata, replace)
+            return
+
+        coords = smallx, y, smallz
+        if replace is None or chunk.get_block(coords) in replace:
+            chunk.set_block(coords, block)
+            chunk.set_metadata(coords, metadata)
+
+    def queue_decorations(self, queue):
+        """
+        Take on the writes of another decoration queue.
+
+        Writes for chunks which are already loaded are applied, and sent to
+        any players who have those chunks, straight away. Writes for chunks
+        belonging to other shards are kept for ``send_decorations()``.
+        """
+
+        self.decorations.update(queue)
+
+        for key in queue.pending:
+            chunk = self.chunk_cache.get(key)
+            if chunk is None:
+                chunk = self.dirty_chunk_cache.get(key)
+
+            if chunk is not None and self.owns_chunk(chunk):
+                self.decorations.apply(chunk)
+                if self.factory:
+                    self.factory.flush_chunk(chunk)
+
+    def send_decorations(self):
+        """
+        Send queued writes for chunks belonging to other shards to their
+        owners.
+
+        Only the owner of a chunk saves it, so writes which land in another
+        shard's chunk, such as the far half of a tree grown at a border,
+        would otherwise be lost. Writes which can't be sent yet stay queued,
+        and are saved with the rest.
+        """
+
+        shard = getattr(self.factory, "shard", None)
+        if shard:
+            shard.send_decorations(self.decorations)
+
+    def owns_level(self):
+        """
+        Whether this world is responsible for saving its level data.
+
+        When a world is split between shards, only the first shard saves it.
+        """
+
+        shard = getattr(self.factory, "shard", None)
+        return not (shard and shard.index)
+
+    def owns_chunk(self, chunk):
+        """
+        Whether this world is responsible for saving a chunk.
+
+        When a world is split between shards, each shard only saves the
+        chunks in its own part of the world.
+        """
+
+        shard = getattr(self.factory, "shard", None)
+        return not (shard and not shard.owns(chunk.x, chunk.z))
 
     def save_chunk(self, chunk):
 
         if not chunk.dirty or not self.saving:
             return
 
+        if not self.owns_chunk(chunk):
+            # The owning shard has been sent any changes, and will save them.
+            chunk.dirty = False
+            return
+
         d = maybeDeferred(self.serializer.save_chunk, chunk)
 
         @d.addCallback
@@ -5,8 +5,13 @@ from __future__ import division
 import datetime
 import glob
 import imp
+import json
 import math
+import optparse
+import os
 import os.path
+import platform
+import sys
 import urllib
 import urllib2
 import subprocess
@@ -40,16 +45,40 @@ def average(l):
 def stddev(l):
     return math.sqrt(sum((i - average(l))**2 for i in l))
 
-def main():
-    for bench in glob.glob("benchmarks/*.py"):
+def higher_is_better(unit):
+    """
+    Whether a bigger result is an improvement.
+
+    Benchmarks may return a unit along with their results. Rates of work, in
+    units per second, are better when they go up; everything else, and
+    anything without a unit, is a cost, and is better when it goes down.
+    """
+
+    return bool(unit) and unit.endswith("/s")
+
+def run(modules):
+    """
+    Run the benchmarks in some benchmark modules, or all of them.
+
+    :returns: dict of results by benchmark name
+    """
+
+    results = {}
+
+    for bench in sorted(glob.glob("benchmarks/*.py")):
         name = os.path.splitext(os.path.basename(bench))[0]
+        if modules and name not in modules:
+            continue
+
         module = imp.load_source("bench", bench)
         benchmarks = module.benchmarks
         print "Running benchmarks in %s..." % name
         for benchmark in benchmarks:
-            name, l = benchmark()
-            print "%s: Average %f, min %f, max %f, stddev %f" % (
-                name, average(l), min(l), max(l), stddev(l))
+            result = benchmark()
+            name, l = result[:2]
+            unit = result[2] if len(result) > 2 else None
+            print "%s: Average %f, min %f, max %f, stddev %f %s" % (
+                name, average(l), min(l), max(l), stddev(l), unit or "")
             d = {
                 "benchmark": name,
                 "result_value": average(l),
@@ -59,5 +88,107 @@ def main():
             }
             d.update(data)
 
+            results[name] = {
+                "unit": unit,
+                "average": average(l),
+                "min": min(l),
+                "max": max(l),
+                "stddev": stddev(l),
+            }
+
+    return results
+
+def compare(baseline, results, threshold, limits):
+    """
+    Compare results against a baseline.
+
+    :param float threshold: how far, in percent, a result may get worse
+        before it counts as a regression
+    :param dict limits: thresholds for particular benchmarks, by name
+    :returns: list of the names of regressed benchmarks
+    """
+
+    regressions = []
+
+    print "%-44s %12s %12s %8s" % ("benchmark", "baseline", "current",
+        "change")
+
+    for name in sorted(set(baseline) | set(results)):
+        if name not in results:
+            print "%-44s %12.3f %12s" % (name, baseline[name]["average"],
+                "missing")
+            continue
+        elif name not in baseline:
+            print "%-44s %12s %12.3f" % (name, "new",
+                results[name]["average"])
+            continue
+
+        before = baseline[name]["average"]
+        after = results[name]["average"]
+        if before:
+            change = (after - before) / before * 100
+        else:
+            change = 0 if not after else float("inf")
+
+        worse = -change if higher_is_better(results[name]["unit"]) else change
+        regressed = worse > limits.get(name, threshold)
+        if regressed:
+            regressions.append(name)
+
+        print "%-44s %12.3f %12.3f %+7.1f%%%s" % (name, before, after, change,
+            "  REGRESSION" if regressed else "")
+
+    return regressions
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options] [module ...]")
+    parser.add_option("-o", "--output", help="Write results to a JSON file",
+                      type="str", default="")
+    parser.add_option("-b", "--baseline",
+                      help="Compare results against a JSON file of results",
+                      type="str", default="")
+    parser.add_option("-t", "--threshold",
+                      help="How far, in percent, results may get worse "
+                      "before they are regressions", type="float",
+                      default=10)
+    parser.add_option("-l", "--limit",
+                      help="Threshold for one benchmark, as NAME=PERCENT; "
+                      "may be given more than once", action="append",
+                      default=[])
+    parser.add_option("-p", "--processes",
+                      help="Number of processes for parallel benchmarks; "
+                      "defaults to one per CPU", type="int", default=0)
+
+    options, modules = parser.parse_args()
+
+    if options.processes:
+        os.environ["BRAVO_BENCH_PROCESSES"] = str(options.processes)
+
+    limits = {}
+    for limit in options.limit:
+        name, percent = limit.rsplit("=", 1)
+        limits[name] = float(percent)
+
+    results = run(modules)
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump({
+                "commitid": description,
+                "executable": "%s %s" % (platform.python_implementation(),
+                    platform.python_version()),
+                "result_date": data["result_date"].isoformat(),
+                "results": results,
+            }, f, indent=4, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare(baseline, results, options.threshold, limits)
+        if regressions:
+            print "%d benchmarks regressed" % len(regressions)
+            sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,586 @@
+#!/usr/bin/env python
+
+from __future__ import division
+
+from optparse import OptionParser
+import json
+import math
+import random
+import sys
+import struct
+import time
+
+usage = """usage: %prog [options] host
+
+Log in a swarm of bots which walk around, dig, build, chat, and open
+windows, and measure how quickly the server responds to them.
+
+Latencies are reported in milliseconds as percentiles. They are measured by
+the bots, from sending a request to seeing its effect; keepalive latencies
+are from receiving the server's keepalive to writing the reply. The server's
+own figures for the bots' pings, from the player list, are reported apart as
+server_ping. Requests which aren't answered in time are counted as lost."""
+
+parser = OptionParser(usage)
+parser.add_option("-p", "--port",
+    dest="port",
+    type="int",
+    default=25565,
+    metavar="PORT",
+    help="Port to use",
+)
+parser.add_option("-n", "--bots",
+    dest="bots",
+    type="int",
+    default=20,
+    metavar="COUNT",
+    help="Number of bots",
+)
+parser.add_option("-r", "--ramp",
+    dest="ramp",
+    type="float",
+    default=5,
+    metavar="RATE",
+    help="Bots to log in per second",
+)
+parser.add_option("-d", "--duration",
+    dest="duration",
+    type="float",
+    default=60,
+    metavar="SECONDS",
+    help="How long to run for, including the ramp",
+)
+parser.add_option("--path",
+    dest="path",
+    type="choice",
+    choices=["square", "line", "circle", "still"],
+    default="square",
+    help="Path for bots to walk: square, line, circle, or still",
+)
+parser.add_option("--path-size",
+    dest="path_size",
+    type="float",
+    default=32,
+    metavar="BLOCKS",
+    help="Size of the walked path",
+)
+parser.add_option("--speed",
+    dest="speed",
+    type="float",
+    default=4.3,
+    metavar="BLOCKS",
+    help="Walking speed, in blocks per second",
+)
+parser.add_option("--dig-rate",
+    dest="dig",
+    type="float",
+    default=0.5,
+    metavar="RATE",
+    help="Digs per second, per bot",
+)
+parser.add_option("--build-rate",
+    dest="build",
+    type="float",
+    default=0.5,
+    metavar="RATE",
+    help="Builds per second, per bot",
+)
+parser.add_option("--chat-rate",
+    dest="chat",
+    type="float",
+    default=0.1,
+    metavar="RATE",
+    help="Chat messages per second, per bot",
+)
+parser.add_option("--inventory-rate",
+    dest="inventory",
+    type="float",
+    default=0.1,
+    metavar="RATE",
+    help="Windows opened per second, per bot",
+)
+parser.add_option("--ack-timeout",
+    dest="timeout",
+    type="float",
+    default=5,
+    metavar="SECONDS",
+    help="How long to wait for a request to be answered",
+)
+parser.add_option("--view",
+    dest="view",
+    type="int",
+    default=8,
+    metavar="CHUNKS",
+    help="The server's view radius, for timing full chunk delivery",
+)
+parser.add_option("-s", "--seed",
+    dest="seed",
+    type="int",
+    default=None,
+    metavar="SEED",
+    help="Random seed, for repeatable runs",
+)
+parser.add_option("-o", "--output",
+    dest="output",
+    default=None,
+    metavar="FILE",
+    help="Write JSON results to this file, instead of standard output",
+)
+options, arguments = parser.parse_args()
+if len(arguments) != 1:
+    parser.error("Need exactly one argument")
+
+from construct import Container
+from twisted.internet import reactor
+from twisted.internet.error import ConnectError
+from twisted.internet.protocol import ClientFactory, Protocol
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+
+from bravo.beta.packets import PacketBuffer, make_packet
+from bravo.beta.protocol import SUPPORTED_PROTOCOL
+from bravo.errors import BufferOverflow
+from bravo.view import ring_offsets
+
+log.startLogging(sys.stderr, setStdout=False)
+
+# Bots think twenty times a second, like the server.
+TICK = 0.05
+
+ACTIONS = ["dig", "build", "chat", "inventory"]
+
+STONE = 1
+WORKBENCH = 58
+
+def percentiles(samples):
+    """
+    Summarize some samples.
+    """
+
+    if not samples:
+        return {"count": 0}
+
+    samples = sorted(samples)
+
+    def rank(p):
+        return samples[max(int(math.ceil(p * len(samples))) - 1, 0)]
+
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": rank(0.5),
+        "p99": rank(0.99),
+        "max": samples[-1],
+    }
+
+def path_for(shape, size, speed):
+    """
+    Make a function which gives a bot's offset from its spawn, in blocks, at
+    a given time.
+    """
+
+    if shape == "still":
+        return lambda t: (0, 0)
+
+    if shape == "circle":
+        radius = size / 2
+        omega = speed / radius
+        return lambda t: (radius * math.cos(omega * t) - radius,
+            radius * math.sin(omega * t))
+
+    if shape == "line":
+        corners = [(0, 0), (size, 0)]
+    else:
+        corners = [(0, 0), (size, 0), (size, size), (0, size)]
+
+    legs = zip(corners, corners[1:] + corners[:1])
+    lap = size * len(legs) / speed
+
+    def f(t):
+        t %= lap
+        leg, along = divmod(t * speed, size)
+        (x1, z1), (x2, z2) = legs[int(leg)]
+        return (x1 + (x2 - x1) * along / size, z1 + (z2 - z1) * along / size)
+
+    return f
+
+class Bot(Protocol):
+    """
+    A scripted player.
+    """
+
+    def __init__(self, swarm, number):
+        self.swarm = swarm
+        self.username = "bot%d" % number
+        self.random = random.Random(swarm.random.random())
+
+        self.buf = PacketBuffer(4 * 1024 * 1024)
+        self.handlers = {
+            0: self.ping,
+            1: self.login,
+            3: self.chat_packet,
+            13: self.location,
+            51: self.chunk,
+            52: self.batch,
+            53: self.block,
+            56: self.bulk_chunk,
+            100: self.window_open,
+            201: self.players,
+            255: self.kicked,
+        }
+
+        # Requests waiting for answers, by kind, keyed by whatever will
+        # identify the answer.
+        self.pending = dict((action, {}) for action in ACTIONS)
+        self.placed = []
+        self.workbench = None
+
+        # The server won't let anything be done in chunks it hasn't sent.
+        self.loaded = set()
+
+        self.spawn = None
+        self.pos = None
+        self.walked = 0
+        self.loop = LoopingCall(self.tick)
+
+    def connectionMade(self):
+        self.connected = time.time()
+        self.swarm.stats["connected"] += 1
+        self.write_packet("handshake", protocol=SUPPORTED_PROTOCOL,
+            username=self.username, host=arguments[0], port=options.port)
+
+    def connectionLost(self, reason):
+        self.swarm.stats["disconnected"] += 1
+        if self.loop.running:
+            self.loop.stop()
+        self.swarm.bots.discard(self)
+
+    def write_packet(self, header, **payload):
+        self.transport.write(make_packet(header, **payload))
+
+    def dataReceived(self, data):
+        self.received = time.time()
+        self.swarm.stats["bytes"] += len(data)
+
+        try:
+            self.buf.feed(data)
+        except BufferOverflow:
+            # An unparseable packet is stuck at the front of the buffer.
+            self.swarm.stats["errors"] += 1
+            self.transport.loseConnection()
+            return
+
+        for header, payload in self.buf.packets():
+            self.swarm.stats["packets"] += 1
+            if header in self.handlers:
+                self.handlers[header](payload)
+
+    # Packets from the server.
+
+    def ping(self, container):
+        self.write_packet("ping", pid=container.pid)
+        self.swarm.samples["keepalive"].append(
+            (time.time() - self.received) * 1000)
+
+    def login(self, container):
+        self.logged_in = time.time()
+        self.eid = container.eid
+        self.chunks = 0
+        self.swarm.stats["logged_in"] += 1
+        self.swarm.samples["login"].append(
+            (self.logged_in - self.connected) * 1000)
+
+    def chat_packet(self, container):
+        for token in self.pending["chat"].keys():
+            if token in container.message:
+                self.answered("chat", token)
+
+    def location(self, container):
+        # The server sends the stance where the feet should be, and the
+        # other way around.
+        pos = container.position
+        self.pos = [pos.x, pos.stance, pos.y, pos.z]
+
+        # Echo the location back, as clients do, to confirm it.
+        self.write_packet("location", position=self.position(),
+            orientation=container.orientation, grounded=container.grounded)
+
+        if self.spawn is None:
+            self.spawn = pos.x, pos.z
+            self.started = time.time()
+            self.setup()
+            self.loop.start(TICK)
+
+    def chunk(self, container):
+        # Empty chunks are unloads.
+        if container.primary:
+            self.loaded.add((container.x, container.z))
+            self.received_chunks(1)
+        else:
+            self.loaded.discard((container.x, container.z))
+
+    def bulk_chunk(self, container):
+        self.loaded.update((metadata.x, metadata.z)
+            for metadata in container.metadata)
+        self.received_chunks(container.count)
+
+    def received_chunks(self, count):
+        now = (time.time() - self.logged_in) * 1000
+        if not self.chunks:
+            self.swarm.samples["first_chunk"].append(now)
+
+        before = self.chunks
+        self.chunks += count
+        self.swarm.stats["chunks"] += count
+
+        if before < self.swarm.view <= self.chunks:
+            self.swarm.samples["full_view"].append(now)
+
+    def block(self, container):
+        self.changed((container.x, container.y, container.z), container.type)
+
+    def batch(self, container):
+        for i in range(container.count):
+            record, = struct.unpack(">I", container.data[i * 4:i * 4 + 4])
+            coords = (container.x * 16 + (record >> 28),
+                record >> 16 & 0xff, container.z * 16 + (record >> 24 & 0xf))
+            self.changed(coords, record >> 4 & 0xfff)
+
+    def changed(self, coords, block):
+        # The server may put a block lower than asked, if it would otherwise
+        # float, so builds are matched by column.
+        x, y, z = coords
+        if block:
+            if (x, z) in self.pending["build"]:
+                self.answered("build", (x, z))
+                if block == WORKBENCH:
+                    self.workbench = coords
+                else:
+                    self.placed.append(coords)
+        elif coords in self.pending["dig"]:
+            self.answered("dig", coords)
+
+    def window_open(self, container):
+        if self.pending["inventory"]:
+            self.answered("inventory", self.workbench)
+        self.write_packet("window-close", wid=container.wid)
+
+    def players(self, container):
+        if container.name == self.username and container.ping:
+            self.swarm.samples["server_ping"].append(container.ping)
+
+    def kicked(self, container):
+        log.msg("%s was kicked: %s" % (self.username, container.message))
+        self.swarm.stats["kicked"] += 1
+
+    # Scripted behaviour.
+
+    def setup(self):
+        """
+        Stock up on blocks, in creative mode.
+        """
+
+        for slot, block in ((36, STONE), (37, WORKBENCH)):
+            self.write_packet("window-creative", slot=slot, primary=block,
+                count=64, secondary=0)
+        self.write_packet("equip", slot=0)
+
+    def answered(self, action, key):
+        sent = self.pending[action].pop(key)
+        self.swarm.samples[action].append((time.time() - sent) * 1000)
+
+    def tick(self):
+        now = time.time()
+
+        for action in ACTIONS:
+            pending = self.pending[action]
+            for key, sent in pending.items():
+                if now - sent > options.timeout:
+                    del pending[key]
+                    self.swarm.lost[action] += 1
+
+        self.walk(now)
+
+        for action in ACTIONS:
+            if self.random.random() < getattr(options, action) * TICK:
+                getattr(self, action)()
+
+    def walk(self, now):
+        dx, dz = self.swarm.path(now - self.started)
+        self.pos[0] = self.spawn[0] + dx
+        self.pos[3] = self.spawn[1] + dz
+
+        self.write_packet("position", position=self.position(),
+            grounded=Container(grounded=True))
+
+    def position(self):
+        x, y, stance, z = self.pos
+        return Container(x=x, y=y, stance=stance, z=z)
+
+    def here(self):
+        x, y, stance, z = self.pos
+        return int(math.floor(x)), int(math.floor(y)), int(math.floor(z))
+
+    def can_reach(self, x, z):
+        return (x // 16, z // 16) in self.loaded
+
+    def place(self, coords, block):
+        """
+        Place a block on top of the block below some coordinates.
+        """
+
+        x, y, z = coords
+        if not self.can_reach(x, z):
+            return
+
+        self.pending["build"][x, z] = time.time()
+        self.write_packet("build", x=x, y=y - 1, z=z, face="+y",
+            primary=block, count=1, secondary=0, cursorx=8, cursory=16,
+            cursorz=8)
+
+    def dig(self):
+        if not self.placed:
+            return
+
+        coords = self.placed.pop(0)
+        x, y, z = coords
+        if not self.can_reach(x, z):
+            return
+
+        self.pending["dig"][coords] = time.time()
+        self.write_packet("digging", state="started", x=x, y=y, z=z,
+            face="+y")
+
+    def build(self):
+        x, y, z = self.here()
+        self.place((x + self.random.choice((-2, 2)), y,
+            z + self.random.choice((-2, 2))), STONE)
+
+    def chat(self):
+        token = "swarm%d" % self.random.randint(0, sys.maxint)
+        self.pending["chat"][token] = time.time()
+        self.write_packet("chat", message="%s says %s" % (self.username, token))
+
+    def inventory(self):
+        if self.workbench is None:
+            # Put down a workbench to open, first.
+            if not self.pending["build"]:
+                x, y, z = self.here()
+                self.write_packet("equip", slot=1)
+                self.place((x, y, z + 3), WORKBENCH)
+                self.write_packet("equip", slot=0)
+            return
+
+        if self.pending["inventory"]:
+            return
+
+        x, y, z = self.workbench
+        if not self.can_reach(x, z):
+            return
+
+        self.pending["inventory"][self.workbench] = time.time()
+        self.write_packet("build", x=x, y=y, z=z, face="+y", primary=STONE,
+            count=1, secondary=0, cursorx=8, cursory=16, cursorz=8)
+
+class Swarm(ClientFactory):
+    """
+    A bunch of bots, and the numbers they have collected.
+    """
+
+    def __init__(self):
+        self.random = random.Random(options.seed)
+        self.path = path_for(options.path, options.path_size, options.speed)
+        self.view = len(ring_offsets(options.view))
+
+        self.bots = set()
+        self.spawned = 0
+
+        self.stats = dict.fromkeys(("connected", "logged_in", "disconnected",
+            "kicked", "errors", "refused", "bytes", "packets", "chunks"), 0)
+        self.samples = dict((name, []) for name in ACTIONS + ["keepalive",
+            "server_ping", "login", "first_chunk", "full_view"])
+        self.lost = dict.fromkeys(ACTIONS, 0)
+
+    def start(self):
+        self.began = time.time()
+        self.spawner = LoopingCall(self.spawn_bot)
+        self.spawner.start(1 / options.ramp)
+        LoopingCall(self.log_status).start(5, now=False)
+        reactor.callLater(options.duration, self.finish)
+
+    def buildProtocol(self, addr):
+        bot = Bot(self, self.spawned)
+        self.spawned += 1
+        self.bots.add(bot)
+        return bot
+
+    def spawn_bot(self):
+        if self.spawned >= options.bots:
+            self.spawner.stop()
+            return
+
+        reactor.connectTCP(arguments[0], options.port, self, timeout=5)
+
+    def clientConnectionFailed(self, connector, reason):
+        if reason.check(ConnectError):
+            self.stats["refused"] += 1
+        else:
+            self.stats["errors"] += 1
+
+    def log_status(self):
+        log.msg("%d bots logged in, %d bytes received" %
+            (self.stats["logged_in"], self.stats["bytes"]))
+
+    def results(self):
+        elapsed = time.time() - self.began
+
+        latencies = {}
+        for name in ACTIONS + ["keepalive", "server_ping", "login"]:
+            latencies[name] = percentiles(self.samples[name])
+
+        results = {
+            "options": {
+                "bots": options.bots,
+                "ramp": options.ramp,
+                "duration": options.duration,
+                "path": options.path,
+                "path_size": options.path_size,
+                "speed": options.speed,
+                "rates": dict((action, getattr(options, action))
+                    for action in ACTIONS),
+                "seed": options.seed,
+            },
+            "elapsed": elapsed,
+            "bytes_per_second": self.stats["bytes"] / elapsed,
+            "latency_ms": latencies,
+            "lost": self.lost,
+            "chunks": {
+                "received": self.stats["chunks"],
+                "view": self.view,
+                "first_ms": percentiles(self.samples["first_chunk"]),
+                "full_view_ms": percentiles(self.samples["full_view"]),
+            },
+        }
+        results.update(self.stats)
+        return results
+
+    def finish(self):
+        if self.spawner.running:
+            self.spawner.stop()
+
+        results = json.dumps(self.results(), indent=4, sort_keys=True)
+        if options.output:
+            with open(options.output, "w") as f:
+                f.write(results + "\n")
+        else:
+            print results
+
+        for bot in list(self.bots):
+            bot.transport.loseConnection()
+        reactor.callLater(0.5, reactor.stop)
+
+log.msg("Swarming %s:%d with %d bots" %
+    (arguments[0], options.port, options.bots))
+swarm = Swarm()
+reactor.callWhenRunning(swarm.start)
+reactor.run()
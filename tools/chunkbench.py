@@ -7,6 +7,7 @@ from bravo.chunk import Chunk
 from bravo.ibravo import ITerrainGenerator
 from bravo.policy.packs import beta
 from bravo.plugin import retrieve_plugins, retrieve_named_plugins
+from bravo.terrain.context import GenerationContext
 
 def empty_chunk():
 
@@ -25,7 +26,7 @@ def sequential_seeded(p):
 
     for i in range(10):
         chunk = Chunk(i, i)
-        p.populate(chunk, i)
+        p.populate(chunk, i, GenerationContext(chunk, i))
 
     after = time.time()
 
@@ -37,7 +38,7 @@ def repeated_seeds(p):
 
     for i in range(10):
         chunk = Chunk(i, i)
-        p.populate(chunk, 0)
+        p.populate(chunk, 0, GenerationContext(chunk, 0))
 
     after = time.time()
 
@@ -52,8 +53,9 @@ def pipeline():
 
     for i in range(10):
         chunk = Chunk(i, i)
+        context = GenerationContext(chunk, 0)
         for generator in generators:
-            generator.populate(chunk, 0)
+            generator.populate(chunk, 0, context)
 
     after = time.time()
 
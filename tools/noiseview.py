@@ -4,8 +4,9 @@ from __future__ import division
 
 import optparse
 
-from bravo.simplex import set_seed, simplex2, octaves2
+from bravo.simplex import get_noise, set_seed, simplex2, octaves2
 from bravo.simplex import offset2
+from bravo.terrain.density import lattice_grid
 
 WIDTH, HEIGHT = 800, 800
 
@@ -18,6 +19,15 @@ parser.add_option("-f", "--offset", help="Difference offset", type="str",
                   default="")
 parser.add_option("-c", "--color", help="Toggle false colors",
                   action="store_true", default=False)
+parser.add_option("-l", "--lattice",
+                  help="Draw a slice of 3D noise, interpolated from a lattice "
+                  "with this spacing in pixels, as in the terrain generators",
+                  type="str", default="")
+parser.add_option("-z", "--depth", help="Depth of the 3D slice", type="float",
+                  default=0)
+parser.add_option("-d", "--diff",
+                  help="Draw how far the lattice is from the exact noise",
+                  action="store_true", default=False)
 
 options, arguments = parser.parse_args()
 
@@ -29,6 +39,21 @@ set_seed(options.seed)
 
 x, y, w, h = (float(i) for i in arguments)
 
+grid = None
+if options.lattice:
+    xstep, ystep = (int(i) for i in options.lattice.split(","))
+    noise = get_noise(options.seed)
+
+    # The lattice is laid out in pixels, scaled to fit the window.
+    args = (x * WIDTH / w, y * HEIGHT / h, options.depth, WIDTH, HEIGHT, 1,
+        (w / WIDTH, h / HEIGHT, 1), options.octaves)
+    grid = lattice_grid(noise, *args + ((xstep, ystep, 1),))
+
+    if options.diff:
+        # Errors of a quarter or more are drawn at full brightness.
+        exact = noise.octaves3_grid(*args)
+        grid = [min(1, abs(a - b) * 4) * 2 - 1 for a, b in zip(grid, exact)]
+
 handle = open("noise.pnm", "wb")
 if options.color:
     handle.write("P3\n")
@@ -47,6 +72,8 @@ print "Window: %fx%f" % (w, h)
 print "Octaves: %d" % options.octaves
 print "Offsets: %f, %f" % (xoffset, yoffset)
 print "Color:", options.color
+print "Lattice:", options.lattice or "none"
+print "Diff:", options.diff
 
 for j in xrange(HEIGHT):
     for i in xrange(WIDTH):
@@ -60,9 +87,11 @@ for j in xrange(HEIGHT):
         ycoord = y + h * j / HEIGHT
 
         # Get noise and scale from [-1, 1] to [0, 255]
-        if xoffset or yoffset:
+        if grid is not None:
+            noise = grid[i * HEIGHT + j]
+        elif xoffset or yoffset:
             noise = offset2(xcoord, ycoord, xoffset, yoffset, options.octaves)
-        if options.octaves > 1:
+        elif options.octaves > 1:
             noise = octaves2(xcoord, ycoord, options.octaves)
         else:
             noise = simplex2(xcoord, ycoord)